@@ -0,0 +1,81 @@
+# benchmarks/datasets.py
+from __future__ import annotations
+import os
+from dataclasses import asdict, dataclass
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+
+GEN_CHUNK_ROWS = 100_000  # rows generated and written per step, so 1M-row shapes stay in bounded memory
+
+# rows x cols x categorical cardinality x missing rate; every combination is one dataset shape
+GRIDS: Dict[str, Dict[str, list]] = {
+    "smoke": {"rows": [2_000], "cols": [8], "cardinality": [10], "missing_rate": [0.0, 0.1]},
+    "default": {"rows": [10_000, 100_000], "cols": [10, 50], "cardinality": [10, 1_000], "missing_rate": [0.0, 0.1]},
+    "large": {"rows": [1_000_000], "cols": [20, 100], "cardinality": [50, 10_000], "missing_rate": [0.05]},
+}
+
+TARGET, CLASS_TARGET = "target", "target_class"
+
+
+@dataclass(frozen=True)
+class Shape:
+    rows: int
+    cols: int  # feature columns (a quarter categorical), plus the two targets
+    cardinality: int  # levels per categorical column
+    missing_rate: float  # share of feature cells blanked out
+
+    @property
+    def name(self) -> str:
+        return f"r{self.rows}_c{self.cols}_k{self.cardinality}_m{self.missing_rate:g}"
+
+    @property
+    def n_categorical(self) -> int:
+        return max(1, self.cols // 4)
+
+    def to_dict(self) -> Dict[str, float]:
+        return {**asdict(self), "name": self.name}
+
+
+def grid(name: str) -> List[Shape]:
+    if name not in GRIDS:
+        raise ValueError(f"grid must be one of {', '.join(GRIDS)}")
+    g = GRIDS[name]
+    return [
+        Shape(r, c, k, m)
+        for r in g["rows"] for c in g["cols"] for k in g["cardinality"] for m in g["missing_rate"]
+    ]
+
+
+def _chunk(shape: Shape, rng: np.random.Generator, n: int, coef: np.ndarray, level_effect: np.ndarray) -> pd.DataFrame:
+    n_cat = shape.n_categorical
+    n_num = shape.cols - n_cat
+    num = rng.normal(size=(n, n_num))
+    # Zipf-ish level frequencies so high-cardinality columns have a realistic long tail
+    weights = 1.0 / np.arange(1, shape.cardinality + 1)
+    codes = rng.choice(shape.cardinality, size=(n, n_cat), p=weights / weights.sum())
+    y = num @ coef + level_effect[codes].sum(axis=1) + rng.normal(scale=0.5, size=n)
+
+    data: Dict[str, np.ndarray] = {f"num_{j}": num[:, j] for j in range(n_num)}
+    for j in range(n_cat):
+        data[f"cat_{j}"] = np.char.add(f"c{j}_", codes[:, j].astype(str)).astype(object)
+    frame = pd.DataFrame(data)
+    if shape.missing_rate > 0:
+        frame = frame.mask(rng.random(frame.shape) < shape.missing_rate)
+    frame[TARGET] = y
+    frame[CLASS_TARGET] = np.where(y > 0.5, "high", np.where(y < -0.5, "low", "mid"))
+    return frame
+
+
+def write_csv(shape: Shape, path: str, seed: int = 0) -> str:
+    """Write the synthetic dataset for `shape` to `path` (generated chunk by chunk); returns the path."""
+    rng = np.random.default_rng(seed)
+    coef = rng.normal(size=shape.cols - shape.n_categorical)
+    level_effect = rng.normal(scale=0.3, size=shape.cardinality)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8", newline="") as fh:
+        for start in range(0, shape.rows, GEN_CHUNK_ROWS):
+            n = min(GEN_CHUNK_ROWS, shape.rows - start)
+            _chunk(shape, rng, n, coef, level_effect).to_csv(fh, index=False, header=start == 0)
+    os.replace(tmp, path)
+    return path
@@ -0,0 +1,240 @@
+# benchmarks/run.py
+"""
+Benchmark /upload and the /process pipeline over a grid of synthetic datasets.
+
+    cd backend
+    python -m benchmarks.run --grid smoke --out bench.json
+    python -m benchmarks.run --grid default --out new.json --baseline bench.json
+
+Storage goes to a local directory (STORAGE_BACKEND=local) and insights to the
+stub backend, so runs need no network and no credentials. Every case runs in
+a fresh interpreter so its peak RSS is its own. /upload goes through the
+FastAPI app; the pipeline is called in-process through the same run_process
+entry point the /process job workers use, so per-stage timers and RSS cover
+it. Results are written as JSON; --baseline compares against an earlier run
+and exits 1 on regressions.
+"""
+from __future__ import annotations
+import argparse, json, os, platform, resource, subprocess, sys, tempfile, time
+from typing import Any, Dict, List, Optional
+
+from benchmarks.datasets import CLASS_TARGET, GRIDS, TARGET, grid, write_csv
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = ("business_insights", "model_trainer")
+TARGETS = {"numeric": TARGET, "class": CLASS_TARGET}
+REGRESSION_TOLERANCE = 0.2  # relative slowdown that counts as a regression
+REGRESSION_MIN_SECONDS = 0.05  # ignore noise on very short stages
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)  # bytes on macOS, KiB elsewhere
+
+
+# -------------------- One case (child process) --------------------
+def run_case(case: Dict[str, Any]) -> Dict[str, Any]:
+    """Upload the CSV through the app, then run the pipeline with stage timers."""
+    from fastapi.testclient import TestClient
+    import main
+    from pipeline import run_process
+
+    out: Dict[str, Any] = {"id": case["id"], "status": "ok", "rss_after_import_mb": _peak_rss_mb()}
+    with TestClient(main.app) as client:
+        t0 = time.perf_counter()
+        with open(case["csv"], "rb") as fh:
+            r = client.post("/upload", files={"file": (os.path.basename(case["csv"]), fh, "text/csv")})
+        out["upload_seconds"] = round(time.perf_counter() - t0, 4)
+        if r.status_code != 200:
+            return {**out, "status": "error", "error": f"/upload {r.status_code}: {r.text[:500]}"}
+        up = r.json()
+
+        payload = {
+            "file_url": up["file_url"], "dataset_id": up["dataset_id"], "target": case["target"],
+            "mode": case["mode"], "time_budget": case["time_budget"],
+        }
+        timings: Dict[str, float] = {}
+        started = time.perf_counter()
+        steps: List[Dict[str, Any]] = []
+
+        def progress(step: Dict[str, Any]) -> None:
+            steps.append({"step": step["step"], "status": step["status"], "at": round(time.perf_counter() - started, 4)})
+
+        try:
+            result = run_process(payload, progress=progress, timings=timings)
+        except Exception as e:
+            return {**out, "status": "error", "error": f"{type(e).__name__}: {e}"}
+        out["process_seconds"] = round(time.perf_counter() - started, 4)
+        out["stages"] = {k: round(v, 4) for k, v in sorted(timings.items())}
+        out["steps"] = steps
+        errors = [s["step"] for s in result.get("steps", []) if s.get("status") == "error"]
+        if errors:
+            out.update(status="error", error=f"pipeline steps failed: {', '.join(errors)}")
+        if result.get("model_info"):
+            out["model"] = {
+                k: result["model_info"].get(k) for k in ("model_type", "r2_score", "rmse", "accuracy")
+                if k in result["model_info"]
+            }
+    out["peak_rss_mb"] = _peak_rss_mb()
+    return out
+
+
+def _child_env(work_dir: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "STORAGE_BACKEND": "local",
+        "MLIFY_LOCAL_STORAGE_DIR": os.path.join(work_dir, "storage"),
+        "MLIFY_CACHE_DIR": os.path.join(work_dir, "cache"),
+        "MLIFY_INSIGHT_BACKEND": "stub",
+        "MLIFY_STARTUP": "lazy",  # no warm-up thread or pre-spawned job workers competing with the case
+        "MLIFY_TRAINING_CACHE": "false",  # repeats must train, not hit the previous repeat's result
+    })
+    env.pop("GEMINI_API_KEY", None)
+    return env
+
+
+def _spawn(case: Dict[str, Any], work_dir: str, timeout: float) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    try:
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.run", "--case", json.dumps(case)],
+            cwd=BACKEND_DIR, env=_child_env(work_dir), capture_output=True, text=True, timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        return {"id": case["id"], "status": "timeout", "wall_seconds": round(time.perf_counter() - t0, 4)}
+    wall = round(time.perf_counter() - t0, 4)
+    lines = [ln for ln in proc.stdout.splitlines() if ln.startswith("{")]
+    if proc.returncode != 0 or not lines:
+        return {"id": case["id"], "status": "error", "wall_seconds": wall, "error": proc.stderr[-2000:]}
+    return {**json.loads(lines[-1]), "wall_seconds": wall}
+
+
+# -------------------- Suite (parent process) --------------------
+def _meta(grid_name: str) -> Dict[str, Any]:
+    import numpy, pandas, sklearn
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True,
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "grid": grid_name,
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "versions": {"numpy": numpy.__version__, "pandas": pandas.__version__, "sklearn": sklearn.__version__},
+    }
+
+
+def run_suite(
+    grid_name: str,
+    modes: List[str],
+    targets: List[str],
+    repeat: int = 1,
+    time_budget: float = 30.0,
+    timeout: float = 1800.0,
+    work_dir: Optional[str] = None,
+) -> Dict[str, Any]:
+    work_dir = work_dir or tempfile.mkdtemp(prefix="mlify-bench-")
+    data_dir = os.path.join(work_dir, "data")
+    os.makedirs(data_dir, exist_ok=True)
+    results: List[Dict[str, Any]] = []
+    for shape in grid(grid_name):
+        csv = os.path.join(data_dir, f"{shape.name}.csv")
+        if not os.path.exists(csv):
+            t0 = time.perf_counter()
+            write_csv(shape, csv)
+            print(f"generated {shape.name} in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+        for mode in modes:
+            for target_kind in targets:
+                for rep in range(repeat):
+                    case = {
+                        "id": f"{shape.name}/{mode}/{target_kind}",
+                        "csv": csv, "mode": mode, "target": TARGETS[target_kind], "time_budget": time_budget,
+                    }
+                    res = _spawn(case, work_dir, timeout)
+                    res.update(shape=shape.to_dict(), mode=mode, target=target_kind, repeat=rep,
+                               csv_bytes=os.path.getsize(csv))
+                    results.append(res)
+                    print(
+                        f"{res['id']} #{rep}: {res['status']} wall={res.get('wall_seconds')}s "
+                        f"process={res.get('process_seconds')}s rss={res.get('peak_rss_mb')}MB",
+                        file=sys.stderr,
+                    )
+    return {"meta": _meta(grid_name), "results": results}
+
+
+def _medians(report: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    """case id -> metric -> median over repeats (wall, upload, process, peak RSS and every stage)."""
+    import statistics
+
+    samples: Dict[str, Dict[str, List[float]]] = {}
+    for r in report.get("results", []):
+        if r.get("status") != "ok":
+            continue
+        m = samples.setdefault(r["id"], {})
+        for key in ("upload_seconds", "process_seconds", "peak_rss_mb"):
+            if r.get(key) is not None:
+                m.setdefault(key, []).append(r[key])
+        for stage, secs in (r.get("stages") or {}).items():
+            m.setdefault(f"stage.{stage}", []).append(secs)
+    return {cid: {k: statistics.median(v) for k, v in m.items()} for cid, m in samples.items()}
+
+
+def compare(new: Dict[str, Any], old: Dict[str, Any], tolerance: float = REGRESSION_TOLERANCE) -> List[Dict[str, Any]]:
+    """Metrics that got worse than `tolerance` (relative) between two reports."""
+    a, b = _medians(old), _medians(new)
+    out = []
+    for cid in sorted(set(a) & set(b)):
+        for key in sorted(set(a[cid]) & set(b[cid])):
+            before, after = a[cid][key], b[cid][key]
+            floor = 0.0 if key == "peak_rss_mb" else REGRESSION_MIN_SECONDS
+            if after > before * (1 + tolerance) and after - before > floor:
+                out.append({"id": cid, "metric": key, "before": before, "after": after,
+                            "change": round(after / before - 1, 3) if before else None})
+    return out
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--grid", default="smoke", choices=sorted(GRIDS))
+    ap.add_argument("--modes", nargs="+", default=list(MODES), choices=MODES)
+    ap.add_argument("--targets", nargs="+", default=["numeric"], choices=sorted(TARGETS))
+    ap.add_argument("--repeat", type=int, default=1)
+    ap.add_argument("--time-budget", type=float, default=30.0, help="model search budget per model_trainer case")
+    ap.add_argument("--timeout", type=float, default=1800.0, help="seconds before a case is killed")
+    ap.add_argument("--work-dir", help="keep generated CSVs and storage here (reused between runs)")
+    ap.add_argument("--out", help="write the JSON report here (stdout otherwise)")
+    ap.add_argument("--baseline", help="earlier report to compare against; exit 1 on regressions")
+    ap.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE)
+    ap.add_argument("--case", help=argparse.SUPPRESS)  # internal: run one case in this process
+    args = ap.parse_args(argv)
+
+    if args.case:
+        print(json.dumps(run_case(json.loads(args.case))))
+        return 0
+
+    report = run_suite(args.grid, args.modes, args.targets, args.repeat, args.time_budget, args.timeout, args.work_dir)
+    status = 0
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as fh:
+            regressions = compare(report, json.load(fh), args.tolerance)
+        report["regressions"] = regressions
+        for reg in regressions:
+            print(f"REGRESSION {reg['id']} {reg['metric']}: {reg['before']} -> {reg['after']}", file=sys.stderr)
+        status = 1 if regressions else 0
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            fh.write(text)
+    else:
+        print(text)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
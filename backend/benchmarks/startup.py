@@ -0,0 +1,74 @@
+# benchmarks/startup.py
+"""
+Import-time budget for a fresh API worker.
+
+    cd backend
+    python -m benchmarks.startup             # exit 1 if `import main` exceeds MLIFY_IMPORT_BUDGET
+    python -m benchmarks.startup --runs 5 --top 15
+
+Each run imports `main` in a new interpreter with `-X importtime`, without
+storage or Gemini credentials, so it also proves the import has no network or
+credential side effects. Reports the median import time and the modules with
+the largest self time in the slowest run.
+"""
+from __future__ import annotations
+import argparse, json, os, statistics, subprocess, sys
+from typing import Any, Dict, List, Optional
+
+from utils.warmup import IMPORT_BUDGET
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_PROBE = "import time; t = time.perf_counter(); import main; print('IMPORT_SECONDS', time.perf_counter() - t)"
+
+
+def _parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cum_us, name = (p.strip() for p in line[len("import time:"):].split("|"))
+            rows.append({"module": name.strip(), "self_ms": int(self_us) / 1000.0, "cumulative_ms": int(cum_us) / 1000.0})
+        except ValueError:
+            continue
+    return rows
+
+
+def measure(runs: int = 3, top: int = 10) -> Dict[str, Any]:
+    env = {k: v for k, v in os.environ.items() if k not in ("PROJECT_URL", "SERVICE_KEY", "GEMINI_API_KEY")}
+    env.pop("STORAGE_BACKEND", None)  # default (supabase) backend with no credentials must still import
+    samples: List[float] = []
+    slowest: Optional[List[Dict[str, Any]]] = None
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", _PROBE],
+                              cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"`import main` failed:\n{proc.stderr[-2000:]}")
+        line = next(ln for ln in proc.stdout.splitlines() if ln.startswith("IMPORT_SECONDS"))
+        secs = float(line.split()[1])
+        if not samples or secs > max(samples):
+            slowest = _parse_importtime(proc.stderr)
+        samples.append(secs)
+    heavy = sorted(slowest or [], key=lambda r: r["self_ms"], reverse=True)[:top]
+    median = statistics.median(samples)
+    return {
+        "import_seconds": round(median, 4),
+        "samples": [round(s, 4) for s in samples],
+        "budget": IMPORT_BUDGET,
+        "within_budget": median <= IMPORT_BUDGET,
+        "top_self_time": heavy,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--top", type=int, default=10)
+    args = ap.parse_args(argv)
+    report = measure(args.runs, args.top)
+    print(json.dumps(report, indent=2))
+    return 0 if report["within_budget"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,25 +1,73 @@
 # backend/main.py
 from __future__ import annotations
 
+import time
+
+_IMPORT_STARTED = time.perf_counter()  # checked against MLIFY_IMPORT_BUDGET, reported by /ready
+
+import asyncio
 import io
+import json
 import os
-import uuid
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
-import matplotlib.pyplot as plt
-import numpy as np
-import pandas as pd
-import requests
 from dotenv import load_dotenv
 from fastapi import FastAPI, File, HTTPException, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from sklearn.preprocessing import LabelEncoder
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from fastapi.staticfiles import StaticFiles
+import pandas as pd
+
+from pipeline import (
+    JobCancelled, PipelineError, parse_batch_payload, parse_payload, refine_payload, run_batch, run_process, supa_key,
+)
+from utils import columnar, dataset_profile
+from utils.affinity import job_prefix
+from utils.dataset_cache import dataset_cache
+from utils.ingest import CsvSummary, read_preview, spool_upload, summarize_csv
+from utils.jobs import CANCELLED, DONE, ERROR, TERMINAL, Job, JobManager
+from utils.metrics import (
+    HTTP_SECONDS, IMPORT_SECONDS, JOBS, PROFILE_HEADER, PROFILING_ENABLED, UPLOAD_BYTES, WARMUP_SECONDS, metrics,
+    observe_result,
+)
+from utils.model_registry import ModelNotFound, PredictionError, model_cache, model_registry, predict
+from utils.schema import infer_schema
+from utils.supabase import (
+    LOCAL_STORAGE_DIR, LOCAL_STORAGE_URL, STORAGE_BACKEND, aclose_storage, aupload_bytes, aupload_path, get_storage,
+)
+from utils.warmup import IMPORT_BUDGET, WarmUp, import_modules, warm_worker
 
-from utils.supabase import upload_bytes  # bytes-only helper to Supabase
+IMPORT_TIME = time.perf_counter() - _IMPORT_STARTED
+IMPORT_SECONDS.set(IMPORT_TIME)
 
 load_dotenv()
 app = FastAPI()
 
+JOB_POLL_SECONDS = float(os.getenv("MLIFY_JOB_POLL_SECONDS", "0.25"))
+
+
+def _observe_job(job: Job) -> None:
+    """Stage / insight / training histograms from finished jobs (the work itself ran in a pool worker)."""
+    JOBS.inc(mode=job.payload.get("mode", ""), status=job.status)
+    if job.status == DONE and job.result:
+        observe_result(job.result.get("mode", ""), job.result)
+        for item in job.result.get("results") or []:  # /process/batch: one result per dataset and target
+            if item.get("status") == "success":
+                observe_result(item.get("mode", ""), item)
+
+
+job_manager = JobManager(
+    run_process, cancelled_exc=JobCancelled, on_finish=_observe_job, initializer=warm_worker, id_prefix=job_prefix(),
+)
+
+# Heavy subsystems load here (MLIFY_STARTUP=background|eager) or on first use (lazy); /ready reports progress
+warmup = WarmUp()
+warmup.add("storage", lambda: type(get_storage()).__name__)  # also surfaces missing credentials
+warmup.add("modules", import_modules)
+warmup.add("job_workers", job_manager.prestart)
+
 # --- CORS (helpful for local dev) ---
 app.add_middleware(
     CORSMiddleware,
@@ -29,21 +77,59 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# --- Request latency per route template (unmatched paths share one label) ---
+@app.middleware("http")
+async def _time_requests(request: Request, call_next):
+    t0 = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_SECONDS.observe(
+            time.perf_counter() - t0,
+            method=request.method, route=getattr(route, "path", "unmatched"), status=status,
+        )
+
+# --- Local storage backend: serve stored objects at the same URLs we hand out ---
+if STORAGE_BACKEND == "local" and LOCAL_STORAGE_URL.startswith("/"):
+    os.makedirs(LOCAL_STORAGE_DIR, exist_ok=True)
+    app.mount(LOCAL_STORAGE_URL, StaticFiles(directory=LOCAL_STORAGE_DIR), name="storage")
+
 # -------------------- Small helpers --------------------
-def _supa_key(prefix: str, filename: str) -> str:
-    """Consistent key like 'uploads/abcd1234__file.csv'."""
-    uid = uuid.uuid4().hex[:8]
-    return f"{prefix.rstrip('/')}/{uid}__{filename}"
-
-def _save_plot_to_supabase(fig, name_hint: str) -> str:
-    """Render a Matplotlib figure to PNG bytes and upload to Supabase; return public URL."""
-    buf = io.BytesIO()
-    fig.tight_layout()
-    fig.savefig(buf, format="png", dpi=150)
-    plt.close(fig)
-    buf.seek(0)
-    key = _supa_key("graphs", name_hint if name_hint.endswith(".png") else f"{name_hint}.png")
-    return upload_bytes(buf.getvalue(), key=key, content_type="image/png")
+def _get_job_or_404(job_id: str) -> Job:
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return job
+
+async def _read_payload(request: Request, parse=parse_payload) -> Dict[str, Any]:
+    """Read raw JSON body to avoid validation-time 422s, then validate it by hand."""
+    try:
+        payload: Dict[str, Any] = await request.json()
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON body: {e}")
+    if PROFILING_ENABLED and request.headers.get(PROFILE_HEADER, "").lower() in ("1", "true", "yes"):
+        payload["profile"] = True  # run_process attaches a cProfile report to the result
+    try:
+        parse(payload)
+    except PipelineError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return payload
+
+def _columnar_copy(csv_path: str, parquet_path: str, schema: Dict[str, Any], dataset_id: str) -> Optional[Dict[str, Any]]:
+    """Parquet copy + dataset profile of an upload; None without pyarrow or if the CSV won't convert."""
+    if not columnar.available():
+        return None
+    try:
+        columnar.csv_to_parquet(csv_path, parquet_path, schema, dataset_id)
+        return dataset_profile.build_profile_parquet(parquet_path, schema, dataset_id)
+    except Exception:
+        if os.path.exists(parquet_path):
+            os.remove(parquet_path)
+        return None  # summarize and store the CSV alone; /process parses it
 
 # -------------------- Routes --------------------
 @app.post("/upload")
@@ -52,446 +138,275 @@ async def upload_file(file: UploadFile = File(...)):
     if not file.filename.lower().endswith(".csv"):
         raise HTTPException(status_code=400, detail="Please upload a CSV file")
 
-    # Read CSV → DataFrame
+    # Stream to a local spool file (bounded memory), then convert to Parquet and profile it column by column
     try:
-        contents = await file.read()
-        df = pd.read_csv(io.StringIO(contents.decode("utf-8")))
+        spooled = await spool_upload(file, spool_dir=dataset_cache.tmp_dir)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Could not read upload: {str(e)}")
+    dataset_id = spooled.digest
+    parquet_path = f"{spooled.path}{columnar.COLUMNAR_SUFFIX}"
+    try:
+        schema = await run_in_threadpool(infer_schema, spooled.path)
+        profile = await run_in_threadpool(_columnar_copy, spooled.path, parquet_path, schema, dataset_id)
+        if profile is not None:
+            summary = CsvSummary(
+                columns=list(profile["columns"]),
+                rows=profile["rows"],
+                missing_counts={c: e["nulls"] for c, e in profile["columns"].items()},
+                preview=await run_in_threadpool(read_preview, spooled.path),
+            )
+        else:
+            summary = await run_in_threadpool(summarize_csv, spooled.path)
     except Exception as e:
+        spooled.discard()
         raise HTTPException(status_code=400, detail=f"Could not read CSV: {str(e)}")
 
-    # Normalize + upload to Supabase (no local disk)
-    csv_bytes = df.to_csv(index=False).encode("utf-8")
-    storage_key = _supa_key("uploads", file.filename)
-    file_url = upload_bytes(csv_bytes, key=storage_key, content_type="text/csv")
+    # Upload the original bytes (streamed from the spool file), the schema sidecar and, when
+    # converted, the Parquet copy (schema + column stats in its footer) and the profile sidecar
+    storage_key = supa_key("uploads", file.filename)
+    uploads = [
+        aupload_path(spooled.path, storage_key, content_type="text/csv"),
+        aupload_bytes(json.dumps(schema).encode("utf-8"), f"{storage_key}.schema.json",
+                      content_type="application/json"),
+    ]
+    if profile is not None:
+        uploads += [
+            aupload_path(parquet_path, f"{storage_key}{columnar.COLUMNAR_SUFFIX}",
+                         content_type="application/vnd.apache.parquet"),
+            aupload_bytes(json.dumps(profile).encode("utf-8"), f"{storage_key}{dataset_profile.PROFILE_SUFFIX}",
+                          content_type="application/json"),
+        ]
+    try:
+        file_url, _, *columnar_urls = await asyncio.gather(*uploads)
+    except Exception:
+        spooled.discard()
+        if os.path.exists(parquet_path):
+            os.remove(parquet_path)
+        raise
     file_url = str(file_url)  # ensure plain string
 
-    preview_html = df.head(5).to_html(classes="table table-striped", index=False)
-    columns = df.columns.tolist()
-    missing_counts = df.isnull().sum().to_dict()
+    UPLOAD_BYTES.observe(os.path.getsize(spooled.path))
+
+    # Hand the Parquet copy (or the raw spool file) to the dataset cache so /process skips the download
+    dataset_cache.put_schema(dataset_id, schema)
+    columnar_bytes = None
+    if profile is not None:
+        columnar_bytes = os.path.getsize(parquet_path)
+        dataset_cache.put_profile(dataset_id, profile)
+        dataset_cache.put_columnar(dataset_id, parquet_path, url=file_url)
+        spooled.discard()
+    else:
+        dataset_cache.put_file(dataset_id, spooled.path, url=file_url)
+
+    preview_html = summary.preview.to_html(classes="table table-striped", index=False)
+    columns = summary.columns
+    missing_counts = summary.missing_counts
 
     return {
         "file_url": file_url,
+        "dataset_id": dataset_id,
+        "columnar_url": str(columnar_urls[0]) if columnar_urls else None,
+        "columnar_bytes": columnar_bytes,
         "columns": columns,
         "preview": preview_html,
-        "rows": int(df.shape[0]),
-        "cols": int(df.shape[1]),
+        "rows": summary.rows,
+        "cols": len(columns),
         "missing_counts": missing_counts,
+        "schema": schema["columns"],
+        "dataset_profile": dataset_profile.summary(profile) if profile is not None else None,
     }
 
 @app.post("/process")
 async def process_data(request: Request):
     """
-    Read raw JSON body to avoid validation-time 422s.
+    Run the pipeline on the job pool and wait for it, so the event loop stays free.
     """
-    # -------- Parse JSON safely --------
+    payload = await _read_payload(request)
+    job = job_manager.submit(payload)
     try:
-        payload: Dict[str, Any] = await request.json()
+        return await job_manager.wait(job.id)
+    except PipelineError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except JobCancelled:
+        raise HTTPException(status_code=409, detail="Job was cancelled")
+
+@app.post("/process/batch")
+async def process_batch(request: Request):
+    """
+    Several targets and/or datasets in one job: each dataset is loaded, imputed and
+    correlated once and its targets are analysed in parallel. Same options as /process,
+    plus `targets` (list) and `datasets` (URLs or {file_url, dataset_id, columnar_url, targets}).
+    """
+    payload = await _read_payload(request, parse_batch_payload)
+    job = job_manager.submit(payload, fn=run_batch)
+    try:
+        return await job_manager.wait(job.id)
+    except PipelineError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except JobCancelled:
+        raise HTTPException(status_code=409, detail="Job was cancelled")
+
+# -------------------- Jobs --------------------
+@app.post("/jobs", status_code=202)
+async def submit_job(request: Request):
+    """Queue a /process payload; poll /jobs/{id} or stream /jobs/{id}/events for progress."""
+    payload = await _read_payload(request)
+    job = job_manager.submit(payload)
+    return job.snapshot()
+
+@app.post("/jobs/batch", status_code=202)
+async def submit_batch_job(request: Request):
+    """Queue a /process/batch payload as one job."""
+    payload = await _read_payload(request, parse_batch_payload)
+    return job_manager.submit(payload, fn=run_batch).snapshot()
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    return _get_job_or_404(job_id).snapshot()
+
+@app.get("/jobs/{job_id}/result")
+async def job_result(job_id: str):
+    job = _get_job_or_404(job_id)
+    if job.status == DONE:
+        return job.result
+    if job.status == ERROR:
+        code = 400 if job.error_type == PipelineError.__name__ else 500
+        raise HTTPException(status_code=code, detail=job.error)
+    if job.status == CANCELLED:
+        raise HTTPException(status_code=410, detail="Job was cancelled")
+    raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+
+@app.post("/jobs/{job_id}/refine", status_code=202)
+async def refine_job(job_id: str):
+    """Re-run a sampled preview job over the full dataset as a new job."""
+    job = _get_job_or_404(job_id)
+    if not job.payload.get("sample"):
+        raise HTTPException(status_code=400, detail="Job did not use 'sample'; nothing to refine")
+    return job_manager.submit(refine_payload(job.payload)).snapshot()
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    job = _get_job_or_404(job_id)
+    job_manager.cancel(job.id)
+    return job.snapshot()
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Server-sent events: one `step` event per pipeline step, then a terminal status event."""
+    job = _get_job_or_404(job_id)
+
+    async def _stream():
+        sent = 0
+        while True:
+            status = job.status
+            events = job.events
+            for ev in events[sent:]:
+                yield f"event: step\ndata: {json.dumps(jsonable_encoder(ev))}\n\n"
+            sent = len(events)
+            if status in TERMINAL:
+                yield f"event: {status}\ndata: {json.dumps(jsonable_encoder(job.snapshot()))}\n\n"
+                return
+            await asyncio.sleep(JOB_POLL_SECONDS)
+
+    return StreamingResponse(_stream(), media_type="text/event-stream")
+
+# -------------------- Models / prediction --------------------
+async def _predict(model_id: Any, frame: pd.DataFrame, proba: bool) -> Dict[str, Any]:
+    if not isinstance(model_id, str) or not model_id:
+        raise HTTPException(status_code=400, detail="Missing or invalid 'model_id'")
+    try:
+        return await run_in_threadpool(predict, model_cache, model_id, frame, proba)
+    except ModelNotFound:
+        raise HTTPException(status_code=404, detail=f"Model '{model_id}' not found")
+    except PredictionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/models")
+async def list_models():
+    return {"models": await run_in_threadpool(model_registry.list), "cache": model_cache.stats()}
+
+@app.get("/models/{model_id}")
+async def get_model(model_id: str):
+    try:
+        return model_registry.get(model_id)
+    except ModelNotFound:
+        raise HTTPException(status_code=404, detail=f"Model '{model_id}' not found")
+
+@app.post("/predict")
+async def predict_one(request: Request):
+    """Score one record: {"model_id": ..., "features": {col: value, ...}, "proba": false}."""
+    try:
+        body = await request.json()
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Invalid JSON body: {e}")
+    features = body.get("features") if isinstance(body, dict) else None
+    if not isinstance(features, dict):
+        raise HTTPException(status_code=400, detail="Missing or invalid 'features' object")
+    return await _predict(body.get("model_id"), pd.DataFrame([features]), bool(body.get("proba")))
 
-    target = payload.get("target")
-    mode = payload.get("mode")
-    file_url = payload.get("file_url") or payload.get("filename")  # fallback for legacy clients
-
-    # Coerce file_url to plain string if an object slipped through
-    if isinstance(file_url, dict):
-        file_url = (
-            file_url.get("publicURL")
-            or file_url.get("publicUrl")
-            or file_url.get("url")
-            or str(file_url)
-        )
-
-    # -------- Manual validation (clear 400s, no 422) --------
-    if not isinstance(target, str) or not target:
-        raise HTTPException(status_code=400, detail="Missing or invalid 'target'")
-    if not isinstance(mode, str) or not mode:
-        raise HTTPException(status_code=400, detail="Missing or invalid 'mode'")
-    if not isinstance(file_url, str) or not file_url:
-        raise HTTPException(status_code=400, detail="Missing or invalid 'file_url'")
-
-    # -------- Load CSV from Supabase URL --------
+@app.post("/predict/batch")
+async def predict_batch(request: Request):
+    """
+    Score many rows in one vectorised call. Accepts JSON {"model_id", "records": [...]},
+    a text/csv body with ?model_id=..., or a multipart form with a CSV 'file' and 'model_id'.
+    """
+    ctype = request.headers.get("content-type", "")
+    model_id = request.query_params.get("model_id")
+    proba = request.query_params.get("proba", "").lower() in ("1", "true", "yes")
     try:
-        r = requests.get(file_url, timeout=30)
-        r.raise_for_status()
-        df = pd.read_csv(io.StringIO(r.text))
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Could not fetch/read CSV from URL: {e}")
-
-    if target not in df.columns:
-        raise HTTPException(status_code=400, detail=f"Target column '{target}' not found in dataset.")
-
-    steps: list[dict[str, Any]] = []
-
-    # -------------------- Missing Values --------------------
-    missing_before = df.isnull().sum()
-    total_missing = int(missing_before.sum())
-    steps.append({
-        "step": "missing_detected",
-        "message": f"Found {total_missing} missing values across {len(missing_before[missing_before>0])} columns.",
-        "status": "done",
-        "details": missing_before[missing_before>0].to_dict()
-    })
-
-    for col in df.columns:
-        if df[col].isnull().sum() > 0:
-            if pd.api.types.is_numeric_dtype(df[col]):
-                df[col] = df[col].fillna(df[col].median())
-            else:
-                try:
-                    df[col] = df[col].fillna(df[col].mode().iloc[0])
-                except Exception:
-                    df[col] = df[col].fillna("Unknown")
-
-    missing_after = int(df.isnull().sum().sum())
-    steps.append({
-        "step": "missing_handled",
-        "message": f"Missing values handled. Remaining missing values: {missing_after}.",
-        "status": "done"
-    })
-
-    # -------------------- Feature Types --------------------
-    numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-    categorical_cols = df.select_dtypes(include=['object', 'category', 'bool']).columns.tolist()
-    features = [c for c in df.columns if c != target]
-    steps.append({
-        "step": "separate_types",
-        "message": f"Separated columns into {len(numeric_cols)} numeric and {len(categorical_cols)} categorical.",
-        "status": "done",
-        "numeric_cols": numeric_cols,
-        "categorical_cols": categorical_cols
-    })
-
-    target_numeric = pd.api.types.is_numeric_dtype(df[target])
-
-    # -------------------- Branch on mode --------------------
-    numeric_analysis: Dict[str, Any] = {}
-    cat_analysis: Dict[str, Any] = {}
-    insights: list[Dict[str, Any]] = []
-    model_info: Dict[str, Any] = {}
-    ai_insights: list[str] = []
-    ai_model: str | None = None
-    ai_error: str | None = None  # <- for debugging visibility
-
-    # ===== BUSINESS INSIGHTS =====
-    if mode == "business_insights":
-        try:
-            target_encoded = df[target] if target_numeric else pd.factorize(df[target])[0]
-
-            # Numeric correlations + heatmap
-            if numeric_cols:
-                corr_series = (
-                    df[numeric_cols]
-                    .assign(_target=target_encoded)
-                    .corr()["_target"]
-                    .drop("_target")
-                    .sort_values(key=abs, ascending=False)
-                )
-                numeric_analysis["correlations"] = corr_series.to_dict()
-
-                fig = plt.figure(figsize=(6, 5))
-                corrmat = df[numeric_cols + ([target] if target_numeric else [])].corr()
-                plt.imshow(corrmat, interpolation='nearest', cmap='coolwarm')
-                plt.xticks(range(len(corrmat.columns)), corrmat.columns, rotation=45, ha='right')
-                plt.yticks(range(len(corrmat.index)), corrmat.index)
-                plt.colorbar()
-                numeric_analysis["corr_heatmap"] = _save_plot_to_supabase(fig, "num_corr_heatmap")
-            else:
-                numeric_analysis["note"] = "No numeric columns found."
-
-            steps.append({"step": "numeric_analysis", "message": "Numeric correlations computed.", "status": "done"})
-
-        except Exception as e:
-            steps.append({"step": "numeric_analysis_error", "message": str(e), "status": "error"})
-
-        # Categorical side
-        if categorical_cols:
-            df_encoded = df.copy()
-            le_map: Dict[str, list[str]] = {}
-            for col in categorical_cols:
-                try:
-                    le = LabelEncoder()
-                    df_encoded[col] = le.fit_transform(df_encoded[col].astype(str))
-                    le_map[col] = list(le.classes_)
-                except Exception:
-                    df_encoded[col], uniques = pd.factorize(df_encoded[col].astype(str))
-                    le_map[col] = [str(u) for u in uniques]
-
-            target_enc = df[target] if target_numeric else pd.factorize(df[target])[0]
-            corr_cat = (
-                df_encoded[categorical_cols]
-                .assign(_target=target_enc)
-                .corr()["_target"]
-                .drop("_target")
-                .sort_values(key=abs, ascending=False)
-            )
-            cat_analysis["correlations"] = corr_cat.to_dict()
-            cat_analysis["label_encoding_map"] = le_map
-
-            # Top 3 category plots
-            cat_plots: list[str] = []
-            for col in list(corr_cat.abs().sort_values(ascending=False).index)[:3]:
-                fig, ax = plt.subplots(figsize=(6, 4))
-                if target_numeric:
-                    vals = df.groupby(col)[target].mean()
-                else:
-                    vals = df.groupby(col)[target].apply(lambda x: x.value_counts(normalize=True).max())
-                vals.plot(kind='bar', ax=ax)
-                ax.set_title(f"{col} vs {target}")
-                url = _save_plot_to_supabase(fig, f"cat_{col}_vs_{target}")
-                cat_plots.append(url)
-            cat_analysis["plots"] = cat_plots
-            steps.append({"step": "cat_analysis", "message": "Categorical correlations computed.", "status": "done"})
-        else:
-            cat_analysis["note"] = "No categorical columns found."
-            steps.append({"step": "cat_analysis_skipped", "message": "No categorical columns found.", "status": "done"})
-
-        # Insights (top/low features)
-        combined_corr = {
-            **(numeric_analysis.get("correlations") or {}),
-            **(cat_analysis.get("correlations") or {}),
-        }
-        if combined_corr:
-            sorted_corr = sorted(combined_corr.items(), key=lambda kv: abs(kv[1]), reverse=True)
-            top_features = sorted_corr[1:4]
-            low_features = sorted_corr[-5:] if len(sorted_corr) >= 5 else sorted_corr[-len(sorted_corr):]
-            insights = [
-                {"top_features": [{k: v} for k, v in top_features]},
-                {"low_features": [{k: v} for k, v in low_features]},
-            ]
+        if ctype.startswith("multipart/form-data"):
+            form = await request.form()
+            upload = form.get("file")
+            if upload is None or isinstance(upload, str):
+                raise HTTPException(status_code=400, detail="Multipart body needs a CSV 'file'")
+            model_id = form.get("model_id") or model_id
+            frame = pd.read_csv(io.BytesIO(await upload.read()), dtype=str)
+        elif ctype.startswith("text/csv"):
+            frame = pd.read_csv(io.BytesIO(await request.body()), dtype=str)
         else:
-            insights = [{"note": "No correlations available."}]
-
-        # ----------------------------- AI (Gemini) -----------------------------
-        def _top_k(d, k=10):
-            if not isinstance(d, dict):
-                return []
-            sorted_items = sorted(d.items(), key=lambda kv: abs(kv[1]), reverse=True)[:k]
-            return [
-                {
-                    "feature": kk,
-                    "corr": float(vv),
-                    "direction": "positive" if vv > 0 else "negative",
-                    "strength": "strong" if abs(vv) >= 0.5 else "moderate" if abs(vv) >= 0.3 else "weak",
-                }
-                for kk, vv in sorted_items
-            ]
-
-        numeric_corrs = (numeric_analysis.get("correlations") or {}).copy()
-        numeric_corrs.pop(target, None)
-        numeric_top = _top_k(numeric_corrs, 10)
-
-        cat_corrs = (cat_analysis.get("correlations") or {}).copy()
-        cat_corrs.pop(target, None)
-        cat_top = _top_k(cat_corrs, 10)
-
-        def _fallback_points() -> list[str]:
-            pts: list[str] = []
-            if numeric_top:
-                f, c = numeric_top[0]["feature"], numeric_top[0]["corr"]
-                pts.append(f"{f} strongly {'lifts' if c > 0 else 'suppresses'} {target}; prioritize levers here to move topline.")
-            if cat_top:
-                f, c = cat_top[0]["feature"], cat_top[0]["corr"]
-                pts.append(f"Segments by '{f}' show performance spread—target interventions at underperforming levels.")
-            if len(pts) < 3:
-                pts.append("Concentrate testing on top drivers; validate causality before scaling investment.")
-            return pts[:3]
-
-        try:
-            GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-            if not GEMINI_API_KEY:
-                ai_error = "GEMINI_API_KEY not set"
-                ai_insights = _fallback_points()
-                ai_model = None
-            else:
-                try:
-                    import google.generativeai as genai
-                except Exception as ie:
-                    ai_error = f"google-generativeai not installed: {ie}"
-                    ai_insights = _fallback_points()
-                    ai_model = None
-                else:
-                    import textwrap, json
-
-                    genai.configure(api_key=GEMINI_API_KEY)
-                    ai_model = "gemini-1.5-flash"
-
-                    system_instructions = textwrap.dedent("""
-                        You are a senior data strategist advising executives.
-
-                        You receive:
-                          • A dataset summary (rows, columns, target column name)
-                          • Top correlations between numeric and categorical features and the target
-
-                        Your audience:
-                          • Senior executives, strategy heads, and decision-makers with limited time but deep business acumen
-                          • They seek forward-looking insights, not surface-level observations
-
-                        TASK:
-                          • Write exactly 3 concise, high-impact, decision-oriented one-liners (max 25 words each).
-                          • Interpret correlations in context — focus on why these relationships might exist and what decisions they imply.
-                          • Highlight potential causal mechanisms, business drivers, or strategic opportunities — not descriptive trivia.
-                          • If patterns suggest risks, inefficiencies, or leverage points, articulate them clearly.
-                          • Avoid obvious statements (“X correlates with Y”) — instead explain significance (“Faster onboarding drives retention—optimize training.”)
-                          • Prefer insights that imply action or resource allocation.
-                          • Avoid statistical jargon.
-                          • Be specific and directional; use verbs that show causality or enablement.
-                          • Be bold but credible — it’s fine to hypothesize causes if phrased as “suggests” or “indicates”.
-
-                        FORMAT:
-                          • Return a pure JSON array of 3 strings.
-                          • No numbering, no bullets, no markdown.
-                    """)
-
-                    payload_for_ai = {
-                        "target": target,
-                        "dataset_profile": {"rows": int(df.shape[0]), "cols": int(df.shape[1])},
-                        "numeric_correlations_top": numeric_top,
-                        "categorical_correlations_top": cat_top,
-                    }
-                    prompt = f"DATA (JSON):\n{payload_for_ai}\n\nOUTPUT:\nReturn exactly 3 insights as a JSON list of strings."
-
-                    try:
-                        model = genai.GenerativeModel(ai_model)
-                        resp = model.generate_content(system_instructions + "\n\n" + prompt)
-
-                        def _resp_to_text(r):
-                            try:
-                                t = getattr(r, "text", None)
-                                if t:
-                                    return t
-                                cands = getattr(r, "candidates", None)
-                                if cands:
-                                    parts = getattr(cands[0].content, "parts", [])
-                                    return "".join(getattr(p, "text", "") for p in parts if getattr(p, "text", None))
-                            except Exception:
-                                pass
-                            return ""
-
-                        text = _resp_to_text(resp).strip()
-
-                        try:
-                            parsed = json.loads(text)
-                            if isinstance(parsed, list) and parsed:
-                                ai_insights = [str(x) for x in parsed][:3]
-                            else:
-                                ai_error = "AI returned non-JSON or empty"
-                                ai_insights = _fallback_points()
-                        except Exception as je:
-                            ai_error = f"JSON parse error: {je}"
-                            # Fallback: pick first 3 non-empty lines
-                            fallback = []
-                            for line in text.splitlines():
-                                line = line.strip("-• ").strip()
-                                if line:
-                                    fallback.append(line)
-                                if len(fallback) >= 3:
-                                    break
-                            ai_insights = fallback or _fallback_points()
-
-                        ai_insights = [s[:220] for s in ai_insights][:3]
-                    except Exception as ge:
-                        ai_error = f"Generation error: {ge}"
-                        ai_insights = _fallback_points()
-                        ai_model = None
-        except Exception as outer:
-            ai_error = f"Unexpected AI block error: {outer}"
-            ai_insights = _fallback_points()
-            ai_model = None
-
-    # ===== MODEL TRAINER =====
-    elif mode == "model_trainer":
-        try:
-            # Lazy imports so the other path doesn't pay the cost
-            import joblib
-            from sklearn.compose import ColumnTransformer
-            from sklearn.preprocessing import OneHotEncoder
-            from sklearn.pipeline import Pipeline
-            from sklearn.model_selection import train_test_split
-            from sklearn.metrics import mean_squared_error, r2_score, accuracy_score
-            from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
-
-            X = df[[c for c in df.columns if c != target]].copy()
-            y = df[target].copy()
-
-            cat_cols = X.select_dtypes(include=['object', 'category', 'bool']).columns.tolist()
-
-            preprocessor = ColumnTransformer(
-                transformers=[
-                    ('cat', OneHotEncoder(handle_unknown='ignore', sparse_output=False), cat_cols)
-                ],
-                remainder='passthrough'
-            )
-
-            X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-            if target_numeric:
-                model = Pipeline([
-                    ('preprocessor', preprocessor),
-                    ('regressor', RandomForestRegressor(n_estimators=100, random_state=42))
-                ])
-                model.fit(X_train, y_train)
-                y_pred = model.predict(X_test)
-                r2 = float(r2_score(y_test, y_pred))
-                rmse = float(mean_squared_error(y_test, y_pred) ** 0.5)
-
-                # Save PKL entirely in memory and upload to Supabase
-                pkl_buf = io.BytesIO()
-                joblib.dump(model, pkl_buf)
-                pkl_buf.seek(0)
-                model_key = _supa_key("models", f"{uuid.uuid4().hex}.pkl")
-                model_url = upload_bytes(pkl_buf.getvalue(), key=model_key, content_type="application/octet-stream")
-
-                model_info = {
-                    "model_type": "RandomForestRegressor",
-                    "r2_score": r2,
-                    "rmse": rmse,
-                    "download_url": model_url,
-                }
-            else:
-                model = Pipeline([
-                    ('preprocessor', preprocessor),
-                    ('classifier', RandomForestClassifier(n_estimators=100, random_state=42))
-                ])
-                model.fit(X_train, y_train)
-                y_pred = model.predict(X_test)
-                acc = float(accuracy_score(y_test, y_pred))
-
-                pkl_buf = io.BytesIO()
-                joblib.dump(model, pkl_buf)
-                pkl_buf.seek(0)
-                model_key = _supa_key("models", f"{uuid.uuid4().hex}.pkl")
-                model_url = upload_bytes(pkl_buf.getvalue(), key=model_key, content_type="application/octet-stream")
-
-                model_info = {
-                    "model_type": "RandomForestClassifier",
-                    "accuracy": acc,
-                    "download_url": model_url,
-                }
-
-            steps.append({
-                "step": "model_training",
-                "message": f"Model trained successfully: {model_info.get('model_type')}",
-                "status": "done"
-            })
-        except Exception as e:
-            steps.append({"step": "model_training_error", "message": str(e), "status": "error"})
-
-    else:
-        # Unknown mode
-        raise HTTPException(status_code=400, detail="mode must be 'business_insights' or 'model_trainer'")
-
-    # -------------------- Return --------------------
-    return {
-        "status": "success",
-        "mode": mode,
-        "target": target,
-        "steps": steps,
-        "numeric_analysis": numeric_analysis,
-        "categorical_analysis": cat_analysis,
-        "insights": insights,
-        "ai_insights": ai_insights,    # <- will never be empty now; fallback kicks in
-        "ai_model": ai_model,
-        "ai_error": ai_error,          # <- optional, helpful during setup; remove later if you want
-        "model_info": model_info,
+            body = await request.json()
+            records = body.get("records") if isinstance(body, dict) else body
+            if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+                raise HTTPException(status_code=400, detail="'records' must be a list of objects")
+            if isinstance(body, dict):
+                model_id = body.get("model_id") or model_id
+                proba = bool(body.get("proba", proba))
+            frame = pd.DataFrame.from_records(records)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Could not read batch: {e}")
+    return await _predict(model_id, frame, proba)
+
+# -------------------- Metrics --------------------
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Prometheus text exposition of this server process's metrics."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# -------------------- Startup / readiness --------------------
+@app.on_event("startup")
+def _start_warmup() -> None:
+    warmup.start()
+    if warmup.done and warmup.finished_at is not None:
+        WARMUP_SECONDS.set(warmup.finished_at - warmup.started_at)
+
+@app.get("/ready")
+async def readiness():
+    """200 once warm-up finished cleanly (always, in lazy mode); 503 while warming up or if a task failed."""
+    status = warmup.status()
+    if status["seconds"] is not None:
+        WARMUP_SECONDS.set(status["seconds"])
+    body = {
+        "ready": warmup.ready,
+        **status,
+        "import_seconds": round(IMPORT_TIME, 4),
+        "import_budget": IMPORT_BUDGET,
+        "import_over_budget": IMPORT_TIME > IMPORT_BUDGET,
     }
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
+@app.on_event("shutdown")
+async def _shutdown_jobs() -> None:
+    job_manager.shutdown()
+    await aclose_storage()
@@ -0,0 +1,1244 @@
+# backend/pipeline.py
+"""
+The /process pipeline, kept free of FastAPI so it can run inside a job worker process.
+"""
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.artifacts import ARTIFACT_COMPRESS, ARTIFACT_EXTENSIONS, ARTIFACT_FORMATS, export_artifact
+from utils.association import LABEL_MAP_MAX_LEVELS, MEASURES, associate
+from utils.charts import CHART_FORMATS, ChartBatch, bar_spec, heatmap_spec, resolve, resolve_all
+from utils import columnar, dataset_profile
+from utils.dataset_cache import content_hash, content_hash_file, dataset_cache
+from utils.drivers import FeatureCodes, insight_features, rank_drivers
+from utils.gemini import insight_service, top_correlations, top_drivers
+from utils.impute import CATEGORICAL_STRATEGIES, NUMERIC_STRATEGIES, Imputer
+from utils.metrics import StepClock, profile_call
+from utils.model_registry import METRIC_KEYS, model_registry
+from utils.model_search import CLASSIFICATION, MAX_TIME_BUDGET, REGRESSION, SEARCH_BUDGET, ModelSearch, score
+from utils.sampling import (
+    CONFIDENCE_LEVEL, SAMPLE_METHODS, auto_sample_size, bootstrap_association_ci, bootstrap_corr_ci, draw_sample,
+)
+from utils.schema import CATEGORICAL_DTYPES, infer_schema, read_csv
+from utils.streaming_stats import StreamingStats, scan_frame
+from utils.training_cache import TRAINING_CACHE_ENABLED, training_cache
+from utils.supabase import download_bytes, download_path, upload_bytes, upload_path  # pooled storage client
+
+MODES = ("business_insights", "model_trainer")
+TRAINING_MODES = ("auto", "in_memory", "streaming")  # auto streams datasets above MLIFY_STREAM_TRAIN_BYTES
+
+BATCH_MAX_ITEMS = int(os.getenv("MLIFY_BATCH_MAX_ITEMS", "50"))  # dataset/target pairs per /process/batch
+BATCH_WORKERS = int(os.getenv("MLIFY_BATCH_WORKERS", str(min(4, os.cpu_count() or 1))))  # per-target threads
+DATASET_KEYS = ("file_url", "filename", "dataset_id", "columnar_url")
+BATCH_KEYS = ("target", "targets", "datasets") + DATASET_KEYS
+
+ProgressFn = Callable[[Dict[str, Any]], None]
+CancelFn = Callable[[], bool]
+
+
+class PipelineError(ValueError):
+    """Bad request input or unusable dataset; routes map it to a 400."""
+
+
+class JobCancelled(Exception):
+    """Raised between steps once the caller has asked to cancel."""
+
+
+# -------------------- Small helpers --------------------
+def supa_key(prefix: str, filename: str) -> str:
+    """Consistent key like 'uploads/abcd1234__file.csv'."""
+    uid = uuid.uuid4().hex[:8]
+    return f"{prefix.rstrip('/')}/{uid}__{filename}"
+
+def _upload_png(png: bytes, name_hint: str) -> str:
+    """Upload rendered PNG bytes to Supabase; return public URL."""
+    key = supa_key("graphs", name_hint if name_hint.endswith(".png") else f"{name_hint}.png")
+    return upload_bytes(png, key=key, content_type="image/png")
+
+def _fetch_columnar(file_url: str, columnar_url: str | None) -> Optional[str]:
+    """
+    Stream the Parquet copy (and profile) /upload stored next to the CSV into
+    the local cache; returns its dataset id, or None if there isn't one.
+    """
+    url = columnar_url or columnar.columnar_url(file_url)
+    if url is None or not columnar.available():
+        return None
+    fd, tmp = tempfile.mkstemp(suffix=columnar.COLUMNAR_SUFFIX, dir=dataset_cache.tmp_dir)
+    os.close(fd)
+    try:
+        download_path(url, tmp)
+        footer = columnar.read_footer(tmp) or {}
+    except Exception:
+        os.remove(tmp)
+        return None  # older upload without a columnar copy
+    digest = footer.get("dataset_id") or content_hash_file(tmp)
+    if footer.get("schema"):
+        dataset_cache.put_schema(digest, footer["schema"])
+    dataset_cache.put_columnar(digest, tmp, url=file_url)
+    sidecar = dataset_profile.profile_url(file_url)
+    if sidecar and dataset_cache.get_profile(digest) is None:
+        try:
+            dataset_cache.put_profile(digest, json.loads(download_bytes(sidecar)))
+        except Exception:
+            pass  # /process recomputes what it needs
+    return digest
+
+def _load_columnar(
+    file_url: str, columnar_url: str | None, columns: Optional[List[str]],
+) -> Optional[Tuple[pd.DataFrame, str]]:
+    """Fetch the Parquet copy /upload stored next to the CSV and load it; None if there isn't one."""
+    digest = _fetch_columnar(file_url, columnar_url)
+    if digest is None:
+        return None
+    return dataset_cache.get(digest, columns), digest
+
+def _columnar_source(params: Dict[str, Any]) -> Optional[Tuple[str, str, Dict[str, Any]]]:
+    """
+    (local Parquet path, dataset id, profile) of the request's dataset, for
+    reading it in chunks instead of loading it; None when it has no Parquet
+    copy. A missing or stale profile is rebuilt from the file.
+    """
+    file_url = params["file_url"]
+    digest = params["dataset_id"] or dataset_cache.resolve(file_url)
+    path = dataset_cache.columnar_path(digest) if digest else None
+    if path is None:
+        digest = _fetch_columnar(file_url, params["columnar_url"])
+        path = dataset_cache.columnar_path(digest) if digest else None
+        if path is None:
+            return None
+    else:
+        dataset_cache.register_url(file_url, digest)
+    profile = dataset_cache.get_profile(digest)
+    if (
+        not profile or profile.get("version") != dataset_profile.PROFILE_VERSION
+        or list(profile.get("columns") or {}) != columnar.column_names(path)
+    ):
+        profile = dataset_profile.build_profile_parquet(path, dataset_cache.get_schema(digest), digest)
+        dataset_cache.put_profile(digest, profile)
+    return path, digest, profile
+
+def _load_dataset(
+    file_url: str,
+    dataset_id: str | None = None,
+    columns: Optional[List[str]] = None,
+    columnar_url: str | None = None,
+) -> Tuple[pd.DataFrame, str]:
+    """
+    Resolve a dataset from the local cache, then from the upload's Parquet copy
+    in storage; fall back to downloading + parsing the CSV. With `columns`,
+    only those columns are decoded where the source is columnar. Returns the
+    frame and its dataset id (the key of its schema and profile).
+    """
+    digest = dataset_id or dataset_cache.resolve(file_url)
+    if digest:
+        df = dataset_cache.get(digest, columns)
+        if df is not None:
+            dataset_cache.register_url(file_url, digest)
+            return df, digest
+
+    loaded = _load_columnar(file_url, columnar_url, columns)
+    if loaded is not None:
+        return loaded
+
+    raw = download_bytes(file_url)
+    digest = content_hash(raw)
+    df = dataset_cache.get(digest, columns)  # same bytes may be cached under another URL
+    if df is None:
+        schema = dataset_cache.get_schema(digest)
+        if schema is None:
+            schema = infer_schema(raw)
+            dataset_cache.put_schema(digest, schema)
+        df = read_csv(raw, schema)
+        dataset_cache.put(digest, df, url=file_url)
+        return (df if columns is None else df[[c for c in columns if c in df.columns]]).copy(), digest
+    dataset_cache.register_url(file_url, digest)
+    return df, digest
+
+@contextmanager
+def _timed(timings: Optional[Dict[str, float]], stage: str):
+    """Add the block's wall time to `timings[stage]` (no-op when timings is None)."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - t0
+
+# -------------------- Pipeline --------------------
+def parse_payload(payload: Any) -> Dict[str, Any]:
+    """Validate a /process body up front (clear 400s, no 422) and normalise file_url."""
+    if not isinstance(payload, dict):
+        raise PipelineError("Invalid JSON body: expected an object")
+
+    target = payload.get("target")
+    mode = payload.get("mode")
+    file_url = payload.get("file_url") or payload.get("filename")  # fallback for legacy clients
+    dataset_id = payload.get("dataset_id")
+    columnar_url = payload.get("columnar_url")  # Parquet copy from /upload; derived from file_url if absent
+    columns = payload.get("columns")  # feature columns to load (the target is always loaded); default all
+    chart_format = payload.get("chart_format", "png")  # png | spec | both
+    cat_measure = payload.get("cat_measure", "auto")  # auto | eta | cramers_v | mutual_info
+    impute = payload.get("impute") or {}  # {"numeric": "median", "categorical": "mode", ...}
+    time_budget = payload.get("time_budget", SEARCH_BUDGET)  # seconds for model_trainer's model search
+    artifact = payload.get("artifact") or {}  # {"format": "joblib" | "joblib_mmap" | "portable", "compress": 0-9}
+    profile = payload.get("profile", False)  # set by the API from the X-MLify-Profile header
+    retrain = payload.get("retrain", False)  # model_trainer: ignore a cached result for an identical request
+    training = payload.get("training", "auto")  # model_trainer: auto | in_memory | streaming (out-of-core)
+    sample = payload.get("sample")  # true | <rows> | {"size": <rows>|"auto", "method": ..., "seed": ..., "bootstrap": ...}
+
+    # Coerce file_url to plain string if an object slipped through
+    if isinstance(file_url, dict):
+        file_url = (
+            file_url.get("publicURL")
+            or file_url.get("publicUrl")
+            or file_url.get("url")
+            or str(file_url)
+        )
+
+    if not isinstance(target, str) or not target:
+        raise PipelineError("Missing or invalid 'target'")
+    if not isinstance(mode, str) or not mode:
+        raise PipelineError("Missing or invalid 'mode'")
+    if mode not in MODES:
+        raise PipelineError("mode must be 'business_insights' or 'model_trainer'")
+    if not isinstance(file_url, str) or not file_url:
+        raise PipelineError("Missing or invalid 'file_url'")
+    if dataset_id is not None and not isinstance(dataset_id, str):
+        raise PipelineError("Invalid 'dataset_id'")
+    if columnar_url is not None and not isinstance(columnar_url, str):
+        raise PipelineError("Invalid 'columnar_url'")
+    if columns is not None and (
+        not isinstance(columns, list) or not columns or not all(isinstance(c, str) and c for c in columns)
+    ):
+        raise PipelineError("'columns' must be a non-empty list of column names")
+    if chart_format not in CHART_FORMATS:
+        raise PipelineError(f"'chart_format' must be one of {', '.join(CHART_FORMATS)}")
+    if cat_measure not in MEASURES:
+        raise PipelineError(f"'cat_measure' must be one of {', '.join(MEASURES)}")
+    if not isinstance(impute, dict):
+        raise PipelineError("'impute' must be an object")
+    if impute.get("numeric", "median") not in NUMERIC_STRATEGIES:
+        raise PipelineError(f"'impute.numeric' must be one of {', '.join(NUMERIC_STRATEGIES)}")
+    if impute.get("categorical", "mode") not in CATEGORICAL_STRATEGIES:
+        raise PipelineError(f"'impute.categorical' must be one of {', '.join(CATEGORICAL_STRATEGIES)}")
+    if not _finite_number(impute.get("numeric_fill_value", 0.0)):
+        raise PipelineError("'impute.numeric_fill_value' must be a finite number")
+    if not isinstance(impute.get("fill_value", "Unknown"), (str, int, float, bool)):
+        raise PipelineError("'impute.fill_value' must be a string, number or boolean")
+    impute_opts = {k: impute[k] for k in ("numeric", "categorical", "fill_value", "numeric_fill_value") if k in impute}
+    if isinstance(time_budget, bool) or not isinstance(time_budget, (int, float)) or not 0 < time_budget <= MAX_TIME_BUDGET:
+        raise PipelineError(f"'time_budget' must be a number of seconds in (0, {MAX_TIME_BUDGET:g}]")
+    if not isinstance(artifact, dict):
+        raise PipelineError("'artifact' must be an object")
+    artifact_opts = {"format": artifact.get("format", "joblib"), "compress": artifact.get("compress", ARTIFACT_COMPRESS)}
+    if artifact_opts["format"] not in ARTIFACT_FORMATS:
+        raise PipelineError(f"'artifact.format' must be one of {', '.join(ARTIFACT_FORMATS)}")
+    compress = artifact_opts["compress"]
+    if isinstance(compress, bool) or not isinstance(compress, int) or not 0 <= compress <= 9:
+        raise PipelineError("'artifact.compress' must be an integer between 0 and 9")
+    if not isinstance(profile, bool):
+        raise PipelineError("'profile' must be a boolean")
+    if not isinstance(retrain, bool):
+        raise PipelineError("'retrain' must be a boolean")
+    if training not in TRAINING_MODES:
+        raise PipelineError(f"'training' must be one of {', '.join(TRAINING_MODES)}")
+    if training == "streaming" and mode != "model_trainer":
+        raise PipelineError("'training' is only supported for model_trainer")
+    sample_opts = _parse_sample(sample)
+    if sample_opts is not None and mode != "business_insights":
+        raise PipelineError("'sample' is only supported for business_insights")
+
+    return {
+        "target": target,
+        "mode": mode,
+        "file_url": file_url,
+        "dataset_id": dataset_id,
+        "columnar_url": columnar_url,
+        "columns": None if columns is None else [target] + [c for c in dict.fromkeys(columns) if c != target],
+        "chart_format": chart_format,
+        "impute": impute_opts,
+        "cat_measure": cat_measure,
+        "sample": sample_opts,
+        "time_budget": float(time_budget),
+        "artifact": artifact_opts,
+        "profile": profile,
+        "retrain": retrain,
+        "training": training,
+    }
+
+
+def _finite_number(v: Any) -> bool:
+    """A JSON number (not a bool) that fits a float64 column: no NaN, inf or overflowing integer."""
+    if isinstance(v, bool) or not isinstance(v, (int, float)):
+        return False
+    try:
+        return bool(np.isfinite(float(v)))
+    except OverflowError:
+        return False
+
+
+def _parse_sample(sample: Any) -> Optional[Dict[str, Any]]:
+    """Normalise the opt-in `sample` option; None means analyse every row."""
+    if sample is None or sample is False:
+        return None
+    if sample is True:
+        sample = {}
+    elif isinstance(sample, int):
+        sample = {"size": sample}
+    if not isinstance(sample, dict):
+        raise PipelineError("'sample' must be true, a row count or an object")
+    size = sample.get("size", "auto")
+    method = sample.get("method", "reservoir")
+    seed = sample.get("seed", 42)
+    rounds = sample.get("bootstrap", 200)
+    if size != "auto" and (not isinstance(size, int) or isinstance(size, bool) or size < 10):
+        raise PipelineError("'sample.size' must be 'auto' or an integer >= 10")
+    if method not in SAMPLE_METHODS:
+        raise PipelineError(f"'sample.method' must be one of {', '.join(SAMPLE_METHODS)}")
+    if not isinstance(seed, int) or isinstance(seed, bool):
+        raise PipelineError("'sample.seed' must be an integer")
+    if not isinstance(rounds, int) or isinstance(rounds, bool) or not 0 <= rounds <= 2000:
+        raise PipelineError("'sample.bootstrap' must be an integer between 0 and 2000")
+    return {"size": size, "method": method, "seed": seed, "bootstrap": rounds}
+
+
+def refine_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """The same request over the full dataset (what a sampled preview's follow-up submits)."""
+    return {k: v for k, v in payload.items() if k != "sample"}
+
+
+def parse_batch_payload(payload: Any) -> Dict[str, Any]:
+    """
+    Validate a /process/batch body: a /process body whose `target` may be a
+    `targets` list and whose dataset (file_url, dataset_id, columnar_url) may
+    be a `datasets` list of URLs or objects, each optionally with its own
+    `targets`. Returns the mode and, per dataset, the parsed params of each target.
+    """
+    if not isinstance(payload, dict):
+        raise PipelineError("Invalid JSON body: expected an object")
+    if payload.get("sample") not in (None, False):
+        raise PipelineError("'sample' is not supported for batch requests")
+    if payload.get("training") == "streaming":
+        raise PipelineError("'training': 'streaming' is not supported for batch requests")
+    targets = payload.get("targets", [payload.get("target")])
+    datasets = payload.get("datasets")
+    common = {k: v for k, v in payload.items() if k not in BATCH_KEYS}
+
+    if not isinstance(targets, list) or not targets:
+        raise PipelineError("'targets' must be a non-empty list of column names")
+    if datasets is None:
+        datasets, label = [{k: payload[k] for k in DATASET_KEYS if k in payload}], None
+    elif not isinstance(datasets, list) or not datasets:
+        raise PipelineError("'datasets' must be a non-empty list of URLs or objects")
+    else:
+        label = "datasets"
+
+    groups: List[List[Dict[str, Any]]] = []
+    for i, ds in enumerate(datasets):
+        if isinstance(ds, str):
+            ds = {"file_url": ds}
+        prefix = f"{label}[{i}]: " if label else ""
+        if not isinstance(ds, dict):
+            raise PipelineError(f"{prefix}expected a URL or an object")
+        ds_targets = ds.get("targets", targets)
+        if not isinstance(ds_targets, list) or not ds_targets:
+            raise PipelineError(f"{prefix}'targets' must be a non-empty list of column names")
+        source = {k: ds[k] for k in DATASET_KEYS if k in ds}
+        try:
+            groups.append([parse_payload({**common, **source, "target": t}) for t in dict.fromkeys(ds_targets)])
+        except TypeError:
+            raise PipelineError(f"{prefix}'targets' must be a non-empty list of column names")
+        except PipelineError as e:
+            raise PipelineError(f"{prefix}{e}")
+
+    total = sum(len(g) for g in groups)
+    if total > BATCH_MAX_ITEMS:
+        raise PipelineError(f"Batch has {total} dataset/target pairs; the limit is {BATCH_MAX_ITEMS}")
+    return {"mode": groups[0][0]["mode"], "datasets": groups, "profile": groups[0][0]["profile"]}
+
+
+def run_process(
+    payload: Dict[str, Any],
+    progress: Optional[ProgressFn] = None,
+    should_cancel: Optional[CancelFn] = None,
+    timings: Optional[Dict[str, float]] = None,
+) -> Dict[str, Any]:
+    """
+    Run the full /process pipeline and return the response body.
+    `progress` receives every entry of `steps` as soon as it is produced.
+    `timings` is filled with seconds per stage (load, sample, impute,
+    correlate, render, upload, charts_wait, ai, train, export) and returned
+    as the response's `timings`; render/upload sum per-chart work that
+    overlaps in wall time. With `profile` set the run happens under cProfile.
+    """
+    params = parse_payload(payload)
+    if params["profile"]:
+        result, report = profile_call(_run_process, payload, params, progress, should_cancel, timings)
+        result["profile"] = report
+        return result
+    return _run_process(payload, params, progress, should_cancel, timings)
+
+
+@dataclass
+class _Prepared:
+    """A loaded and imputed dataset plus what the pipeline derived from it; shared by every target analysed on it."""
+    df: pd.DataFrame
+    digest: str
+    profile: Optional[Dict[str, Any]]
+    imputer: Imputer
+    numeric_cols: List[str]
+    categorical_cols: List[str]
+    sample_info: Optional[Dict[str, Any]] = None
+    stats: Optional[StreamingStats] = None  # numeric moments (+ categorical target codes) computed once for a batch
+    driver_codes: Optional[FeatureCodes] = None  # discretised columns for driver ranking, computed once for a batch
+
+    def imputation(self, columns: Sequence[str]) -> Dict[str, Any]:
+        """imputer.to_dict() limited to `columns` (one target's projection of the frame)."""
+        out = self.imputer.to_dict()
+        keep = set(columns)
+        out["fill_values"] = {c: v for c, v in out["fill_values"].items() if c in keep}
+        return out
+
+
+def _recorder(
+    steps: List[Dict[str, Any]],
+    progress: Optional[ProgressFn],
+    should_cancel: Optional[CancelFn],
+    **tags: Any,
+) -> Callable[[Dict[str, Any]], None]:
+    """
+    A `_step` function: record a step and publish it as a progress event; honour
+    cancellation between steps. Each step carries the wall time, CPU time and
+    peak-RSS growth since the previous one, plus `tags` (batch runs label their
+    steps with the dataset and target).
+    """
+    clock = StepClock()
+
+    def _step(entry: Dict[str, Any]) -> None:
+        if should_cancel is not None and should_cancel():
+            raise JobCancelled()
+        entry.update(clock.lap())
+        entry.update(tags)
+        steps.append(entry)
+        if progress is not None:
+            progress(entry)
+
+    return _step
+
+
+def _load(
+    params: Dict[str, Any], columns: Optional[List[str]], timings: Dict[str, float],
+) -> Tuple[pd.DataFrame, str, Optional[Dict[str, Any]]]:
+    """The dataset of `params` (only `columns`, if given), its id and its upload-time profile if that still fits."""
+    try:
+        with _timed(timings, "load"):
+            df, digest = _load_dataset(params["file_url"], params["dataset_id"], columns, params["columnar_url"])
+    except Exception as e:
+        raise PipelineError(f"Could not fetch/read CSV from URL: {e}")
+    # Upload-time profile: null counts, dtype split, imputation statistics and the covariance sketch
+    profile = dataset_cache.get_profile(digest)
+    return df, digest, profile if dataset_profile.matches(profile, df) else None
+
+
+def _prepare(
+    df: pd.DataFrame,
+    digest: str,
+    profile: Optional[Dict[str, Any]],
+    params: Dict[str, Any],
+    payload: Optional[Dict[str, Any]],
+    _step: Callable[[Dict[str, Any]], None],
+    timings: Dict[str, float],
+) -> _Prepared:
+    """Missing-value report, optional sample, imputation and the numeric/categorical split."""
+    target, sample_opts = params["target"], params["sample"]
+
+    # -------------------- Missing Values --------------------
+    missing_before = dataset_profile.missing_counts(profile, df.columns) if profile else df.isnull().sum()
+    total_missing = int(missing_before.sum())
+    _step({
+        "step": "missing_detected",
+        "message": f"Found {total_missing} missing values across {len(missing_before[missing_before>0])} columns.",
+        "status": "done",
+        "details": missing_before[missing_before>0].to_dict()
+    })
+
+    # -------------------- Optional sample (fast preview) --------------------
+    sample_info: Optional[Dict[str, Any]] = None
+    if sample_opts is not None:
+        rows_total = len(df)
+        size = sample_opts["size"]
+        if size == "auto":
+            size = auto_sample_size(rows_total, missing_before.to_dict())
+        if size < rows_total:
+            with _timed(timings, "sample"):
+                df = draw_sample(df, target, size, sample_opts["method"], sample_opts["seed"])
+        sample_info = {
+            "method": sample_opts["method"],
+            "seed": sample_opts["seed"],
+            "size_requested": sample_opts["size"],
+            "rows_sampled": int(len(df)),
+            "rows_total": int(rows_total),
+            "sampled": len(df) < rows_total,
+            "bootstrap_rounds": sample_opts["bootstrap"],
+            "confidence_level": CONFIDENCE_LEVEL,
+            "refine": refine_payload(payload or {}),
+        }
+        _step({
+            "step": "sampled",
+            "message": (
+                f"Analysing a {sample_opts['method']} sample of {len(df)} of {rows_total} rows."
+                if sample_info["sampled"] else f"Dataset has {rows_total} rows; analysing all of them."
+            ),
+            "status": "done",
+        })
+
+    with _timed(timings, "impute"):
+        imputer = Imputer(**params["impute"])
+        known = dataset_profile.known_fills(profile, imputer.numeric, imputer.categorical) if profile else None
+        imputer.fit(df, missing=missing_before, known=known)
+        imputer.transform(df)
+
+    missing_after = int(df[list(imputer.fill_values_)].isnull().sum().sum()) if imputer.fill_values_ else 0
+    _step({
+        "step": "missing_handled",
+        "message": f"Missing values handled. Remaining missing values: {missing_after}.",
+        "status": "done",
+        "imputation": imputer.to_dict(),
+    })
+
+    # -------------------- Feature Types --------------------
+    if profile:
+        numeric_cols, categorical_cols = dataset_profile.column_types(profile, df.columns)
+    else:
+        numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
+        categorical_cols = df.select_dtypes(include=CATEGORICAL_DTYPES).columns.tolist()
+    _step({
+        "step": "separate_types",
+        "message": f"Separated columns into {len(numeric_cols)} numeric and {len(categorical_cols)} categorical.",
+        "status": "done",
+        "numeric_cols": numeric_cols,
+        "categorical_cols": categorical_cols
+    })
+    return _Prepared(df, digest, profile, imputer, numeric_cols, categorical_cols, sample_info)
+
+
+def _code_column(target: str) -> str:
+    """Name of a categorical target's integer codes among the correlation columns."""
+    return f"_target:{target}"
+
+
+def _correlation_stats(prep: _Prepared, targets: Sequence[str]) -> StreamingStats:
+    """
+    Moments of the numeric columns plus the codes of each categorical target in
+    `targets`, from one chunked pass. When every target is numeric and all rows
+    are analysed, the upload profile's sketch (adjusted for the imputed
+    constants) replaces the pass.
+    """
+    df, cols, fill_values = prep.df, prep.numeric_cols, prep.imputer.fill_values_
+    coded = [t for t in targets if not pd.api.types.is_numeric_dtype(df[t])]
+    if prep.profile and not coded and not (prep.sample_info and prep.sample_info["sampled"]):
+        stats = dataset_profile.covariance(prep.profile, cols)
+        fills = {c: float(df[c].dtype.type(fill_values[c])) for c in cols if fill_values.get(c) is not None}
+        try:
+            if stats is not None:
+                return stats.filled(fills)
+        except ValueError:
+            pass  # an all-null column kept its nulls
+    frame = df[cols].assign(**{_code_column(t): pd.factorize(df[t])[0] for t in coded}) if coded else df[cols]
+    return scan_frame(frame, StreamingStats(list(frame.columns)))
+
+
+def _run_process(
+    payload: Dict[str, Any],
+    params: Dict[str, Any],
+    progress: Optional[ProgressFn],
+    should_cancel: Optional[CancelFn],
+    timings: Optional[Dict[str, float]],
+) -> Dict[str, Any]:
+    timings = {} if timings is None else timings
+    steps: List[Dict[str, Any]] = []
+    _step = _recorder(steps, progress, should_cancel)
+    target, columns = params["target"], params["columns"]
+
+    # -------- Out-of-core training: stream the Parquet copy instead of loading it --------
+    if params["mode"] == "model_trainer" and params["training"] != "in_memory":
+        from utils.incremental import STREAM_TRAIN_BYTES, frame_bytes
+
+        streaming = params["training"] == "streaming"
+        try:
+            with _timed(timings, "load"):
+                source = _columnar_source(params)
+        except Exception as e:
+            if streaming:
+                raise PipelineError(f"Could not read the dataset's Parquet copy: {e}")
+            source = None  # auto: the in-memory path reports load errors
+        if source is None and streaming:
+            raise PipelineError("Streaming training needs the Parquet copy /upload stores; this dataset has none.")
+        if source is not None and (streaming or frame_bytes(source[2]) > STREAM_TRAIN_BYTES):
+            return _train_streaming(params, *source, steps, _step, should_cancel, timings)
+
+    # -------- Load dataset (local cache, then the Parquet copy in storage, then the CSV) --------
+    df, digest, profile = _load(params, columns, timings)
+    if target not in df.columns:
+        raise PipelineError(f"Target column '{target}' not found in dataset.")
+    unknown = [c for c in columns or [] if c not in df.columns]
+    if unknown:
+        raise PipelineError(f"Columns not found in dataset: {', '.join(unknown)}")
+
+    prep = _prepare(df, digest, profile, params, payload, _step, timings)
+    return _analyse(prep, prep.df, params, steps, _step, timings)
+
+
+def _analyse(
+    prep: _Prepared,
+    df: pd.DataFrame,
+    params: Dict[str, Any],
+    steps: List[Dict[str, Any]],
+    _step: Callable[[Dict[str, Any]], None],
+    timings: Dict[str, float],
+) -> Dict[str, Any]:
+    """
+    The per-target half of the pipeline on a prepared dataset (`df` is prep.df
+    or a projection of it): correlations, charts and insights, or model
+    training. Returns the /process response body.
+    """
+    target, mode = params["target"], params["mode"]
+    chart_format, cat_measure = params["chart_format"], params["cat_measure"]
+    sample_opts, sample_info = params["sample"], prep.sample_info
+    time_budget = params["time_budget"]
+    digest, profile = prep.digest, prep.profile
+    present = set(df.columns)
+    numeric_cols = [c for c in prep.numeric_cols if c in present]
+    categorical_cols = [c for c in prep.categorical_cols if c in present]
+    imputation = prep.imputation(df.columns)
+    bootstrap_rounds = sample_info["bootstrap_rounds"] if sample_info and sample_info["sampled"] else 0
+
+    target_numeric = pd.api.types.is_numeric_dtype(df[target])
+
+    # -------------------- Branch on mode --------------------
+    numeric_analysis: Dict[str, Any] = {}
+    cat_analysis: Dict[str, Any] = {}
+    insights: list[Dict[str, Any]] = []
+    model_info: Dict[str, Any] = {}
+    drivers: Optional[Dict[str, Any]] = None
+    ai_insights: list[str] = []
+    ai_model: str | None = None
+    ai_error: str | None = None  # <- for debugging visibility
+    ai_cached = False
+
+    # ===== BUSINESS INSIGHTS =====
+    if mode == "business_insights":
+        # Charts render + upload in the background while the analysis continues
+        charts = ChartBatch(_upload_png, chart_format)
+        heatmap_future = None
+        cat_plot_futures: list = []
+        try:
+            # Numeric correlations + heatmap from one chunked pass over the numeric block
+            if numeric_cols:
+                with _timed(timings, "correlate"):
+                    target_key = target if target_numeric else _code_column(target)
+                    # Shared by a batch's targets, or computed here for this one
+                    stats = prep.stats if prep.stats is not None else _correlation_stats(prep, [target])
+                    wanted = numeric_cols + ([] if target_numeric else [target_key])
+                    if stats.columns != wanted:
+                        stats = stats.subset(wanted)
+                    full_corr = stats.corr()
+                    corr_series = (
+                        full_corr[target_key]
+                        .drop(_code_column(target), errors="ignore")
+                        .sort_values(key=abs, ascending=False)
+                    )
+                    numeric_analysis["correlations"] = corr_series.to_dict()
+                    if bootstrap_rounds:
+                        y = df[target] if target_numeric else pd.Series(pd.factorize(df[target])[0], index=df.index)
+                        numeric_analysis["confidence_intervals"] = bootstrap_corr_ci(
+                            df[numeric_cols], y, rounds=bootstrap_rounds, seed=sample_opts["seed"],
+                        )
+
+                corrmat = full_corr.loc[numeric_cols, numeric_cols]
+                spec = heatmap_spec(corrmat)
+                heatmap_future = charts.add(spec, "num_corr_heatmap")
+                if charts.wants_spec:
+                    numeric_analysis["corr_heatmap_spec"] = spec
+            else:
+                numeric_analysis["note"] = "No numeric columns found."
+
+            _step({"step": "numeric_analysis", "message": "Numeric correlations computed.", "status": "done"})
+
+        except Exception as e:
+            _step({"step": "numeric_analysis_error", "message": str(e), "status": "error"})
+
+        # Categorical side
+        if categorical_cols:
+            try:
+                with _timed(timings, "correlate"):
+                    assoc = associate(df, categorical_cols, target, target_numeric, measure=cat_measure)
+                    # Identifier-like columns (a level per row) carry no signal: listed, not ranked or plotted
+                    ranked_cols = [col for col, a in assoc.items() if not a.identifier]
+                    corr_cat = pd.Series(
+                        {col: assoc[col].value for col in ranked_cols}, dtype=float
+                    ).sort_values(key=abs, ascending=False)
+                    cat_analysis["correlations"] = corr_cat.to_dict()
+                    cat_analysis["measure"] = next(iter(assoc.values())).measure
+                    identifiers = [col for col, a in assoc.items() if a.identifier]
+                    if identifiers:
+                        cat_analysis["identifier_columns"] = identifiers
+                    if bootstrap_rounds and ranked_cols:
+                        cat_analysis["confidence_intervals"] = bootstrap_association_ci(
+                            df, ranked_cols, target, cat_analysis["measure"],
+                            rounds=bootstrap_rounds, seed=sample_opts["seed"],
+                        )
+                cat_analysis["label_encoding_map"] = {col: a.label_map() for col, a in assoc.items()}
+                truncated = {col: len(a.levels) for col, a in assoc.items() if len(a.levels) > LABEL_MAP_MAX_LEVELS}
+                if truncated:
+                    cat_analysis["label_encoding_truncated"] = truncated  # col -> total level count
+
+                # Top 3 category plots (per-level stats come straight from the association pass)
+                cat_specs: list[Dict[str, Any]] = []
+                for col in list(corr_cat.index)[:3]:
+                    vals = assoc[col].level_series()
+                    spec = bar_spec(vals, f"{col} vs {target}", x_label=col)
+                    cat_plot_futures.append(charts.add(spec, f"cat_{col}_vs_{target}"))
+                    cat_specs.append(spec)
+                if charts.wants_spec:
+                    cat_analysis["plot_specs"] = cat_specs
+                _step({"step": "cat_analysis", "message": "Categorical correlations computed.", "status": "done"})
+            except Exception as e:
+                _step({"step": "cat_analysis_error", "message": str(e), "status": "error"})
+        else:
+            cat_analysis["note"] = "No categorical columns found."
+            _step({"step": "cat_analysis_skipped", "message": "No categorical columns found.", "status": "done"})
+
+        # Driver ranking: mutual information of every feature with the target from one discretised pass
+        features = [c for c in numeric_cols + categorical_cols if c != target]
+        if features:
+            try:
+                with _timed(timings, "drivers"):
+                    codes = prep.driver_codes
+                    if codes is None:
+                        seed = sample_opts["seed"] if sample_opts else 42
+                        codes = FeatureCodes(df, numeric_cols, categorical_cols, seed=seed)
+                    drivers = rank_drivers(
+                        codes, target, features, correlations=numeric_analysis.get("correlations"),
+                    )
+                _step({
+                    "step": "driver_ranking",
+                    "message": f"Ranked {len(features)} features by mutual information on {drivers['rows_used']} rows.",
+                    "status": "done",
+                })
+            except Exception as e:
+                drivers = None
+                _step({"step": "driver_ranking_error", "message": str(e), "status": "error"})
+
+        if charts.wants_png:
+            with _timed(timings, "charts_wait"):
+                chart_errors = charts.wait()
+            if timings is not None:
+                timings["render"] = timings.get("render", 0.0) + charts.render_seconds
+                timings["upload"] = timings.get("upload", 0.0) + charts.upload_seconds
+            if heatmap_future is not None:
+                numeric_analysis["corr_heatmap"] = resolve(heatmap_future)
+            if categorical_cols:
+                cat_analysis["plots"] = resolve_all(cat_plot_futures)
+            if chart_errors:
+                _step({"step": "charts_error", "message": "; ".join(chart_errors), "status": "error"})
+
+        # Insights (top/low features): driver strengths, or |correlation| order if the ranking failed
+        if drivers is not None and drivers["drivers"]:
+            ranked = insight_features(drivers["drivers"])
+        else:
+            combined_corr = {
+                **(numeric_analysis.get("correlations") or {}),
+                **(cat_analysis.get("correlations") or {}),
+            }
+            combined_corr.pop(target, None)
+            ranked = sorted(combined_corr.items(), key=lambda kv: abs(kv[1]), reverse=True)
+        if ranked:
+            top_features = ranked[:3]
+            low_features = ranked[-5:]
+            insights = [
+                {"top_features": [{k: v} for k, v in top_features]},
+                {"low_features": [{k: v} for k, v in low_features]},
+            ]
+        else:
+            insights = [{"note": "No correlations available."}]
+
+        # ----------------------------- AI (Gemini) -----------------------------
+        numeric_corrs = (numeric_analysis.get("correlations") or {}).copy()
+        numeric_corrs.pop(target, None)
+        cat_corrs = (cat_analysis.get("correlations") or {}).copy()
+        cat_corrs.pop(target, None)
+        payload_for_ai = {
+            "target": target,
+            "dataset_profile": {"rows": int(df.shape[0]), "cols": int(df.shape[1])},
+            "numeric_correlations_top": top_correlations(numeric_corrs, 10),
+            "categorical_correlations_top": top_correlations(cat_corrs, 10),
+            "drivers_top": top_drivers(drivers["drivers"] if drivers else [], 10),
+        }
+        # Cached per (payload, model) across workers; falls back to rule-based points on any failure
+        with _timed(timings, "ai"):
+            ai = insight_service.generate(payload_for_ai)
+        ai_insights, ai_model, ai_error, ai_cached = ai["insights"], ai["model"], ai["error"], ai["cached"]
+
+    # ===== MODEL TRAINER =====
+    elif mode == "model_trainer":
+        # Same data, target, options and trainer config as an earlier run: reuse its model instead of retraining
+        train_key = _training_key(digest, params)
+        cached_info = _cached_model(train_key, params["retrain"], _step)
+        if cached_info is not None:
+            model_info = cached_info
+        else:
+            try:
+                # Lazy imports so the other path doesn't pay the cost
+                from sklearn.model_selection import train_test_split
+                from sklearn.metrics import mean_squared_error
+                from utils.preprocess import plan_preprocessing
+
+                X = df[[c for c in df.columns if c != target]]
+                y = df[target]
+
+                cat_cols = X.select_dtypes(include=CATEGORICAL_DTYPES).columns.tolist()
+                plan = plan_preprocessing(X, cat_cols)
+                if not plan.columns:
+                    raise PipelineError("No usable feature columns after dropping identifier/constant columns.")
+                X = X[plan.columns]
+                task = REGRESSION if target_numeric else CLASSIFICATION
+                _step(_plan_step(plan))
+
+                X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+                with _timed(timings, "train"):
+                    search = ModelSearch(task, plan, time_budget=time_budget).fit(X_train, y_train)
+                model = search.best_
+                estimator = model[-1]
+                _step({
+                    "step": "model_search",
+                    "message": (
+                        f"Compared {len(search.leaderboard_)} candidates in {search.elapsed_:.1f}s; "
+                        f"best: {search.best_candidate_.name}."
+                    ),
+                    "status": "done",
+                })
+
+                model_info = {"model_type": type(estimator).__name__}
+                if target_numeric:
+                    y_pred = model.predict(X_test)
+                    model_info["r2_score"] = score(task, model, X_test, y_test)
+                    model_info["rmse"] = float(mean_squared_error(y_test, y_pred) ** 0.5)
+                else:
+                    model_info["accuracy"] = score(task, model, X_test, y_test)
+                feature_schema = {
+                    c: "numeric" if c in plan.numeric else "bool" if pd.api.types.is_bool_dtype(X[c]) else "categorical"
+                    for c in plan.columns
+                }
+                model_info.update({
+                    "imputation": imputation,  # reuse these fills before predicting
+                    "preprocessing": plan.to_dict(),
+                    "search": search.summary(),
+                })
+                _publish_model(model, model_info, feature_schema, params, task, train_key, timings)
+                _step({
+                    "step": "model_training",
+                    "message": f"Model trained successfully: {model_info.get('model_type')}",
+                    "status": "done"
+                })
+            except Exception as e:
+                _step({"step": "model_training_error", "message": str(e), "status": "error"})
+
+    else:
+        # Unknown mode (parse_payload already rejects these)
+        raise PipelineError("mode must be 'business_insights' or 'model_trainer'")
+
+    # -------------------- Return --------------------
+    return {
+        "status": "success",
+        "mode": mode,
+        "target": target,
+        "steps": steps,
+        "numeric_analysis": numeric_analysis,
+        "categorical_analysis": cat_analysis,
+        "insights": insights,
+        "ai_insights": ai_insights,    # <- will never be empty now; fallback kicks in
+        "ai_model": ai_model,
+        "ai_error": ai_error,          # <- optional, helpful during setup; remove later if you want
+        "ai_cached": ai_cached,        # True when the insights came from the insight cache
+        "model_info": model_info,
+        "drivers": drivers,            # business_insights: features ranked by mutual information with the target
+        "sample": sample_info,         # None when every row was analysed
+        "profile_reused": profile is not None,  # upload-time profile replaced the recomputation
+        "timings": {k: round(v, 4) for k, v in timings.items()},  # seconds per stage
+    }
+
+
+# -------------------- Model training --------------------
+def _training_key(digest: str, params: Dict[str, Any], streaming: bool = False) -> Optional[str]:
+    """Training cache key of a model_trainer request (None when the cache is off)."""
+    if not TRAINING_CACHE_ENABLED:
+        return None
+    request = {
+        "target": params["target"], "columns": params["columns"], "impute": params["impute"],
+        "time_budget": params["time_budget"], "artifact": params["artifact"],
+    }
+    if streaming:
+        request["training"] = "streaming"  # different learners: never shares entries with in-memory runs
+    return training_cache.key(digest, request)
+
+
+def _cached_model(
+    train_key: Optional[str], retrain: bool, _step: Callable[[Dict[str, Any]], None],
+) -> Optional[Dict[str, Any]]:
+    """model_info of an earlier identical run whose model is still registered (recorded as a step), else None."""
+    cached = training_cache.get(train_key) if train_key and not retrain else None
+    if cached is None:
+        return None
+    try:
+        model_registry.get(cached["model_info"]["model_id"])
+    except (KeyError, TypeError):
+        training_cache.discard(train_key)  # model no longer registered
+        return None
+    model_info = {**cached["model_info"], "cached": True, "trained_at": cached["created_at"]}
+    _step({
+        "step": "model_cache_hit",
+        "message": f"Reused the {model_info.get('model_type')} trained earlier for an identical request.",
+        "status": "done",
+    })
+    return model_info
+
+
+def _plan_step(plan) -> Dict[str, Any]:
+    return {
+        "step": "preprocessing_plan",
+        "message": (
+            f"{len(plan.numeric)} numeric, {len(plan.onehot)} one-hot, {len(plan.target)} target-encoded, "
+            f"{len(plan.hashed)} hashed; dropped {len(plan.dropped)}."
+        ),
+        "status": "done",
+        "details": plan.to_dict(),
+    }
+
+
+def _publish_model(
+    model,
+    model_info: Dict[str, Any],
+    feature_schema: Dict[str, str],
+    params: Dict[str, Any],
+    task: str,
+    train_key: Optional[str],
+    timings: Dict[str, float],
+) -> None:
+    """
+    Export `model`, upload it with its manifest, register it for /predict and
+    cache the result. `model_info` must already hold the metrics, imputation
+    and preprocessing; it gains download_url, artifact, model_id and cached.
+    """
+    artifact_opts = params["artifact"]
+    # Export to a staging file, then stream it and a manifest sidecar to Supabase
+    fd, art_path = tempfile.mkstemp(suffix=ARTIFACT_EXTENSIONS[artifact_opts["format"]])
+    os.close(fd)
+    try:
+        with _timed(timings, "export"):
+            manifest = export_artifact(model, art_path, artifact_opts["format"], artifact_opts["compress"])
+        manifest["feature_schema"] = feature_schema
+        model_key = supa_key("models", f"{uuid.uuid4().hex}{ARTIFACT_EXTENSIONS[manifest['format']]}")
+        with _timed(timings, "upload"):
+            model_url = upload_path(art_path, key=model_key, content_type="application/octet-stream")
+            manifest["manifest_url"] = upload_bytes(
+                json.dumps(manifest).encode("utf-8"), key=f"{model_key}.manifest.json",
+                content_type="application/json",
+            )
+        model_info.update({"download_url": model_url, "artifact": manifest})
+        entry = model_registry.register(art_path, {
+            "target": params["target"],
+            "task": task,
+            "model_type": model_info["model_type"],
+            "metrics": {k: model_info[k] for k in METRIC_KEYS if k in model_info},
+            "features": feature_schema,
+            "imputation": model_info["imputation"],
+            "preprocessing": model_info["preprocessing"],
+            "artifact": manifest,
+            "download_url": model_url,
+            "dataset_id": params["dataset_id"],
+            "file_url": params["file_url"],
+        })
+    finally:
+        os.remove(art_path)
+    model_info["model_id"] = entry["model_id"]  # for /predict and /predict/batch
+    if train_key:
+        training_cache.put(train_key, model_info)
+    model_info["cached"] = False
+
+
+def _train_streaming(
+    params: Dict[str, Any],
+    path: str,
+    digest: str,
+    profile: Dict[str, Any],
+    steps: List[Dict[str, Any]],
+    _step: Callable[[Dict[str, Any]], None],
+    should_cancel: Optional[CancelFn],
+    timings: Dict[str, float],
+) -> Dict[str, Any]:
+    """
+    model_trainer without loading the dataset: missing counts, imputation fills,
+    column types and the preprocessing plan come from the upload profile, and
+    StreamingTrainer reads the local Parquet copy chunk by chunk. Returns the
+    same /process response body, with the same model_info metrics.
+    """
+    import pyarrow.parquet as pq
+    from utils.incremental import StreamingTrainer, iter_parquet, read_classes
+    from utils.preprocess import plan_from_profile
+
+    target, columns = params["target"], params["columns"]
+    names = list(profile["columns"])
+    if target not in names:
+        raise PipelineError(f"Target column '{target}' not found in dataset.")
+    unknown = [c for c in columns or [] if c not in names]
+    if unknown:
+        raise PipelineError(f"Columns not found in dataset: {', '.join(unknown)}")
+    used = columns or names
+    empty = pq.read_schema(path).empty_table().select(used).to_pandas()  # dtypes without reading rows
+
+    missing_before = dataset_profile.missing_counts(profile, used)
+    _step({
+        "step": "missing_detected",
+        "message": f"Found {int(missing_before.sum())} missing values across {len(missing_before[missing_before>0])} columns.",
+        "status": "done",
+        "details": missing_before[missing_before>0].to_dict()
+    })
+
+    with _timed(timings, "impute"):
+        imputer = Imputer(**params["impute"])
+        stat = "median" if imputer.numeric == "approx_median" else imputer.numeric  # the profile has the exact one
+        imputer.fit(empty, missing=missing_before, known=dataset_profile.known_fills(profile, stat, imputer.categorical))
+    unfilled = [c for c in missing_before.index[missing_before > 0] if imputer.fill_values_.get(c) is None]
+    _step({
+        "step": "missing_handled",
+        "message": f"Missing values handled. Remaining missing values: {int(missing_before[unfilled].sum())}.",
+        "status": "done",
+        "imputation": imputer.to_dict(),
+    })
+
+    numeric_cols, categorical_cols = dataset_profile.column_types(profile, used)
+    _step({
+        "step": "separate_types",
+        "message": f"Separated columns into {len(numeric_cols)} numeric and {len(categorical_cols)} categorical.",
+        "status": "done",
+        "numeric_cols": numeric_cols,
+        "categorical_cols": categorical_cols
+    })
+
+    def _check_cancel() -> None:
+        if should_cancel is not None and should_cancel():
+            raise JobCancelled()
+
+    train_key = _training_key(digest, params, streaming=True)
+    model_info = _cached_model(train_key, params["retrain"], _step) or {}
+    if not model_info:
+        try:
+            plan = plan_from_profile(profile, [c for c in used if c != target])
+            if not plan.columns:
+                raise PipelineError("No usable feature columns after dropping identifier/constant columns.")
+            task = REGRESSION if pd.api.types.is_numeric_dtype(empty[target]) else CLASSIFICATION
+            _step(_plan_step(plan))
+
+            with _timed(timings, "train"):
+                classes = read_classes(path, target, imputer) if task == CLASSIFICATION else None
+                trainer = StreamingTrainer(task, plan, time_budget=params["time_budget"]).fit(
+                    iter_parquet(path, plan.columns + [target]), target, imputer, classes, on_chunk=_check_cancel,
+                )
+            stream = trainer.summary()["streaming"]
+            _step({
+                "step": "model_search",
+                "message": (
+                    f"Streamed {stream['rows_read']} of {profile['rows']} rows in {stream['chunks']} chunks "
+                    f"({trainer.elapsed_:.1f}s); best: {trainer.best_name_}."
+                ),
+                "status": "done",
+                "details": stream,
+            })
+
+            model_info = {
+                "model_type": type(trainer.best_[-1]).__name__,
+                **trainer.metrics_,
+                "imputation": imputer.to_dict(),  # reuse these fills before predicting
+                "preprocessing": plan.to_dict(),
+                "search": trainer.summary(),
+                "training": "streaming",
+            }
+            feature_schema = {
+                c: "numeric" if c in plan.numeric else "bool" if pd.api.types.is_bool_dtype(empty[c]) else "categorical"
+                for c in plan.columns
+            }
+            _publish_model(trainer.best_, model_info, feature_schema, params, task, train_key, timings)
+            _step({
+                "step": "model_training",
+                "message": f"Model trained successfully: {model_info.get('model_type')}",
+                "status": "done"
+            })
+        except Exception as e:
+            _step({"step": "model_training_error", "message": str(e), "status": "error"})
+
+    return {
+        "status": "success",
+        "mode": params["mode"],
+        "target": target,
+        "steps": steps,
+        "numeric_analysis": {},
+        "categorical_analysis": {},
+        "insights": [],
+        "ai_insights": [],
+        "ai_model": None,
+        "ai_error": None,
+        "ai_cached": False,
+        "model_info": model_info,
+        "drivers": None,
+        "sample": None,
+        "profile_reused": True,
+        "timings": {k: round(v, 4) for k, v in timings.items()},
+    }
+
+
+# -------------------- Batch --------------------
+def run_batch(
+    payload: Dict[str, Any],
+    progress: Optional[ProgressFn] = None,
+    should_cancel: Optional[CancelFn] = None,
+    timings: Optional[Dict[str, float]] = None,
+) -> Dict[str, Any]:
+    """
+    Run /process/batch: every target of every dataset in one job. Each dataset
+    is loaded, imputed and split into numeric/categorical columns once, and one
+    correlation pass covers all of its targets; the per-target analyses then
+    run on BATCH_WORKERS threads over projections of the shared frame.
+    `results` holds one /process response (or error) per dataset and target,
+    in request order; `timings` covers the shared stages plus `analyse`.
+    """
+    batch = parse_batch_payload(payload)
+    if batch["profile"]:
+        result, report = profile_call(_run_batch, batch, progress, should_cancel, timings)
+        result["profile"] = report
+        return result
+    return _run_batch(batch, progress, should_cancel, timings)
+
+
+def _batch_error(params: Dict[str, Any], dataset_id: Optional[str], message: str) -> Dict[str, Any]:
+    return {
+        "status": "error",
+        "mode": params["mode"],
+        "target": params["target"],
+        "file_url": params["file_url"],
+        "dataset_id": dataset_id or params["dataset_id"],
+        "error": message,
+    }
+
+
+def _analyse_item(
+    prep: _Prepared,
+    params: Dict[str, Any],
+    shared_steps: List[Dict[str, Any]],
+    progress: Optional[ProgressFn],
+    should_cancel: Optional[CancelFn],
+) -> Dict[str, Any]:
+    """One target of a batch: the dataset's shared steps, then its own, on its projection of the frame."""
+    steps = list(shared_steps)
+    _step = _recorder(steps, progress, should_cancel, dataset_id=prep.digest, target=params["target"])
+    df = prep.df if params["columns"] is None else prep.df[params["columns"]]
+    return _analyse(prep, df, params, steps, _step, {})
+
+
+def _run_batch(
+    batch: Dict[str, Any],
+    progress: Optional[ProgressFn],
+    should_cancel: Optional[CancelFn],
+    timings: Optional[Dict[str, float]],
+) -> Dict[str, Any]:
+    timings = {} if timings is None else timings
+    steps: List[Dict[str, Any]] = []
+    results: List[Dict[str, Any]] = []
+    datasets: List[Dict[str, Any]] = []
+
+    with ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="mlify-batch") as pool:
+        for items in batch["datasets"]:
+            first = items[0]
+            targets = [p["target"] for p in items]
+            columns = None if first["columns"] is None else list(dict.fromkeys(c for p in items for c in p["columns"]))
+            shared: List[Dict[str, Any]] = []
+            try:
+                df, digest, profile = _load(first, columns, timings)
+                unknown = [c for c in columns or [] if c not in df.columns and c not in targets]
+                if unknown:
+                    raise PipelineError(f"Columns not found in dataset: {', '.join(unknown)}")
+                _step = _recorder(shared, progress, should_cancel, dataset_id=digest)
+                prep = _prepare(df, digest, profile, first, None, _step, timings)
+            except PipelineError as e:
+                results += [_batch_error(p, None, str(e)) for p in items]
+                datasets.append({"file_url": first["file_url"], "dataset_id": first["dataset_id"], "error": str(e)})
+                continue
+
+            out: List[Optional[Dict[str, Any]]] = [None] * len(items)
+            ready = []
+            for i, p in enumerate(items):
+                if p["target"] in prep.df.columns:
+                    ready.append(i)
+                else:
+                    out[i] = _batch_error(p, digest, f"Target column '{p['target']}' not found in dataset.")
+            if batch["mode"] == "business_insights" and prep.numeric_cols and ready:
+                try:
+                    with _timed(timings, "correlate"):
+                        prep.stats = _correlation_stats(prep, [items[i]["target"] for i in ready])
+                except Exception:
+                    prep.stats = None  # each target computes its own and reports the error
+            if batch["mode"] == "business_insights" and ready:
+                try:
+                    with _timed(timings, "drivers"):
+                        prep.driver_codes = FeatureCodes(prep.df, prep.numeric_cols, prep.categorical_cols)
+                except Exception:
+                    prep.driver_codes = None
+
+            with _timed(timings, "analyse"):
+                futures = {i: pool.submit(_analyse_item, prep, items[i], shared, progress, should_cancel) for i in ready}
+                for i, fut in futures.items():
+                    try:
+                        out[i] = {"file_url": items[i]["file_url"], "dataset_id": digest, **fut.result()}
+                    except JobCancelled:
+                        for f in futures.values():
+                            f.cancel()
+                        raise
+                    except Exception as e:
+                        out[i] = _batch_error(items[i], digest, str(e))
+
+            steps += shared
+            for r in out:
+                steps += (r.get("steps") or [])[len(shared):]
+            results += out
+            datasets.append({
+                "file_url": first["file_url"],
+                "dataset_id": digest,
+                "rows": int(prep.df.shape[0]),
+                "cols": int(prep.df.shape[1]),
+                "targets": targets,
+                "profile_reused": prep.profile is not None,
+            })
+
+    failed = sum(r["status"] == "error" for r in results)
+    return {
+        "status": "success" if not failed else "error" if failed == len(results) else "partial",
+        "mode": batch["mode"],
+        "datasets": datasets,
+        "results": results,            # one /process body (or error) per dataset and target
+        "failed": failed,
+        "steps": steps,                # shared steps once per dataset, then each target's own
+        "timings": {k: round(v, 4) for k, v in timings.items()},
+    }
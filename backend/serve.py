@@ -0,0 +1,110 @@
+# backend/serve.py
+"""
+Server launcher: `python serve.py` (from backend/).
+
+With MLIFY_WORKERS=1 (the default) it runs main:app on MLIFY_HOST:MLIFY_PORT
+like `uvicorn main:app`. With more, it starts that many uvicorn processes on
+consecutive local ports from MLIFY_WORKER_BASE_PORT and serves the affinity
+router (utils.affinity) on MLIFY_HOST:MLIFY_PORT in front of them. The
+workers share the dataset cache directory, the model registry and the
+memory-mapped store of parsed datasets (utils.shared_store), and the router
+sends every request about a dataset, model or job to the same worker, so
+follow-ups land where the data is already warm. Workers that exit are restarted.
+"""
+from __future__ import annotations
+
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List
+
+import dotenv
+
+dotenv.load_dotenv()
+
+WORKERS = int(os.getenv("MLIFY_WORKERS", "1"))
+HOST = os.getenv("MLIFY_HOST", "127.0.0.1")
+PORT = int(os.getenv("MLIFY_PORT", "8000"))
+WORKER_BASE_PORT = int(os.getenv("MLIFY_WORKER_BASE_PORT", str(PORT + 1)))
+LOG_LEVEL = os.getenv("MLIFY_LOG_LEVEL", "info")
+RESTART_DELAY = 1.0  # seconds between restarts of a worker that keeps exiting
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def worker_env(worker: int, workers: int) -> Dict[str, str]:
+    """Environment of app worker `worker`: its id, the shared store on, and a share of the job pool."""
+    env = dict(os.environ, MLIFY_WORKER_ID=str(worker))
+    env.setdefault("MLIFY_SHARED_STORE", "true")
+    env.setdefault("MLIFY_JOB_WORKERS", str(max(1, (os.cpu_count() or 2) // 2 // workers)))
+    return env
+
+
+class Supervisor:
+    """Runs the app workers as child processes and restarts any that exit until stop()."""
+
+    def __init__(self, workers: int, base_port: int) -> None:
+        self.ports = [base_port + i for i in range(workers)]
+        self.procs: List[subprocess.Popen] = []
+        self._stopping = threading.Event()
+
+    @property
+    def upstreams(self) -> List[str]:
+        return [f"http://127.0.0.1:{p}" for p in self.ports]
+
+    def _spawn(self, worker: int) -> subprocess.Popen:
+        cmd = [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--host", "127.0.0.1", "--port", str(self.ports[worker]), "--log-level", LOG_LEVEL,
+        ]
+        return subprocess.Popen(cmd, cwd=BACKEND_DIR, env=worker_env(worker, len(self.ports)))
+
+    def start(self) -> None:
+        self.procs = [self._spawn(i) for i in range(len(self.ports))]
+        threading.Thread(target=self._watch, name="mlify-supervisor", daemon=True).start()
+
+    def _watch(self) -> None:
+        while not self._stopping.wait(RESTART_DELAY):
+            for i, proc in enumerate(self.procs):
+                if proc.poll() is not None and not self._stopping.is_set():
+                    print(f"serve: worker {i} exited with {proc.returncode}; restarting", file=sys.stderr)
+                    self.procs[i] = self._spawn(i)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stopping.set()
+        for proc in self.procs:
+            if proc.poll() is None:
+                proc.send_signal(signal.SIGTERM)
+        deadline = time.monotonic() + timeout
+        for proc in self.procs:
+            try:
+                proc.wait(max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+def main() -> None:
+    import uvicorn
+
+    if WORKERS <= 1:
+        os.chdir(BACKEND_DIR)
+        uvicorn.run("main:app", host=HOST, port=PORT, log_level=LOG_LEVEL)
+        return
+
+    from utils.affinity import AffinityRouter
+
+    supervisor = Supervisor(WORKERS, WORKER_BASE_PORT)
+    supervisor.start()
+    # uvicorn re-raises SIGTERM after its graceful shutdown; exit through `finally` so the workers stop too
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        uvicorn.run(AffinityRouter(supervisor.upstreams).app(), host=HOST, port=PORT, log_level=LOG_LEVEL)
+    finally:
+        supervisor.stop()
+
+
+if __name__ == "__main__":
+    main()
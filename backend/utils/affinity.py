@@ -0,0 +1,206 @@
+# utils/affinity.py
+from __future__ import annotations
+import hashlib, itertools, json, os, re
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+import httpx
+import dotenv
+from fastapi import FastAPI, Request
+from starlette.background import BackgroundTask
+from starlette.responses import JSONResponse, Response, StreamingResponse
+
+dotenv.load_dotenv()
+
+WORKER_ID: Optional[int] = int(os.environ["MLIFY_WORKER_ID"]) if os.getenv("MLIFY_WORKER_ID") else None  # set by serve.py
+ROUTER_TIMEOUT: float = float(os.getenv("MLIFY_ROUTER_TIMEOUT", "600"))  # seconds per proxied request
+ROUTER_URLS: int = int(os.getenv("MLIFY_ROUTER_URLS", "10000"))  # file_url -> dataset_id pairs learned from /upload
+
+DATASET_ROUTES = frozenset({"/process", "/process/batch", "/jobs", "/jobs/batch"})
+MODEL_ROUTES = frozenset({"/predict", "/predict/batch"})
+_JOB_PATH = re.compile(r"^/jobs/w(\d+)-")
+_MODEL_PATH = re.compile(r"^/models/([^/]+)$")
+_HOP_HEADERS = frozenset({
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization", "te", "trailer",
+    "transfer-encoding", "upgrade", "host", "content-length",
+})
+
+
+# -------------------- Job ids --------------------
+def job_prefix(worker: Optional[int] = WORKER_ID) -> str:
+    """Prefix of the job ids a worker hands out, so the router can send job lookups back to it."""
+    return "" if worker is None else f"w{worker}-"
+
+
+def job_worker(path: str) -> Optional[int]:
+    """Worker that owns the job in a /jobs/<id>... path (None for unprefixed ids)."""
+    m = _JOB_PATH.match(path)
+    return int(m.group(1)) if m else None
+
+
+# -------------------- Routing --------------------
+def rank(key: str, n: int) -> List[int]:
+    """
+    Workers 0..n-1 ordered by rendezvous hash of `key`: a key always prefers
+    the same worker, and a worker that is down only moves its own keys.
+    """
+    weight = lambda i: hashlib.blake2b(f"{i}:{key}".encode("utf-8"), digest_size=8).digest()  # noqa: E731
+    return sorted(range(n), key=weight, reverse=True)
+
+
+class AffinityRouter:
+    """
+    Reverse proxy in front of several app workers that sends everything about
+    one dataset to the same worker, so follow-up /process calls find the frame
+    (and its profile, imputation statistics, trained models) already warm:
+
+    - /process, /process/batch, /jobs, /jobs/batch: by dataset_id, else by
+      file_url (mapped to its dataset_id when this router saw the upload)
+    - /predict, /predict/batch, /models/<id>: by model_id (warm model cache)
+    - /jobs/<id>...: to the worker that created the job (ids carry its number)
+    - anything else: round robin
+
+    A worker that refuses the connection is skipped for the next one in the
+    key's order; responses name the worker that served them in X-MLify-Worker.
+    Bodies are streamed both ways, except the small JSON bodies the key is
+    read from. Per-process endpoints (/metrics) are best scraped on each
+    worker's own port.
+    """
+
+    def __init__(self, upstreams: Sequence[str], timeout: float = ROUTER_TIMEOUT, max_urls: int = ROUTER_URLS) -> None:
+        if not upstreams:
+            raise ValueError("AffinityRouter needs at least one upstream")
+        self.upstreams = [u.rstrip("/") for u in upstreams]
+        self.timeout = timeout
+        self.max_urls = max_urls
+        self._urls: "OrderedDict[str, str]" = OrderedDict()  # file_url -> dataset_id
+        self._next = itertools.count()
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=httpx.Limits(max_keepalive_connections=64))
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    # ---------- keys ----------
+    def learn(self, upload: Dict[str, Any]) -> None:
+        """Remember file_url -> dataset_id from an /upload response."""
+        url, digest = upload.get("file_url"), upload.get("dataset_id")
+        if not isinstance(url, str) or not isinstance(digest, str):
+            return
+        self._urls[url] = digest
+        self._urls.move_to_end(url)
+        while len(self._urls) > self.max_urls:
+            self._urls.popitem(last=False)
+
+    def dataset_key(self, body: Dict[str, Any]) -> Optional[str]:
+        datasets = body.get("datasets")
+        if isinstance(datasets, list) and datasets:  # batch: the first dataset decides
+            first = datasets[0]
+            body = first if isinstance(first, dict) else {"file_url": first}
+        digest = body.get("dataset_id")
+        url = body.get("file_url") or body.get("filename")
+        if not isinstance(digest, str) and isinstance(url, str):
+            digest = self._urls.get(url)
+        if isinstance(digest, str):
+            return f"dataset:{digest}"
+        return f"url:{url}" if isinstance(url, str) else None
+
+    def key(self, path: str, query: Dict[str, str], body: Optional[Dict[str, Any]]) -> Optional[str]:
+        if path in DATASET_ROUTES and body is not None:
+            return self.dataset_key(body)
+        if path in MODEL_ROUTES:
+            model_id = (body or {}).get("model_id") or query.get("model_id")
+            return f"model:{model_id}" if model_id else None
+        m = _MODEL_PATH.match(path)
+        return f"model:{m.group(1)}" if m else None
+
+    def order(self, path: str, key: Optional[str]) -> List[int]:
+        n = len(self.upstreams)
+        owner = job_worker(path)
+        if owner is not None and owner < n:
+            return [owner]  # job state lives in that worker alone
+        if key is not None:
+            return rank(key, n)
+        start = next(self._next) % n
+        return [(start + i) % n for i in range(n)]
+
+    # ---------- proxy ----------
+    async def forward(self, request: Request) -> Response:
+        path = request.url.path
+        keyed = request.method == "POST" and (path in DATASET_ROUTES or path in MODEL_ROUTES)
+        is_json = request.headers.get("content-type", "").startswith("application/json")
+        content: Any
+        body = None
+        if keyed and is_json:
+            content = await request.body()
+            try:
+                parsed = json.loads(content or b"null")
+                body = parsed if isinstance(parsed, dict) else None
+            except ValueError:
+                pass  # the worker answers with its own 400
+        else:
+            content = request.stream()
+        headers = [(k, v) for k, v in request.headers.items() if k.lower() not in _HOP_HEADERS]
+        candidates = self.order(path, self.key(path, dict(request.query_params), body))
+        if not isinstance(content, bytes):
+            candidates = candidates[:1]  # a streamed body can't be replayed to another worker
+
+        response, worker = None, None
+        for worker in candidates:
+            req = self.client.build_request(
+                request.method, f"{self.upstreams[worker]}{path}", params=request.url.query or None,
+                headers=headers, content=content,
+            )
+            try:
+                response = await self.client.send(req, stream=True)
+                break
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                continue
+        if response is None:
+            return JSONResponse({"detail": "No app worker is reachable"}, status_code=502)
+
+        out_headers = {k: v for k, v in response.headers.items() if k.lower() not in _HOP_HEADERS}
+        out_headers["x-mlify-worker"] = str(worker)
+        if path == "/upload" and response.status_code == 200:
+            data = await response.aread()
+            await response.aclose()
+            try:
+                self.learn(json.loads(data))
+            except ValueError:
+                pass
+            return Response(data, status_code=response.status_code, headers=out_headers)
+        return StreamingResponse(
+            response.aiter_raw(), status_code=response.status_code, headers=out_headers,
+            background=BackgroundTask(response.aclose),
+        )
+
+    async def ready(self) -> JSONResponse:
+        """200 when every worker's /ready is 200; the body has each worker's answer."""
+        workers = []
+        for url in self.upstreams:
+            try:
+                res = await self.client.get(f"{url}/ready", timeout=5.0)
+                workers.append({"url": url, "ready": res.status_code == 200})
+            except httpx.HTTPError as e:
+                workers.append({"url": url, "ready": False, "error": str(e)})
+        ready = all(w["ready"] for w in workers)
+        return JSONResponse({"ready": ready, "workers": workers}, status_code=200 if ready else 503)
+
+    def app(self) -> FastAPI:
+        """ASGI app of the router."""
+        app = FastAPI(on_shutdown=[self.close])
+        app.add_api_route("/ready", self.ready, methods=["GET"])
+
+        async def proxy(request: Request, path: str):
+            return await self.forward(request)
+
+        app.add_api_route(
+            "/{path:path}", proxy, methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "HEAD"],
+        )
+        return app
@@ -0,0 +1,439 @@
+# utils/artifacts.py
+from __future__ import annotations
+import hashlib, io, json, os, time
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+import pandas as pd
+import dotenv
+
+dotenv.load_dotenv()
+
+# joblib: compressed pickle (smallest for upload); joblib_mmap: uncompressed, loaded with mmap_mode="r";
+# portable: npz of flat tree / coefficient arrays + a JSON spec, evaluated with numpy only (no sklearn, no pickle)
+ARTIFACT_FORMATS = ("joblib", "joblib_mmap", "portable")
+ARTIFACT_EXTENSIONS = {"joblib": ".joblib", "joblib_mmap": ".joblib", "portable": ".npz"}
+ARTIFACT_COMPRESS: int = int(os.getenv("MLIFY_ARTIFACT_COMPRESS", "3"))  # zlib level for "joblib"
+PORTABLE_VERSION = 1
+_PREDICT_CELLS = 2_000_000  # rows x trees walked per chunk
+
+
+class ArtifactError(ValueError):
+    """The model can't be written in (or read back from) the requested format."""
+
+
+def _jsonable(v: Any) -> Any:
+    if isinstance(v, np.generic):
+        v = v.item()
+    if isinstance(v, float) and not np.isfinite(v):
+        return None
+    return v
+
+
+def _listify(a) -> Any:
+    return None if a is None else [_jsonable(v) for v in np.asarray(a, dtype=object).ravel()]
+
+
+# -------------------- Portable export: preprocessing --------------------
+def _step_spec(step) -> Dict[str, Any]:
+    from sklearn.impute import SimpleImputer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import FunctionTransformer, OneHotEncoder, OrdinalEncoder, StandardScaler
+
+    try:
+        from sklearn.preprocessing import TargetEncoder
+    except ImportError:  # scikit-learn < 1.3
+        TargetEncoder = ()
+
+    if isinstance(step, str) and step == "passthrough":
+        return {"op": "float"}
+    if isinstance(step, FunctionTransformer) and (step.func is None or "check_array" in repr(step.func)):
+        return {"op": "float"}  # hist GB's internal numeric passthrough
+    if isinstance(step, Pipeline):
+        return {"op": "chain", "steps": [_step_spec(s) for _, s in step.steps]}
+    if isinstance(step, SimpleImputer) and not step.add_indicator:
+        return {"op": "impute", "values": _listify(step.statistics_)}
+    if isinstance(step, StandardScaler):
+        return {"op": "scale", "mean": _listify(step.mean_), "scale": _listify(step.scale_)}
+    if isinstance(step, OneHotEncoder) and step.drop_idx_ is None and getattr(step, "infrequent_categories_", None) is None:
+        return {"op": "onehot", "categories": [_listify(c) for c in step.categories_]}
+    if isinstance(step, OrdinalEncoder):
+        return {
+            "op": "ordinal",
+            "categories": [_listify(c) for c in step.categories_],
+            "unknown": _jsonable(step.unknown_value) if step.handle_unknown == "use_encoded_value" else None,
+            "missing": _jsonable(step.encoded_missing_value),
+        }
+    if TargetEncoder and isinstance(step, TargetEncoder):
+        multiclass = step.target_type_ == "multiclass"
+        return {
+            "op": "target",
+            "categories": [_listify(c) for c in step.categories_],
+            "encodings": [_listify(e) for e in step.encodings_],
+            "target_mean": _listify(step.target_mean_) if multiclass else _jsonable(step.target_mean_),
+            "n_classes": len(step.classes_) if multiclass else 1,
+        }
+    raise ArtifactError(f"{type(step).__name__} has no portable form")
+
+
+def _column_transformer_spec(ct) -> Dict[str, Any]:
+    """Blocks of (input column indices, op) in output order; input names come from feature_names_in_."""
+    names = list(getattr(ct, "feature_names_in_", []))
+    n_in = getattr(ct, "n_features_in_", len(names))
+    blocks = []
+    for name, trans, cols in ct.transformers_:
+        if isinstance(trans, str) and trans == "drop":
+            continue
+        arr = np.asarray(cols)
+        if arr.size == 0:
+            continue
+        if arr.dtype == bool:
+            idx = np.flatnonzero(arr).tolist()
+        elif arr.dtype.kind in "iu":
+            idx = arr.tolist()
+        else:
+            idx = [names.index(c) for c in arr.tolist()]
+        blocks.append({"name": name, "columns": idx, **_step_spec(trans)})
+    return {"inputs": [str(n) for n in names] or None, "n_inputs": int(n_in), "blocks": blocks}
+
+
+# -------------------- Portable export: estimators --------------------
+def _pack_trees(trees: List[Dict[str, np.ndarray]], bitsets: List[np.ndarray]) -> Dict[str, np.ndarray]:
+    """Concatenate per-tree node arrays into flat global arrays (children re-based to global ids)."""
+    offsets = np.cumsum([0] + [len(t["feature"]) for t in trees[:-1]])
+    bit_off = np.cumsum([0] + [len(b) for b in bitsets[:-1]]) if bitsets else []
+    left, right, bit_idx = [], [], []
+    for i, (t, off) in enumerate(zip(trees, offsets)):
+        leaf = t["left"] < 0
+        left.append(np.where(leaf, -1, t["left"] + off))
+        right.append(np.where(leaf, -1, t["right"] + off))
+        bit_idx.append(t["bitset_idx"] + (bit_off[i] if bitsets else 0))
+    return {
+        "feature": np.concatenate([t["feature"] for t in trees]).astype(np.int32),
+        "threshold": np.concatenate([t["threshold"] for t in trees]).astype(np.float64),
+        "left": np.concatenate(left).astype(np.int32),
+        "right": np.concatenate(right).astype(np.int32),
+        "missing_left": np.concatenate([t["missing_left"] for t in trees]).astype(bool),
+        "is_cat": np.concatenate([t["is_cat"] for t in trees]).astype(bool),
+        "bitset_idx": np.concatenate(bit_idx).astype(np.int32),
+        "leaf_value": np.concatenate([t["value"] for t in trees]).astype(np.float64),
+        "roots": offsets.astype(np.int32),
+        "bitsets": np.concatenate(bitsets).astype(np.uint32) if bitsets else np.zeros((0, 8), np.uint32),
+        "max_depth": np.array([max(int(t["depth"]) for t in trees)], dtype=np.int32),
+    }
+
+
+def _forest_arrays(est) -> Dict[str, np.ndarray]:
+    trees = []
+    for tree in (e.tree_ for e in est.estimators_):
+        value = tree.value[:, 0, :].astype(np.float64)
+        if hasattr(est, "classes_"):
+            value = value / np.maximum(value.sum(axis=1, keepdims=True), 1e-300)  # class fractions
+        n = tree.node_count
+        trees.append({
+            "feature": tree.feature, "threshold": tree.threshold,
+            "left": tree.children_left, "right": tree.children_right,
+            "missing_left": getattr(tree, "missing_go_to_left", np.zeros(n, dtype=bool)),
+            "is_cat": np.zeros(n, dtype=bool), "bitset_idx": np.zeros(n, dtype=np.int32),
+            "value": value, "depth": tree.max_depth,
+        })
+    return _pack_trees(trees, [])
+
+
+def _boosting_arrays(est) -> Dict[str, np.ndarray]:
+    trees, bitsets, tree_out = [], [], []
+    for iteration in est._predictors:
+        for k, pred in enumerate(iteration):
+            nodes = pred.nodes
+            leaf = nodes["is_leaf"].astype(bool)
+            trees.append({
+                "feature": np.where(leaf, -1, nodes["feature_idx"]), "threshold": nodes["num_threshold"],
+                "left": np.where(leaf, -1, nodes["left"].astype(np.int64)),
+                "right": np.where(leaf, -1, nodes["right"].astype(np.int64)),
+                "missing_left": nodes["missing_go_to_left"], "is_cat": nodes["is_categorical"],
+                "bitset_idx": nodes["bitset_idx"].astype(np.int64),
+                "value": nodes["value"].reshape(-1, 1), "depth": int(nodes["depth"].max()),
+            })
+            bitsets.append(np.asarray(pred.raw_left_cat_bitsets, dtype=np.uint32).reshape(-1, 8))
+            tree_out.append(k)
+    out = _pack_trees(trees, bitsets)
+    out["tree_out"] = np.asarray(tree_out, dtype=np.int32)
+    out["baseline"] = np.asarray(est._baseline_prediction, dtype=np.float64).ravel()
+    return out
+
+
+def _estimator_spec(est) -> tuple:
+    """(spec, arrays) for the final estimator of a pipeline."""
+    from sklearn.ensemble import (
+        HistGradientBoostingClassifier, HistGradientBoostingRegressor, RandomForestClassifier, RandomForestRegressor,
+    )
+    from sklearn.linear_model import LinearRegression, LogisticRegression, Ridge
+
+    classes = _listify(getattr(est, "classes_", None))
+    if isinstance(est, (RandomForestClassifier, RandomForestRegressor)):
+        if getattr(est, "n_outputs_", 1) != 1:
+            raise ArtifactError("Multi-output forests have no portable form")
+        spec = {"kind": "forest", "link": "mean", "float32_inputs": True}
+        return spec, classes, _forest_arrays(est)
+    if isinstance(est, (HistGradientBoostingClassifier, HistGradientBoostingRegressor)):
+        if isinstance(est, HistGradientBoostingRegressor):
+            if est.loss != "squared_error":
+                raise ArtifactError(f"HistGradientBoosting loss '{est.loss}' has no portable form")
+            link = "identity"
+        else:
+            link = "sigmoid" if est.n_trees_per_iteration_ == 1 else "softmax"
+        inner = getattr(est, "_preprocessor", None)
+        spec = {
+            "kind": "boosting", "link": link, "float32_inputs": False,
+            "preprocess": _column_transformer_spec(inner) if inner is not None else None,
+        }
+        return spec, classes, _boosting_arrays(est)
+    if isinstance(est, (Ridge, LinearRegression, LogisticRegression)):
+        coef = np.atleast_2d(np.asarray(est.coef_, dtype=np.float64))
+        intercept = np.atleast_1d(np.asarray(est.intercept_, dtype=np.float64))
+        link = "identity" if classes is None else ("sigmoid" if coef.shape[0] == 1 else "softmax")
+        return {"kind": "linear", "link": link}, classes, {"coef": coef, "intercept": intercept}
+    raise ArtifactError(f"{type(est).__name__} has no portable form")
+
+
+def export_portable(model, path: str) -> None:
+    """Write a fitted Pipeline(preprocessor, estimator) as a numpy-only npz."""
+    from sklearn.compose import ColumnTransformer
+
+    steps = list(getattr(model, "steps", [(None, model)]))
+    pre = steps[0][1] if len(steps) > 1 else None
+    if len(steps) > 2 or (pre is not None and not isinstance(pre, ColumnTransformer)):
+        raise ArtifactError("Only Pipeline(ColumnTransformer, estimator) models have a portable form")
+    est_spec, classes, arrays = _estimator_spec(steps[-1][1])
+    spec = {
+        "version": PORTABLE_VERSION,
+        "preprocess": _column_transformer_spec(pre) if pre is not None else None,
+        "estimator": est_spec,
+        "classes": classes,
+    }
+    with open(path, "wb") as fh:
+        np.savez_compressed(fh, spec=np.frombuffer(json.dumps(spec).encode("utf-8"), dtype=np.uint8), **arrays)
+
+
+# -------------------- Portable runtime (numpy only) --------------------
+def _codes(values: np.ndarray, categories: Sequence[Any]) -> np.ndarray:
+    cats = pd.Index([np.nan if c is None else c for c in categories])
+    return cats.get_indexer(pd.Index(values))
+
+
+def _string_like(categories: Sequence[Any]) -> bool:
+    return any(isinstance(c, str) for c in categories)
+
+
+def _apply_step(step: Dict[str, Any], cols: List[np.ndarray]) -> List[np.ndarray]:
+    op = step["op"]
+    if op == "float":
+        return [pd.to_numeric(pd.Series(c), errors="coerce").to_numpy(dtype=np.float64) for c in cols]
+    if op == "chain":
+        for s in step["steps"]:
+            cols = _apply_step(s, cols)
+        return cols
+    if op == "impute":
+        cols = _apply_step({"op": "float"}, cols)
+        return [np.where(np.isnan(c), np.nan if v is None else v, c) for c, v in zip(cols, step["values"])]
+    if op == "scale":
+        cols = _apply_step({"op": "float"}, cols)
+        mean = step["mean"] or [0.0] * len(cols)
+        scale = step["scale"] or [1.0] * len(cols)
+        return [(c - m) / s for c, m, s in zip(cols, mean, scale)]
+
+    out: List[np.ndarray] = []
+    for j, c in enumerate(cols):
+        cats = step["categories"][j]
+        vals = pd.Series(c)
+        if _string_like(cats):
+            vals = vals.astype(str).where(vals.notna(), np.nan)
+        codes = _codes(vals.to_numpy(), cats)
+        if op == "onehot":
+            out.extend((codes == k).astype(np.float64) for k in range(len(cats)))
+        elif op == "ordinal":
+            unknown = np.nan if step["unknown"] is None else step["unknown"]
+            missing = np.nan if step["missing"] is None else step["missing"]
+            enc = np.where(codes >= 0, codes, unknown).astype(np.float64)
+            out.append(np.where(vals.isna().to_numpy(), missing, enc))
+        elif op == "target":
+            nc = step["n_classes"]
+            means = step["target_mean"] if nc > 1 else [step["target_mean"]]
+            for k in range(nc):
+                table = np.asarray(step["encodings"][j * nc + k], dtype=np.float64)
+                out.append(np.where(codes >= 0, table[np.maximum(codes, 0)], means[k]))
+        else:
+            raise ArtifactError(f"Unknown portable op '{op}'")
+    return out
+
+
+def _run_preprocess(spec: Optional[Dict[str, Any]], cols: List[np.ndarray]) -> np.ndarray:
+    if spec is None:
+        return np.column_stack(_apply_step({"op": "float"}, cols))
+    out: List[np.ndarray] = []
+    for block in spec["blocks"]:
+        out.extend(_apply_step(block, [cols[i] for i in block["columns"]]))
+    return np.column_stack(out) if out else np.empty((len(cols[0]) if cols else 0, 0))
+
+
+class PortableModel:
+    """
+    Numpy-only evaluator for an exported Pipeline: the preprocessing blocks,
+    then every tree walked at once (rows x trees node ids per step) or a matrix
+    product for linear models. Exposes predict / predict_proba / classes_.
+    """
+
+    def __init__(self, spec: Dict[str, Any], arrays: Dict[str, np.ndarray]) -> None:
+        if spec.get("version") != PORTABLE_VERSION:
+            raise ArtifactError(f"Unsupported portable artifact version {spec.get('version')}")
+        self.spec = spec
+        self.a = arrays
+        self.est = spec["estimator"]
+        self.classes_ = np.asarray(spec["classes"], dtype=object) if spec.get("classes") is not None else None
+        pre = spec.get("preprocess") or {}
+        self.feature_names_in_ = pre.get("inputs")
+
+    @classmethod
+    def load(cls, path: str) -> "PortableModel":
+        with np.load(path, allow_pickle=False) as z:
+            arrays = {k: z[k] for k in z.files}
+        spec = json.loads(arrays.pop("spec").tobytes().decode("utf-8"))
+        return cls(spec, arrays)
+
+    def _matrix(self, frame: pd.DataFrame) -> np.ndarray:
+        names = self.feature_names_in_
+        cols = [frame[n].to_numpy() for n in names] if names else [frame.iloc[:, i].to_numpy() for i in range(frame.shape[1])]
+        X = _run_preprocess(self.spec.get("preprocess"), cols)
+        inner = self.est.get("preprocess")
+        if inner is not None:
+            X = _run_preprocess(inner, [X[:, i] for i in range(X.shape[1])])
+        return X
+
+    def _walk(self, X: np.ndarray) -> np.ndarray:
+        """Leaf node id per (row, tree)."""
+        a = self.a
+        n, T = len(X), len(a["roots"])
+        node = np.broadcast_to(a["roots"], (n, T)).copy()
+        rows = np.arange(n)[:, None]
+        has_cat = bool(a["is_cat"].any())
+        for _ in range(int(a["max_depth"][0]) + 1):
+            inner = a["left"][node] >= 0
+            if not inner.any():
+                break
+            x = X[rows, np.maximum(a["feature"][node], 0)]
+            nan = np.isnan(x)
+            go_left = x <= a["threshold"][node]
+            if has_cat:
+                cat = a["is_cat"][node]
+                v = np.where(cat & ~nan, x, 0).astype(np.int64)
+                in_set = (a["bitsets"][a["bitset_idx"][node], v >> 5] >> (v & 31).astype(np.uint32)) & 1
+                go_left = np.where(cat, in_set.astype(bool), go_left)
+            go_left = np.where(nan, a["missing_left"][node], go_left)
+            node = np.where(inner, np.where(go_left, a["left"][node], a["right"][node]), node)
+        return node
+
+    def _raw(self, frame: pd.DataFrame) -> np.ndarray:
+        X = self._matrix(frame)
+        kind = self.est["kind"]
+        if kind == "linear":
+            return X @ self.a["coef"].T + self.a["intercept"]
+        if self.est.get("float32_inputs"):
+            X = X.astype(np.float32).astype(np.float64)  # sklearn trees compare float32 inputs
+        T = len(self.a["roots"])
+        step = max(1, _PREDICT_CELLS // max(1, T))
+        parts = []
+        for start in range(0, len(X), step):
+            leaves = self._walk(X[start:start + step])
+            vals = self.a["leaf_value"][leaves]  # (n, T, n_values)
+            if kind == "forest":
+                parts.append(vals.mean(axis=1))
+            else:
+                out_k = self.a["tree_out"]
+                k = len(self.a["baseline"])
+                raw = np.tile(self.a["baseline"], (len(leaves), 1))
+                for j in range(k):
+                    raw[:, j] += vals[:, out_k == j, 0].sum(axis=1)
+                parts.append(raw)
+        width = self.a["leaf_value"].shape[1] if kind == "forest" else len(self.a["baseline"])
+        return np.concatenate(parts) if parts else np.empty((0, width))
+
+    def predict_proba(self, frame: pd.DataFrame) -> np.ndarray:
+        if self.classes_ is None:
+            raise AttributeError("predict_proba is only available for classifiers")
+        raw = self._raw(frame)
+        link = self.est["link"]
+        if link == "sigmoid":
+            p = 1.0 / (1.0 + np.exp(-raw[:, 0]))
+            return np.column_stack([1.0 - p, p])
+        if link == "softmax":
+            e = np.exp(raw - raw.max(axis=1, keepdims=True))
+            return e / e.sum(axis=1, keepdims=True)
+        return raw  # forests already average class fractions
+
+    def predict(self, frame: pd.DataFrame) -> np.ndarray:
+        if self.classes_ is not None:
+            return self.classes_[np.argmax(self.predict_proba(frame), axis=1)]
+        return self._raw(frame)[:, 0]
+
+
+# -------------------- Export / load --------------------
+def export_artifact(model, path: str, fmt: str = "joblib", compress: int = ARTIFACT_COMPRESS) -> Dict[str, Any]:
+    """
+    Write `model` to `path` and return the artifact part of its manifest (size,
+    hash, measured load time). A model with no portable form (e.g. hashed
+    features) falls back to compressed joblib; `requested_format` records that.
+    """
+    import joblib
+
+    if fmt not in ARTIFACT_FORMATS:
+        raise ArtifactError(f"artifact format must be one of {', '.join(ARTIFACT_FORMATS)}")
+    requested, fallback_reason = fmt, None
+    t0 = time.perf_counter()
+    if fmt == "portable":
+        try:
+            export_portable(model, path)
+            compress = None
+        except ArtifactError as e:
+            fmt, fallback_reason = "joblib", str(e)
+    if fmt != "portable":
+        compress = int(compress) if fmt == "joblib" else 0
+        joblib.dump(model, path, compress=compress)
+    write_seconds = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    load_artifact(path, fmt)
+    load_seconds = time.perf_counter() - t0
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    manifest = {
+        "format": fmt,
+        "compress": compress,
+        "size_bytes": os.path.getsize(path),
+        "sha256": digest.hexdigest(),
+        "write_seconds": round(write_seconds, 4),
+        "load_seconds": round(load_seconds, 4),
+    }
+    if fallback_reason:
+        manifest.update(requested_format=requested, fallback_reason=fallback_reason)
+    return manifest
+
+
+def load_artifact(path: str, fmt: str = "joblib"):
+    if fmt == "portable":
+        return PortableModel.load(path)
+    import joblib
+
+    return joblib.load(path, mmap_mode="r" if fmt == "joblib_mmap" else None)
+
+
+def load_artifact_bytes(data: bytes, fmt: str = "joblib"):
+    """For artifacts fetched straight from storage (mmap needs a file, so it loads fully here)."""
+    if fmt == "portable":
+        with np.load(io.BytesIO(data), allow_pickle=False) as z:
+            arrays = {k: z[k] for k in z.files}
+        return PortableModel(json.loads(arrays.pop("spec").tobytes().decode("utf-8")), arrays)
+    import joblib
+
+    return joblib.load(io.BytesIO(data))
@@ -0,0 +1,219 @@
+# utils/association.py
+from __future__ import annotations
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+import dotenv
+
+from utils.schema import looks_like_id
+
+dotenv.load_dotenv()
+
+LABEL_MAP_MAX_LEVELS: int = int(os.getenv("MLIFY_LABEL_MAP_MAX_LEVELS", "50"))
+PLOT_MAX_LEVELS: int = int(os.getenv("MLIFY_PLOT_MAX_LEVELS", "20"))  # bars per level chart, the rest pooled
+OTHER_LEVEL = "(other)"
+_DENSE_TABLE_MAX_CELLS = 10_000_000
+
+# "auto" = eta for a numeric target, Cramér's V for a categorical one
+MEASURES = ("auto", "eta", "cramers_v", "mutual_info")
+
+
+def codes_of(s: pd.Series) -> Tuple[np.ndarray, pd.Index]:
+    """Integer codes + level labels without copying the frame (category codes are reused as-is)."""
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        return s.cat.codes.to_numpy(), s.cat.categories
+    codes, uniques = pd.factorize(s)
+    return codes, pd.Index(uniques)
+
+
+def _drop_missing(*arrays: np.ndarray, codes: Sequence[np.ndarray]) -> Tuple[np.ndarray, ...]:
+    mask = np.ones(len(arrays[0]), dtype=bool)
+    for c in codes:
+        mask &= c >= 0
+    if mask.all():
+        return arrays
+    return tuple(a[mask] for a in arrays)
+
+
+def eta_corrected(ss_between: float, ss_total: float, n: float, k: int) -> float:
+    """
+    Bias-corrected eta: sqrt of epsilon^2 = (SSB - (k-1) MSW) / SST, clipped
+    at 0. Plain eta^2 = SSB / SST reaches 1 for any column with a level per
+    row; epsilon^2 subtracts what k levels explain by chance.
+    """
+    if ss_total <= 0 or n <= k:
+        return 0.0
+    ms_within = (ss_total - ss_between) / (n - k)
+    eps2 = (ss_between - (k - 1) * ms_within) / ss_total
+    return float(np.sqrt(min(max(eps2, 0.0), 1.0)))
+
+
+def correlation_ratio(codes: np.ndarray, n_levels: int, y: np.ndarray) -> Tuple[float, np.ndarray, np.ndarray]:
+    """
+    Bias-corrected eta (0..1) of a numeric `y` explained by a nominal
+    variable, plus per-level counts and means — all from two bincounts.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    keep = (codes >= 0) & np.isfinite(y)
+    if not keep.all():
+        codes, y = codes[keep], y[keep]
+    counts = np.bincount(codes, minlength=n_levels).astype(np.float64)
+    sums = np.bincount(codes, weights=y, minlength=n_levels)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = sums / counts
+    if y.size == 0:
+        return float("nan"), counts, means
+    grand = y.mean()
+    ss_total = float(((y - grand) ** 2).sum())
+    seen = counts > 0
+    ss_between = float((counts[seen] * (means[seen] - grand) ** 2).sum())
+    return eta_corrected(ss_between, ss_total, float(y.size), int(seen.sum())), counts, means
+
+
+def contingency(cx: np.ndarray, kx: int, cy: np.ndarray, ky: int):
+    """
+    Cross-tab of two code arrays. Dense (kx, ky) when small; otherwise the
+    non-zero cells only, as (row_idx, col_idx, counts), so huge cardinalities
+    never allocate kx*ky cells.
+    """
+    cx, cy = _drop_missing(cx, cy, codes=[cx, cy])
+    if kx * ky <= _DENSE_TABLE_MAX_CELLS:
+        return np.bincount(cx.astype(np.int64) * ky + cy, minlength=kx * ky).reshape(kx, ky)
+    keys, counts = np.unique(cx.astype(np.int64) * ky + cy, return_counts=True)
+    return keys // ky, keys % ky, counts
+
+
+def _cells(table, kx: int, ky: int):
+    """(row_idx, col_idx, counts, row_totals, col_totals, n) for either table layout."""
+    if isinstance(table, np.ndarray):
+        r, c = np.nonzero(table)
+        o = table[r, c].astype(np.float64)
+        rows, cols = table.sum(axis=1).astype(np.float64), table.sum(axis=0).astype(np.float64)
+    else:
+        r, c, o = table
+        o = o.astype(np.float64)
+        rows = np.bincount(r, weights=o, minlength=kx)
+        cols = np.bincount(c, weights=o, minlength=ky)
+    return r, c, o, rows, cols, float(o.sum())
+
+
+def cramers_v(table, kx: int, ky: int) -> float:
+    """
+    Bergsma's bias-corrected Cramér's V: phi^2 less its expectation under
+    independence, over the corrected table dimensions, so a near-unique
+    column no longer scores 1.0.
+    """
+    r, c, o, rows, cols, n = _cells(table, kx, ky)
+    nr, nc = int((rows > 0).sum()), int((cols > 0).sum())
+    if n <= 1 or min(nr, nc) < 2:
+        return 0.0
+    chi2 = n * (float((o * o / (rows[r] * cols[c])).sum()) - 1.0)
+    phi2 = max(chi2 / n - (nr - 1) * (nc - 1) / (n - 1), 0.0)
+    rc = nr - (nr - 1) ** 2 / (n - 1)
+    cc = nc - (nc - 1) ** 2 / (n - 1)
+    k = min(rc, cc) - 1
+    return float(np.sqrt(min(phi2 / k, 1.0))) if k > 0 else 0.0
+
+
+def mutual_info(table, kx: int, ky: int, normalized: bool = True) -> float:
+    """
+    Mutual information in nats, less the Miller-Madow bias (bins_x - 1)(bins_y - 1) / 2n;
+    normalized=True divides by sqrt(H(x)·H(y)) to land in 0..1.
+    """
+    r, c, o, rows, cols, n = _cells(table, kx, ky)
+    if n == 0:
+        return 0.0
+    mi = float((o / n * np.log(o * n / (rows[r] * cols[c]))).sum())
+    mi = max(mi - (int((rows > 0).sum()) - 1) * (int((cols > 0).sum()) - 1) / (2.0 * n), 0.0)
+    if not normalized:
+        return mi
+    px, py = rows[rows > 0] / n, cols[cols > 0] / n
+    hx, hy = float(-(px * np.log(px)).sum()), float(-(py * np.log(py)).sum())
+    return float(min(mi / np.sqrt(hx * hy), 1.0)) if hx > 0 and hy > 0 else 0.0
+
+
+def _top_share(table, kx: int, ky: int) -> np.ndarray:
+    """Per level of x: share of its most common y class (what the bar charts show)."""
+    r, c, o, rows, _, _ = _cells(table, kx, ky)
+    top = np.zeros(kx)
+    np.maximum.at(top, r, o)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return top / rows
+
+
+@dataclass
+class Association:
+    measure: str
+    value: float
+    levels: pd.Index
+    counts: np.ndarray
+    level_stat: np.ndarray  # target mean (numeric target) or top-class share (categorical target)
+    identifier: bool = False  # near-unique values (an id column): ranked out of the correlations
+
+    def level_series(self, max_levels: int = PLOT_MAX_LEVELS) -> pd.Series:
+        """
+        Per-level statistic for plotting, observed levels only: the `max_levels`
+        most frequent, then one OTHER_LEVEL bar with the count-weighted mean of
+        the rest.
+        """
+        seen = np.flatnonzero(self.counts > 0)
+        if len(seen) <= max_levels:
+            return pd.Series(self.level_stat[seen], index=self.levels[seen])
+        order = seen[np.argsort(-self.counts[seen], kind="stable")]
+        top, rest = order[:max_levels], order[max_levels:]
+        other = float(np.average(self.level_stat[rest], weights=self.counts[rest]))
+        return pd.Series(
+            np.append(self.level_stat[top], other),
+            index=[str(v) for v in self.levels[top]] + [OTHER_LEVEL],
+        )
+
+    def label_map(self, max_levels: int = LABEL_MAP_MAX_LEVELS) -> List[str]:
+        return [str(v) for v in self.levels[:max_levels]]
+
+
+def associate(
+    df: pd.DataFrame,
+    columns: Sequence[str],
+    target: str,
+    target_numeric: bool,
+    measure: str = "auto",
+) -> Dict[str, Association]:
+    """
+    Association of each nominal column with the target, computed from integer
+    codes with bincount / sparse cross-tabs (no frame copy, no label encoders).
+    Columns that look like identifiers (utils.schema.looks_like_id) are flagged.
+    """
+    if measure not in MEASURES:
+        raise ValueError(f"measure must be one of {', '.join(MEASURES)}")
+    if measure == "auto":
+        measure = "eta" if target_numeric else "cramers_v"
+    if measure == "eta" and not target_numeric:
+        raise ValueError("'eta' needs a numeric target")
+
+    y: Optional[np.ndarray] = None
+    ty: Optional[np.ndarray] = None
+    ky = 0
+    if measure == "eta":
+        y = df[target].to_numpy(dtype=np.float64, na_value=np.nan)
+    else:
+        ty, t_levels = codes_of(df[target])
+        ky = len(t_levels)
+
+    out: Dict[str, Association] = {}
+    for col in columns:
+        cx, levels = codes_of(df[col])
+        kx = len(levels)
+        if measure == "eta":
+            value, counts, stat = correlation_ratio(cx, kx, y)
+        else:
+            table = contingency(cx, kx, ty, ky)
+            value = cramers_v(table, kx, ky) if measure == "cramers_v" else mutual_info(table, kx, ky)
+            stat = _top_share(table, kx, ky)
+            counts = np.bincount(cx[cx >= 0], minlength=kx)
+        out[col] = Association(
+            measure=measure, value=value, levels=levels, counts=counts, level_stat=stat,
+            identifier=looks_like_id(df[col], int((counts > 0).sum())),
+        )
+    return out
@@ -0,0 +1,174 @@
+# utils/charts.py
+from __future__ import annotations
+import io, math, os, threading, time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence
+import dotenv
+
+dotenv.load_dotenv()
+
+CHART_DPI: int = int(os.getenv("MLIFY_CHART_DPI", "150"))
+CHART_WORKERS: int = int(os.getenv("MLIFY_CHART_WORKERS", "4"))
+CHART_FORMATS = ("png", "spec", "both")
+
+ChartSpec = Dict[str, Any]
+UploadFn = Callable[[bytes, str], str]  # (png_bytes, name_hint) -> url
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=CHART_WORKERS, thread_name_prefix="mlify-chart")
+        return _pool
+
+
+def _num(v: Any) -> Optional[float]:
+    """JSON-safe float (NaN/inf -> None)."""
+    try:
+        f = float(v)
+    except (TypeError, ValueError):
+        return None
+    return f if math.isfinite(f) else None
+
+
+# -------------------- Chart specs (JSON, client-renderable) --------------------
+def heatmap_spec(corrmat, title: str = "Correlation heatmap") -> ChartSpec:
+    """Spec for a square correlation matrix (a DataFrame with matching index/columns)."""
+    return {
+        "type": "heatmap",
+        "title": title,
+        "x": [str(c) for c in corrmat.columns],
+        "y": [str(c) for c in corrmat.index],
+        "z": [[_num(v) for v in row] for row in corrmat.to_numpy()],
+        "zmin": -1.0,
+        "zmax": 1.0,
+        "colormap": "coolwarm",
+    }
+
+
+def bar_spec(values, title: str, x_label: str = "", y_label: str = "") -> ChartSpec:
+    """Spec for a bar chart of a Series (index -> bar label)."""
+    return {
+        "type": "bar",
+        "title": title,
+        "x": [str(k) for k in values.index],
+        "y": [_num(v) for v in values.to_numpy()],
+        "x_label": x_label,
+        "y_label": y_label,
+    }
+
+
+# -------------------- Rasterisation (object-oriented Agg, no pyplot) --------------------
+def _draw_heatmap(fig, spec: ChartSpec) -> None:
+    import numpy as np
+
+    ax = fig.add_subplot(111)
+    z = np.array([[np.nan if v is None else v for v in row] for row in spec["z"]], dtype=float)
+    im = ax.imshow(z, interpolation="nearest", cmap=spec.get("colormap", "coolwarm"),
+                   vmin=spec.get("zmin"), vmax=spec.get("zmax"))
+    ax.set_xticks(range(len(spec["x"])), spec["x"], rotation=45, ha="right")
+    ax.set_yticks(range(len(spec["y"])), spec["y"])
+    fig.colorbar(im, ax=ax)
+
+
+def _draw_bar(fig, spec: ChartSpec) -> None:
+    ax = fig.add_subplot(111)
+    heights = [0.0 if v is None else v for v in spec["y"]]
+    ax.bar(range(len(heights)), heights, color="C0")
+    ax.set_xticks(range(len(spec["x"])), spec["x"], rotation=90)
+    ax.set_xlabel(spec.get("x_label", ""))
+    ax.set_ylabel(spec.get("y_label", ""))
+    ax.set_title(spec.get("title", ""))
+
+
+_DRAWERS = {"heatmap": (_draw_heatmap, (6, 5)), "bar": (_draw_bar, (6, 4))}
+
+
+def render_png(spec: ChartSpec, dpi: int = CHART_DPI) -> bytes:
+    """Rasterise a spec to PNG bytes. Thread-safe: each call owns its Figure/canvas."""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    draw, figsize = _DRAWERS[spec["type"]]
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    draw(fig, spec)
+    fig.tight_layout()
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=dpi)
+    return buf.getvalue()
+
+
+# -------------------- Per-request batch --------------------
+class ChartBatch:
+    """
+    Collects the figures of one request and renders + uploads them on a shared
+    thread pool as soon as they are added, so rasterising one chart overlaps
+    with uploading another and with the caller's remaining analysis.
+
+    `fmt` is one of CHART_FORMATS: 'png' (upload, return URLs), 'spec' (JSON
+    only, nothing rasterised) or 'both'. `render_seconds` / `upload_seconds`
+    sum the per-chart time spent in each half (they overlap in wall time).
+    """
+
+    def __init__(self, upload: UploadFn, fmt: str = "png", dpi: int = CHART_DPI) -> None:
+        if fmt not in CHART_FORMATS:
+            raise ValueError(f"chart_format must be one of {', '.join(CHART_FORMATS)}")
+        self.upload = upload
+        self.fmt = fmt
+        self.dpi = dpi
+        self._futures: List[Future] = []
+        self._lock = threading.Lock()
+        self.render_seconds = 0.0
+        self.upload_seconds = 0.0
+
+    @property
+    def wants_png(self) -> bool:
+        return self.fmt in ("png", "both")
+
+    @property
+    def wants_spec(self) -> bool:
+        return self.fmt in ("spec", "both")
+
+    def _render_and_upload(self, spec: ChartSpec, name_hint: str) -> str:
+        t0 = time.perf_counter()
+        png = render_png(spec, self.dpi)
+        t1 = time.perf_counter()
+        try:
+            return self.upload(png, name_hint)
+        finally:
+            with self._lock:
+                self.render_seconds += t1 - t0
+                self.upload_seconds += time.perf_counter() - t1
+
+    def add(self, spec: ChartSpec, name_hint: str) -> Optional[Future]:
+        """Queue a chart; returns a Future of its URL, or None when PNGs are not wanted."""
+        if not self.wants_png:
+            return None
+        fut = _executor().submit(self._render_and_upload, spec, name_hint)
+        self._futures.append(fut)
+        return fut
+
+    def wait(self) -> List[str]:
+        """Block until every queued chart finished; returns error messages (empty on success)."""
+        errors: List[str] = []
+        for fut in self._futures:
+            exc = fut.exception()
+            if exc is not None:
+                errors.append(str(exc))
+        return errors
+
+
+def resolve(fut: Optional[Future]) -> Optional[str]:
+    """URL from a ChartBatch future (None if skipped or failed)."""
+    if fut is None or fut.exception() is not None:
+        return None
+    return fut.result()
+
+
+def resolve_all(futs: Sequence[Optional[Future]]) -> List[str]:
+    return [url for url in (resolve(f) for f in futs) if url]
@@ -0,0 +1,210 @@
+# utils/columnar.py
+from __future__ import annotations
+import importlib.util, json, math, os, re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import pandas as pd
+import dotenv
+from utils import schema as schema_mod
+
+dotenv.load_dotenv()
+
+COLUMNAR_ENABLED: bool = os.getenv("MLIFY_COLUMNAR", "true").lower() == "true"  # Parquet copy of every upload
+COLUMNAR_COMPRESSION: str = os.getenv("MLIFY_COLUMNAR_COMPRESSION", "zstd")
+COLUMNAR_ROW_GROUP_ROWS: int = int(os.getenv("MLIFY_COLUMNAR_ROW_GROUP_ROWS", "131072"))
+CSV_BLOCK_BYTES: int = int(os.getenv("MLIFY_CSV_BLOCK_BYTES", str(8 * 1024 * 1024)))
+
+COLUMNAR_SUFFIX = ".parquet"
+FOOTER_KEY = "mlify"  # key-value entry in the Parquet footer holding the schema and column stats
+FOOTER_VERSION = 1
+_BAD_COLUMN = re.compile(r"In CSV column #(\d+)")  # pyarrow's conversion error names the column by position
+
+# pandas' default NA strings, so the columnar copy has the same nulls as read_csv
+NA_VALUES = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+]
+
+
+class ColumnarUnavailable(RuntimeError):
+    """pyarrow is not installed; callers keep using the CSV."""
+
+
+def available() -> bool:
+    return COLUMNAR_ENABLED and importlib.util.find_spec("pyarrow") is not None
+
+
+def _arrow():
+    if importlib.util.find_spec("pyarrow") is None:
+        raise ColumnarUnavailable("pyarrow is not installed")
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+    return pa, pc, pa_csv, pq
+
+
+def columnar_url(file_url: str) -> Optional[str]:
+    """Where /upload put the Parquet copy of `file_url`; None for signed (query-string) URLs."""
+    return None if "?" in file_url else f"{file_url}{COLUMNAR_SUFFIX}"
+
+
+# -------------------- CSV -> Parquet --------------------
+def _arrow_types(pa, schema: Optional[schema_mod.Schema]) -> Dict[str, Any]:
+    """Arrow column types matching the inferred schema (categoricals dictionary-encoded)."""
+    kinds = {
+        schema_mod.INTEGER: pa.int64(),
+        schema_mod.FLOAT: pa.float64(),
+        schema_mod.BOOL: pa.bool_(),
+        schema_mod.CATEGORY: pa.dictionary(pa.int32(), pa.string()),
+        schema_mod.STRING: pa.string(),
+    }
+    return {col: kinds[k] for col, k in (schema or {}).get("columns", {}).items() if k in kinds}
+
+
+class _ColumnStats:
+    """Row count, nulls and numeric min/max accumulated batch by batch for the footer."""
+
+    def __init__(self, pa, pc) -> None:
+        self.pa, self.pc = pa, pc
+        self.rows = 0
+        self.columns: Dict[str, Dict[str, Any]] = {}
+
+    def update(self, batch) -> None:
+        pa, pc = self.pa, self.pc
+        self.rows += batch.num_rows
+        for field, arr in zip(batch.schema, batch.columns):
+            s = self.columns.setdefault(field.name, {"type": str(field.type), "nulls": 0})
+            s["nulls"] += arr.null_count
+            t = field.type
+            if not (pa.types.is_integer(t) or pa.types.is_floating(t) or pa.types.is_boolean(t)):
+                continue
+            mm = pc.min_max(arr).as_py()
+            for key, pick in (("min", min), ("max", max)):
+                v = mm[key]
+                if v is None or (isinstance(v, float) and not math.isfinite(v)):
+                    continue
+                s[key] = v if key not in s else pick(s[key], v)
+
+    def footer(self, schema: Optional[schema_mod.Schema], dataset_id: Optional[str]) -> Dict[str, Any]:
+        return {
+            "version": FOOTER_VERSION, "dataset_id": dataset_id, "rows": self.rows,
+            "schema": schema, "columns": self.columns,
+        }
+
+
+def _relax(pa, arrow_type) -> Tuple[Any, str]:
+    """The next wider (Arrow type, schema kind) for a column that failed to convert: int -> float -> string."""
+    if pa.types.is_integer(arrow_type):
+        return pa.float64(), schema_mod.FLOAT
+    return pa.string(), schema_mod.STRING
+
+
+def csv_to_parquet(
+    csv_path: str,
+    out_path: str,
+    schema: Optional[schema_mod.Schema] = None,
+    dataset_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Stream a CSV into a compressed Parquet file with the inferred schema applied
+    (categoricals dictionary-encoded) and return the footer: row count, the
+    schema and per-column nulls/min/max, stored under FOOTER_KEY next to
+    Parquet's own row-group statistics. When a value past the sniffed sample
+    doesn't fit its column's type, that column is widened (int -> float ->
+    string, also in `schema`) and the file is streamed again, so memory stays
+    bounded by one block whatever the file size.
+    """
+    pa, pc, pa_csv, pq = _arrow()
+    tmp = f"{out_path}.{os.getpid()}.tmp"
+    read_options = pa_csv.ReadOptions(block_size=CSV_BLOCK_BYTES)
+    column_types = _arrow_types(pa, schema)
+    names: Optional[List[str]] = None
+    widened = 0
+    try:
+        while True:
+            try:
+                reader = pa_csv.open_csv(
+                    csv_path,
+                    read_options=read_options,
+                    convert_options=pa_csv.ConvertOptions(
+                        column_types=column_types, null_values=NA_VALUES, strings_can_be_null=True,
+                    ),
+                )
+                footer = _write_batches(pa, pc, pq, tmp, reader.schema, reader, schema, dataset_id)
+                break
+            except pa.ArrowInvalid as e:
+                m = _BAD_COLUMN.search(str(e))
+                if m is None:
+                    raise
+                if names is None:
+                    names = pa_csv.open_csv(csv_path, read_options=read_options).schema.names
+                col = names[int(m.group(1))]
+                current = column_types.get(col, pa.int64())  # unsniffed columns were inferred from block one
+                widened += 1
+                if pa.types.is_string(current) or widened > 2 * len(names):  # nothing wider: a malformed file
+                    raise
+                kinds = (schema or {}).get("columns", {})
+                column_types[col], kind = _relax(pa, current)
+                if col in kinds:
+                    kinds[col] = kind
+        os.replace(tmp, out_path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    return footer
+
+
+def _write_batches(pa, pc, pq, path, arrow_schema, batches, schema, dataset_id) -> Dict[str, Any]:
+    stats = _ColumnStats(pa, pc)
+    pending: List[Any] = []
+    pending_rows = 0
+    with pq.ParquetWriter(path, arrow_schema, compression=COLUMNAR_COMPRESSION) as writer:
+        for batch in batches:
+            stats.update(batch)
+            pending.append(batch)
+            pending_rows += batch.num_rows
+            if pending_rows >= COLUMNAR_ROW_GROUP_ROWS:  # CSV blocks are small; group them into full row groups
+                writer.write_table(pa.Table.from_batches(pending, arrow_schema), row_group_size=COLUMNAR_ROW_GROUP_ROWS)
+                pending, pending_rows = [], 0
+        if pending:
+            writer.write_table(pa.Table.from_batches(pending, arrow_schema), row_group_size=COLUMNAR_ROW_GROUP_ROWS)
+        footer = stats.footer(schema, dataset_id)
+        writer.add_key_value_metadata({FOOTER_KEY: json.dumps(footer)})
+    return footer
+
+
+# -------------------- Reading --------------------
+def read_footer(path: str) -> Optional[Dict[str, Any]]:
+    """The FOOTER_KEY entry of a Parquet file (None for files written elsewhere)."""
+    _, _, _, pq = _arrow()
+    raw = (pq.read_metadata(path).metadata or {}).get(FOOTER_KEY.encode())
+    return json.loads(raw) if raw else None
+
+
+def column_names(path: str) -> List[str]:
+    _, _, _, pq = _arrow()
+    return pq.read_schema(path).names
+
+
+def read_parquet(
+    path: str,
+    columns: Optional[Sequence[str]] = None,
+    schema: Optional[schema_mod.Schema] = None,
+) -> pd.DataFrame:
+    """
+    Read a Parquet file, decoding only `columns` (names the file lacks are
+    skipped, the caller reports them), with numerics downcast and categories
+    sorted as read_csv would produce them.
+    """
+    if columns is not None:
+        names = set(column_names(path))
+        columns = [c for c in columns if c in names]
+    df = pd.read_parquet(path, columns=columns)
+    for col in df.columns:
+        s = df[col]
+        if isinstance(s.dtype, pd.CategoricalDtype) and not s.cat.ordered:
+            df[col] = s.cat.reorder_categories(sorted(s.cat.categories))  # Arrow keeps first-seen order
+    return schema_mod.downcast(df, schema)
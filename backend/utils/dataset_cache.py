@@ -0,0 +1,308 @@
+# utils/dataset_cache.py
+from __future__ import annotations
+import hashlib, json, os, re, tempfile, threading
+from collections import OrderedDict
+from typing import Dict, Optional, Sequence, Tuple
+import pandas as pd
+import dotenv
+from utils import columnar
+from utils import schema as schema_mod
+from utils.shared_store import SharedStore, shared_store
+
+dotenv.load_dotenv()
+
+CACHE_DIR: str = os.getenv("MLIFY_CACHE_DIR", os.path.join(tempfile.gettempdir(), "mlify-cache"))
+CACHE_MAX_BYTES: int = int(os.getenv("MLIFY_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+CACHE_DISK_MAX_BYTES: int = int(os.getenv("MLIFY_CACHE_DISK_MAX_BYTES", str(4 * 1024 * 1024 * 1024)))
+
+_INDEX_FILE = "index.json"
+_TMP_DIR = "tmp"  # in-progress spools / downloads; never evicted
+_ENTRY = re.compile(r"^([0-9a-f]{64})\.(?:parquet|pkl|csv)$")  # <digest>.<ext> disk entries, the only files evicted
+
+
+def content_hash(data: bytes) -> str:
+    """Stable id for a dataset: sha256 of the raw uploaded bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def content_hash_file(path: str) -> str:
+    """content_hash of a file on disk, read block by block."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _frame_nbytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+class DatasetCache:
+    """
+    Two-tier cache of parsed DataFrames keyed by content hash.
+
+    Memory tier is an LRU bounded by `max_bytes`; every frame is also written to
+    `cache_dir` as Parquet (Pickle if pyarrow is missing) so evicted entries and
+    other worker processes can reload without hitting the network. Uploads land
+    here as the Parquet copy written at upload time (raw CSV if pyarrow is
+    missing); `get(..., columns=)` decodes only the requested Parquet columns.
+    A small url -> hash index lets `/process` resolve a storage URL before downloading.
+
+    With a `shared` store (multi-worker mode), parsed frames are published
+    there instead of the per-process memory tier, and every worker maps them
+    zero-copy rather than decoding its own copy.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = CACHE_MAX_BYTES,
+        cache_dir: str = CACHE_DIR,
+        disk_max_bytes: int = CACHE_DISK_MAX_BYTES,
+        shared: Optional[SharedStore] = None,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.shared = shared
+        self._mem: "OrderedDict[str, Tuple[pd.DataFrame, int]]" = OrderedDict()
+        self._mem_bytes = 0
+        self._urls: Dict[str, str] = {}
+        self._lock = threading.RLock()
+        self.tmp_dir = os.path.join(cache_dir, _TMP_DIR)  # same filesystem, so finished files are moved in
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        self._load_index()
+
+    # ---------- url index ----------
+    def _index_path(self) -> str:
+        return os.path.join(self.cache_dir, _INDEX_FILE)
+
+    def _load_index(self) -> None:
+        try:
+            with open(self._index_path(), "r", encoding="utf-8") as fh:
+                self._urls.update(json.load(fh))
+        except (OSError, ValueError):
+            pass
+
+    def _save_index(self) -> None:
+        tmp = f"{self._index_path()}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as fh:
+                json.dump(self._urls, fh)
+            os.replace(tmp, self._index_path())
+        except OSError:
+            pass
+
+    def register_url(self, url: str, digest: str) -> None:
+        with self._lock:
+            if self._urls.get(url) == digest:
+                return
+            self._urls[url] = digest
+            self._save_index()
+
+    def resolve(self, url: str) -> Optional[str]:
+        """Map a storage URL to a dataset hash, if we've seen it before."""
+        with self._lock:
+            digest = self._urls.get(url)
+            if digest is None:
+                self._load_index()  # another worker may have registered it
+                digest = self._urls.get(url)
+            return digest
+
+    # ---------- disk tier ----------
+    def _disk_paths(self, digest: str) -> Tuple[str, str, str]:
+        base = os.path.join(self.cache_dir, digest)
+        return f"{base}.parquet", f"{base}.pkl", f"{base}.csv"
+
+    def _write_disk(self, digest: str, df: pd.DataFrame) -> None:
+        parquet_path, pickle_path, _ = self._disk_paths(digest)
+        if os.path.exists(parquet_path) or os.path.exists(pickle_path):
+            return
+        try:
+            tmp = f"{parquet_path}.{os.getpid()}.tmp"
+            df.to_parquet(tmp, index=False)
+            os.replace(tmp, parquet_path)
+        except Exception:
+            try:
+                tmp = f"{pickle_path}.{os.getpid()}.tmp"
+                df.to_pickle(tmp)
+                os.replace(tmp, pickle_path)
+            except Exception:
+                return
+        self._evict_disk(keep=digest)
+
+    def _read_disk(self, digest: str, columns: Optional[Sequence[str]] = None) -> Optional[pd.DataFrame]:
+        parquet_path, pickle_path, csv_path = self._disk_paths(digest)
+        read_parquet = lambda p: columnar.read_parquet(p, columns, self.get_schema(digest))  # noqa: E731
+        read_csv = lambda p: schema_mod.read_csv(p, self.get_schema(digest))  # noqa: E731
+        for path, reader in ((parquet_path, read_parquet), (pickle_path, pd.read_pickle), (csv_path, read_csv)):
+            if os.path.exists(path):
+                try:
+                    df = reader(path)
+                    os.utime(path)  # bump recency for disk LRU
+                    return df
+                except Exception:
+                    continue
+        return None
+
+    def _evict_disk(self, keep: Optional[str] = None) -> None:
+        """
+        Drop the least recently used <digest>.<ext> entries until under
+        disk_max_bytes; the entry of `keep` (the digest just added) stays.
+        Temp files and sidecars are never touched.
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            m = _ENTRY.match(name)
+            if m is None or m.group(1) == keep:
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        if keep is not None:
+            for path in self._disk_paths(keep):
+                try:
+                    total += os.path.getsize(path)
+                except OSError:
+                    pass
+        for _, size, path in sorted(entries):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    # ---------- memory tier ----------
+    def _put_mem(self, digest: str, df: pd.DataFrame) -> None:
+        nbytes = _frame_nbytes(df)
+        if nbytes > self.max_bytes:
+            return  # would evict everything else; disk tier still has it
+        if digest in self._mem:
+            self._mem_bytes -= self._mem.pop(digest)[1]
+        self._mem[digest] = (df, nbytes)
+        self._mem_bytes += nbytes
+        while self._mem_bytes > self.max_bytes and self._mem:
+            _, (_, old_bytes) = self._mem.popitem(last=False)
+            self._mem_bytes -= old_bytes
+
+    def _publish(self, digest: str, df: pd.DataFrame) -> None:
+        """Keep a parsed frame for the next get: in the shared store if there is one, else in memory."""
+        if self.shared is None or not self.shared.put(digest, df):
+            self._put_mem(digest, df)
+
+    # ---------- public API ----------
+    def put(self, digest: str, df: pd.DataFrame, url: Optional[str] = None) -> None:
+        """Register a parsed frame under its content hash (and optionally its URL)."""
+        with self._lock:
+            self._publish(digest, df)
+            self._write_disk(digest, df)
+            if url:
+                self.register_url(url, digest)
+
+    def put_file(self, digest: str, path: str, url: Optional[str] = None) -> None:
+        """Adopt a raw CSV on local disk (moved, not copied) without parsing it."""
+        with self._lock:
+            *_, csv_path = self._disk_paths(digest)
+            if os.path.exists(csv_path):
+                os.remove(path)
+            else:
+                os.replace(path, csv_path)
+                self._evict_disk(keep=digest)
+            if url:
+                self.register_url(url, digest)
+
+    def put_columnar(self, digest: str, path: str, url: Optional[str] = None) -> None:
+        """Adopt a Parquet copy of an upload (moved, not copied); it replaces any raw CSV entry."""
+        with self._lock:
+            parquet_path, _, csv_path = self._disk_paths(digest)
+            os.replace(path, parquet_path)
+            try:
+                os.remove(csv_path)
+            except OSError:
+                pass
+            self._evict_disk(keep=digest)  # a copy larger than the disk budget still serves this request
+            if url:
+                self.register_url(url, digest)
+
+    def _put_json(self, name: str, obj: Dict) -> None:
+        path = os.path.join(self.cache_dir, name)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as fh:
+                json.dump(obj, fh)
+            os.replace(tmp, path)
+        except OSError:
+            pass
+
+    def _get_json(self, name: str) -> Optional[Dict]:
+        try:
+            with open(os.path.join(self.cache_dir, name), "r", encoding="utf-8") as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return None
+
+    def put_schema(self, digest: str, schema: Dict) -> None:
+        """Store the inferred dtype schema next to the dataset so loads can apply it directly."""
+        self._put_json(f"{digest}.schema.json", schema)
+
+    def get_schema(self, digest: str) -> Optional[Dict]:
+        return self._get_json(f"{digest}.schema.json")
+
+    def put_profile(self, digest: str, profile: Dict) -> None:
+        """Store the upload-time dataset profile (utils.dataset_profile) for /process to reuse."""
+        self._put_json(f"{digest}.profile.json", profile)
+
+    def get_profile(self, digest: str) -> Optional[Dict]:
+        return self._get_json(f"{digest}.profile.json")
+
+    def columnar_path(self, digest: str) -> Optional[str]:
+        """The local Parquet entry of `digest`, for readers that stream it instead of loading it."""
+        path = self._disk_paths(digest)[0]
+        return path if os.path.exists(path) else None
+
+    def get(self, digest: str, columns: Optional[Sequence[str]] = None) -> Optional[pd.DataFrame]:
+        """
+        Return a private copy of the cached frame, or None on a miss. With
+        `columns`, only those present are returned, and a Parquet entry that
+        isn't in memory is read for just those columns (not cached in memory).
+        Frames from the shared store are not copied: their numeric columns are
+        read-only views of the mapping (replace or fillna them; don't assign into them).
+        """
+        with self._lock:
+            hit = self._mem.get(digest)
+            if hit is not None:
+                self._mem.move_to_end(digest)
+                df = hit[0]
+                return (df if columns is None else df[[c for c in columns if c in df.columns]]).copy()
+            if self.shared is not None:
+                df = self.shared.get(digest, columns)
+                if df is not None:
+                    return df
+            parquet_path = self._disk_paths(digest)[0]
+            if columns is not None and os.path.exists(parquet_path):
+                df = self._read_disk(digest, columns)
+                if df is not None:
+                    return df
+            df = self._read_disk(digest)
+            if df is None:
+                return None
+            self._publish(digest, df)
+            self._write_disk(digest, df)  # raw CSV entries get a columnar copy for next time
+            return (df if columns is None else df[[c for c in columns if c in df.columns]]).copy()
+
+    def get_by_url(self, url: str) -> Optional[pd.DataFrame]:
+        digest = self.resolve(url)
+        return self.get(digest) if digest else None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._mem), "bytes": self._mem_bytes, "max_bytes": self.max_bytes}
+
+
+dataset_cache = DatasetCache(shared=shared_store)
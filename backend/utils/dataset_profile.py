@@ -0,0 +1,140 @@
+# utils/dataset_profile.py
+from __future__ import annotations
+import math, os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+import dotenv
+from utils import columnar
+from utils.impute import mode_from_counts
+from utils.schema import CATEGORICAL_DTYPES
+from utils.streaming_stats import StreamingStats, scan_frame, scan_parquet
+
+dotenv.load_dotenv()
+
+PROFILE_VERSION = 1
+PROFILE_TOP_LEVELS: int = int(os.getenv("MLIFY_PROFILE_TOP_LEVELS", "10"))  # most frequent levels kept per categorical
+PROFILE_SKETCH_MAX_COLS: int = int(os.getenv("MLIFY_PROFILE_SKETCH_MAX_COLS", "500"))  # sketch is 4 k x k matrices
+PROFILE_SUFFIX = ".profile.json"
+
+Profile = Dict[str, Any]
+
+
+def _json(v: Any) -> Any:
+    if isinstance(v, np.generic):
+        v = v.item()
+    if isinstance(v, float) and not math.isfinite(v):
+        return None
+    return v
+
+
+def profile_url(file_url: str) -> Optional[str]:
+    """Where /upload put the profile sidecar of `file_url`; None for signed (query-string) URLs."""
+    return None if "?" in file_url else f"{file_url}{PROFILE_SUFFIX}"
+
+
+# -------------------- Build (at upload) --------------------
+def _column_entry(s: pd.Series) -> Tuple[Optional[str], Dict[str, Any]]:
+    """(kind, stats) for one column; kind follows the select_dtypes split /process uses."""
+    frame = s.to_frame()
+    kind = (
+        "numeric" if frame.select_dtypes(include=[np.number]).shape[1]
+        else "categorical" if frame.select_dtypes(include=CATEGORICAL_DTYPES).shape[1]
+        else None
+    )
+    entry: Dict[str, Any] = {"dtype": str(s.dtype), "nulls": int(s.isnull().sum())}
+    if kind == "categorical":
+        vc = s.value_counts(dropna=True, sort=True)
+        seen = vc[vc > 0]  # categorical dtypes also count unused levels
+        entry["unique"] = int(len(seen))
+        entry["top"] = [[_json(k), int(n)] for k, n in seen.head(PROFILE_TOP_LEVELS).items()]
+        entry["mode"] = _json(mode_from_counts(vc))
+    else:
+        entry["unique"] = int(s.nunique(dropna=True))
+        if kind == "numeric":
+            entry.update({
+                "min": _json(s.min()), "max": _json(s.max()), "mean": _json(s.mean()),
+                "std": _json(s.std()), "median": _json(s.median()),
+            })
+    return kind, entry
+
+
+def _assemble(entries: List[Tuple[str, Optional[str], Dict[str, Any]]], rows: int, sketch_fn, dataset_id) -> Profile:
+    numeric_cols = [c for c, kind, _ in entries if kind == "numeric"]
+    sketch = None
+    if 0 < len(numeric_cols) <= PROFILE_SKETCH_MAX_COLS:
+        sketch = sketch_fn(numeric_cols).to_dict()
+    return {
+        "version": PROFILE_VERSION,
+        "dataset_id": dataset_id,
+        "rows": int(rows),
+        "cols": len(entries),
+        "numeric_cols": numeric_cols,
+        "categorical_cols": [c for c, kind, _ in entries if kind == "categorical"],
+        "columns": {c: entry for c, _, entry in entries},
+        "covariance": sketch,
+    }
+
+
+def build_profile(df: pd.DataFrame, dataset_id: Optional[str] = None) -> Profile:
+    """
+    Per-column dtype, nulls and cardinality; min/max/mean/std/median for numeric
+    columns; top levels and mode for categoricals; and a covariance sketch
+    (StreamingStats moments) of the numeric block. `df` must be the frame
+    /process loads, so the dtype split matches what it would compute.
+    """
+    entries = [(str(c), *_column_entry(df[c])) for c in df.columns]
+    return _assemble(entries, len(df), lambda cols: scan_frame(df[cols], StreamingStats(cols)), dataset_id)
+
+
+def build_profile_parquet(path: str, schema: Optional[Dict[str, Any]] = None, dataset_id: Optional[str] = None) -> Profile:
+    """build_profile over the upload's Parquet copy, one column (and one row group for the sketch) at a time."""
+    names = columnar.column_names(path)
+    entries = [(c, *_column_entry(columnar.read_parquet(path, [c], schema)[c])) for c in names]
+    rows = columnar.read_footer(path)["rows"]
+    return _assemble(entries, rows, lambda cols: scan_parquet(path, StreamingStats(cols), columns=cols), dataset_id)
+
+
+def summary(profile: Profile) -> Profile:
+    """The profile without the covariance sketch (what /upload returns)."""
+    return {k: v for k, v in profile.items() if k != "covariance"}
+
+
+# -------------------- Reuse (in /process) --------------------
+def matches(profile: Optional[Profile], df: pd.DataFrame) -> bool:
+    """True if `profile` describes `df` (same rows, every column present with the same dtype)."""
+    if not profile or profile.get("version") != PROFILE_VERSION or profile.get("rows") != len(df):
+        return False
+    cols = profile.get("columns") or {}
+    return all(str(c) in cols and cols[str(c)]["dtype"] == str(df[c].dtype) for c in df.columns)
+
+
+def missing_counts(profile: Profile, columns: Sequence[str]) -> pd.Series:
+    """What df[columns].isnull().sum() returns."""
+    return pd.Series([profile["columns"][str(c)]["nulls"] for c in columns], index=list(columns), dtype="int64")
+
+
+def column_types(profile: Profile, columns: Sequence[str]) -> Tuple[List[str], List[str]]:
+    """(numeric, categorical) columns in frame order, as select_dtypes would split them."""
+    numeric, categorical = set(profile["numeric_cols"]), set(profile["categorical_cols"])
+    return [c for c in columns if str(c) in numeric], [c for c in columns if str(c) in categorical]
+
+
+def known_fills(profile: Profile, numeric: str, categorical: str) -> Dict[str, Any]:
+    """Imputer statistics the profile already has for these strategies (see Imputer.fit `known`)."""
+    stat = {"median": "median", "mean": "mean"}.get(numeric)
+    out: Dict[str, Any] = {}
+    for col, entry in profile["columns"].items():
+        if stat and stat in entry and entry[stat] is not None:
+            out[col] = entry[stat]
+        elif categorical == "mode" and "mode" in entry:
+            out[col] = entry["mode"]
+    return out
+
+
+def covariance(profile: Profile, columns: Sequence[str]) -> Optional[StreamingStats]:
+    """The upload-time moments for `columns` (pre-imputation), or None if not sketched."""
+    sketch = profile.get("covariance")
+    if not sketch or not set(map(str, columns)) <= set(sketch["columns"]):
+        return None
+    return StreamingStats.from_dict(sketch).subset(columns)
@@ -0,0 +1,221 @@
+# utils/drivers.py
+from __future__ import annotations
+import math, os, warnings
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+import dotenv
+
+dotenv.load_dotenv()
+
+DRIVER_BINS: int = min(254, int(os.getenv("MLIFY_DRIVER_BINS", "16")))  # equal-frequency bins per numeric column
+DRIVER_MAX_LEVELS: int = min(254, int(os.getenv("MLIFY_DRIVER_MAX_LEVELS", "64")))  # the rarest levels are pooled
+DRIVER_SAMPLE_ROWS: int = int(os.getenv("MLIFY_DRIVER_SAMPLE_ROWS", "200000"))  # rows scored at most (0 = all)
+DRIVER_MAX_CELLS: int = int(os.getenv("MLIFY_DRIVER_MAX_CELLS", str(50_000_000)))  # rows x features coded at most
+DRIVER_BATCH_COLS: int = int(os.getenv("MLIFY_DRIVER_BATCH_COLS", "32"))  # features per joint-histogram pass
+DRIVER_WORKERS: int = int(os.getenv("MLIFY_DRIVER_WORKERS", str(min(4, os.cpu_count() or 1))))
+DRIVER_MIN_ROWS = 1000  # wide frames never go below this many sampled rows
+DRIVER_EDGE_ROWS = 50_000  # rows the bin edges are estimated from
+
+NUMERIC, CATEGORICAL = "numeric", "categorical"
+
+
+# -------------------- Discretisation --------------------
+def _sample_rows(n: int, limit: int, seed: int) -> Optional[np.ndarray]:
+    """Sorted row positions of a uniform sample of `limit` rows; None to keep all `n`."""
+    if limit <= 0 or n <= limit:
+        return None
+    return np.sort(np.random.default_rng(seed).choice(n, size=limit, replace=False))
+
+
+def _bin_codes(block: np.ndarray, bins: int, seed: int = 0) -> np.ndarray:
+    """Equal-frequency bin of every value of a float block (rows x columns); NaN gets bin `bins`."""
+    rows = _sample_rows(len(block), DRIVER_EDGE_ROWS, seed)
+    ref = block if rows is None else block[rows]
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN columns
+        edges = np.nanquantile(ref, np.linspace(0.0, 1.0, bins + 1)[1:-1], axis=0)
+    codes = np.empty(block.shape, dtype=np.uint8)
+    for j in range(block.shape[1]):
+        col = block[:, j]
+        c = np.searchsorted(edges[:, j], col, side="right")  # tied edges just leave empty bins
+        c[np.isnan(col)] = bins
+        codes[:, j] = c
+    return codes
+
+
+def _level_codes(s: pd.Series, max_levels: int) -> np.ndarray:
+    """Level codes with only the `max_levels - 1` most frequent levels kept; missing gets code `max_levels`."""
+    codes, _ = pd.factorize(s)
+    present = codes >= 0
+    counts = np.bincount(codes[present])
+    if len(counts) > max_levels:
+        remap = np.full(len(counts), max_levels - 1, dtype=np.int64)  # pooled "other" level
+        top = np.argsort(counts, kind="stable")[::-1][: max_levels - 1]
+        remap[top] = np.arange(len(top))
+        codes = np.where(present, remap[np.where(present, codes, 0)], -1)
+    return np.where(present, codes, max_levels).astype(np.uint8)
+
+
+class FeatureCodes:
+    """
+    Columns discretised once so every feature can be scored against any target
+    with integer histograms: numeric columns into `bins` equal-frequency bins,
+    categoricals into their most frequent levels (the rest pooled), missing
+    values into a bin of their own. Rows are sampled down to `sample_rows`, and
+    further on wide frames so rows x columns stays under `max_cells`; numeric
+    columns are binned in blocks on `workers` threads. A batch codes a dataset
+    once and ranks each of its targets from the same codes.
+    """
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        numeric: Sequence[str],
+        categorical: Sequence[str],
+        bins: int = DRIVER_BINS,
+        max_levels: int = DRIVER_MAX_LEVELS,
+        sample_rows: int = DRIVER_SAMPLE_ROWS,
+        max_cells: int = DRIVER_MAX_CELLS,
+        seed: int = 42,
+        workers: int = DRIVER_WORKERS,
+    ) -> None:
+        columns = list(numeric) + list(categorical)
+        limit = sample_rows or len(df)
+        if columns:
+            limit = min(limit, max(DRIVER_MIN_ROWS, max_cells // len(columns)))
+        rows = _sample_rows(len(df), limit, seed)
+        frame = df[columns] if rows is None else df[columns].take(rows)
+
+        self.bins = bins
+        self.max_levels = max_levels
+        self.rows_total = int(len(df))
+        self.columns = columns
+        self.kinds = {c: NUMERIC for c in numeric} | {c: CATEGORICAL for c in categorical}
+        self.width = max(bins, max_levels) + 1  # codes per column, missing included
+        self._pos = {c: i for i, c in enumerate(columns)}
+        self.codes = np.empty((len(frame), len(columns)), dtype=np.uint8)
+
+        def _code(start: int) -> None:
+            chunk = list(numeric[start:start + DRIVER_BATCH_COLS])
+            block = frame[chunk].to_numpy(dtype=np.float64, na_value=np.nan)
+            self.codes[:, start:start + len(chunk)] = _bin_codes(block, bins, seed)
+
+        starts = range(0, len(numeric), DRIVER_BATCH_COLS)
+        if workers > 1 and len(starts) > 1:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mlify-drivers") as pool:
+                list(pool.map(_code, starts))
+        else:
+            for start in starts:
+                _code(start)
+        for j, col in enumerate(categorical, start=len(numeric)):
+            self.codes[:, j] = _level_codes(frame[col], max_levels)
+
+    @property
+    def rows_used(self) -> int:
+        return int(self.codes.shape[0])
+
+    def positions(self, columns: Sequence[str]) -> List[int]:
+        return [self._pos[c] for c in columns]
+
+
+# -------------------- Scoring --------------------
+def _mi_from_counts(counts: np.ndarray, n: int) -> np.ndarray:
+    """Mutual information (nats) of each (feature, target) contingency table in `counts` (k x width x classes)."""
+    p = counts / n
+    px = p.sum(axis=2, keepdims=True)
+    py = p.sum(axis=1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        terms = np.where(p > 0, p * np.log(p / (px * py)), 0.0)
+    mi = terms.sum(axis=(1, 2))
+    # Miller-Madow: the plug-in estimate is biased up by about (bins_x - 1)(bins_y - 1) / 2n under independence
+    bx = (counts.sum(axis=2) > 0).sum(axis=1)
+    by = (counts.sum(axis=1) > 0).sum(axis=1)
+    return np.maximum(mi - (bx - 1) * (by - 1) / (2.0 * n), 0.0)
+
+
+def mutual_information(
+    codes: np.ndarray, y: np.ndarray, width: int, n_classes: int, workers: int = DRIVER_WORKERS,
+) -> np.ndarray:
+    """
+    Mutual information of every column of `codes` with `y`: each batch of
+    DRIVER_BATCH_COLS columns is one bincount over (column, code, class)
+    triples, and batches run on `workers` threads.
+    """
+    n, p = codes.shape
+    cells = width * n_classes
+
+    def _batch(j0: int, j1: int) -> np.ndarray:
+        k = j1 - j0
+        idx = codes[:, j0:j1].astype(np.int64)
+        idx *= n_classes
+        idx += y[:, None]
+        idx += (np.arange(k, dtype=np.int64) * cells)[None, :]
+        counts = np.bincount(idx.ravel(), minlength=k * cells).reshape(k, width, n_classes)
+        return _mi_from_counts(counts, n)
+
+    spans = [(s, min(p, s + DRIVER_BATCH_COLS)) for s in range(0, p, DRIVER_BATCH_COLS)]
+    if not spans:
+        return np.empty(0)
+    if workers <= 1 or len(spans) == 1:
+        return np.concatenate([_batch(*s) for s in spans])
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mlify-drivers") as pool:
+        return np.concatenate(list(pool.map(lambda s: _batch(*s), spans)))
+
+
+def _entropy(y: np.ndarray) -> float:
+    p = np.bincount(y) / len(y)
+    p = p[p > 0]
+    return float(-(p * np.log(p)).sum())
+
+
+def rank_drivers(
+    codes: FeatureCodes,
+    target: str,
+    features: Optional[Sequence[str]] = None,
+    correlations: Optional[Mapping[str, float]] = None,
+    workers: int = DRIVER_WORKERS,
+) -> Dict[str, Any]:
+    """
+    Rank `features` (default: every coded column but the target) by mutual
+    information with `target`, which must be one of the coded columns. Each
+    driver carries its effect size three ways: `mutual_info` in nats,
+    `strength` = sqrt(1 - exp(-2 MI)) (the informational coefficient of
+    correlation, which equals |r| for a bivariate normal and is comparable
+    across numeric and categorical features) and `share`, the fraction of the
+    target's entropy it explains. `correlation` is copied from `correlations`
+    when given, so numeric drivers keep their direction. No model is fitted.
+    """
+    features = [c for c in (features if features is not None else codes.columns) if c != target]
+    y = codes.codes[:, codes.positions([target])[0]].astype(np.int64)
+    n_classes = int(y.max()) + 1 if len(y) else 1
+    mi = mutual_information(codes.codes[:, codes.positions(features)], y, codes.width, n_classes, workers)
+    h = _entropy(y) if len(y) else 0.0
+
+    drivers: List[Dict[str, Any]] = []
+    for col, value in sorted(zip(features, mi.tolist()), key=lambda kv: (-kv[1], kv[0])):
+        entry: Dict[str, Any] = {
+            "feature": col,
+            "kind": codes.kinds[col],
+            "mutual_info": value,
+            "strength": math.sqrt(1.0 - math.exp(-2.0 * value)),
+            "share": value / h if h > 0 else 0.0,
+        }
+        if correlations is not None and col in correlations:
+            entry["correlation"] = correlations[col]
+        entry["rank"] = len(drivers) + 1
+        drivers.append(entry)
+    return {
+        "method": "mutual_information",
+        "bins": codes.bins,
+        "rows_used": codes.rows_used,
+        "rows_total": codes.rows_total,
+        "sampled": codes.rows_used < codes.rows_total,
+        "drivers": drivers,
+    }
+
+
+def insight_features(drivers: Sequence[Mapping[str, Any]]) -> List[Tuple[str, float]]:
+    """(feature, strength) pairs in rank order, the shape of the `insights` top/low feature lists."""
+    return [(d["feature"], d["strength"]) for d in drivers]
@@ -1,89 +1,327 @@
-import os
-import textwrap
-from typing import List, Dict, Any
-# Gemini SDK
-import google.generativeai as genai
-
-def _summarize_for_prompt(d: Dict[str, float], top_k: int = 10) -> List[Dict[str, float]]:
-    """Top-k by absolute value; keeps payload concise."""
+# utils/gemini.py
+from __future__ import annotations
+import asyncio, hashlib, json, os, textwrap, threading, time
+from typing import Any, Dict, List, Optional, Tuple
+import dotenv
+
+from utils.dataset_cache import CACHE_DIR
+
+dotenv.load_dotenv()
+
+GEMINI_MODEL: str = os.getenv("MLIFY_GEMINI_MODEL", "gemini-1.5-flash")
+GEMINI_TIMEOUT: float = float(os.getenv("MLIFY_GEMINI_TIMEOUT", "20"))  # seconds per generate call
+INSIGHT_BACKEND: str = os.getenv("MLIFY_INSIGHT_BACKEND", "gemini")  # gemini | stub (offline, deterministic)
+INSIGHT_CACHE_DIR: str = os.getenv("MLIFY_INSIGHT_CACHE_DIR", os.path.join(CACHE_DIR, "insights"))
+INSIGHT_CACHE_TTL: float = float(os.getenv("MLIFY_INSIGHT_CACHE_TTL", str(24 * 3600)))
+INSIGHT_CACHE_MAX: int = int(os.getenv("MLIFY_INSIGHT_CACHE_MAX", "2000"))  # entries on disk
+
+MAX_POINTS = 3
+MAX_POINT_CHARS = 220
+PROMPT_VERSION = 2  # bump when the prompt changes so cached answers to the old one are ignored
+
+SYSTEM_INSTRUCTIONS = textwrap.dedent("""
+    You are a senior data strategist advising executives.
+
+    You receive:
+      • A dataset summary (rows, columns, target column name)
+      • Top correlations between numeric and categorical features and the target
+      • The top drivers of the target, ranked by how much each feature tells about it
+        (effect 0–1, comparable across numeric and categorical features; direction when known)
+
+    Your audience:
+      • Senior executives, strategy heads, and decision-makers with limited time but deep business acumen
+      • They seek forward-looking insights, not surface-level observations
+
+    TASK:
+      • Write exactly 3 concise, high-impact, decision-oriented one-liners (max 25 words each).
+      • Interpret correlations in context — focus on why these relationships might exist and what decisions they imply.
+      • Lead with the strongest drivers; a driver with no direction may act non-linearly or through segments.
+      • Highlight potential causal mechanisms, business drivers, or strategic opportunities — not descriptive trivia.
+      • If patterns suggest risks, inefficiencies, or leverage points, articulate them clearly.
+      • Avoid obvious statements (“X correlates with Y”) — instead explain significance (“Faster onboarding drives retention—optimize training.”)
+      • Prefer insights that imply action or resource allocation.
+      • Avoid statistical jargon.
+      • Be specific and directional; use verbs that show causality or enablement.
+      • Be bold but credible — it’s fine to hypothesize causes if phrased as “suggests” or “indicates”.
+
+    FORMAT:
+      • Return a pure JSON array of 3 strings.
+      • No numbering, no bullets, no markdown.
+""")
+
+
+# -------------------- Prompt --------------------
+def top_correlations(d: Dict[str, float], k: int = 10) -> List[Dict[str, Any]]:
+    """Top-k by absolute value with a direction/strength label; keeps the payload concise."""
     if not isinstance(d, dict):
         return []
     return [
-        {"feature": k, "corr": float(v)}
-        for k, v in sorted(d.items(), key=lambda kv: abs(kv[1]), reverse=True)[:top_k]
+        {
+            "feature": kk,
+            "corr": float(vv),
+            "direction": "positive" if vv > 0 else "negative",
+            "strength": "strong" if abs(vv) >= 0.5 else "moderate" if abs(vv) >= 0.3 else "weak",
+        }
+        for kk, vv in sorted(d.items(), key=lambda kv: abs(kv[1]), reverse=True)[:k]
     ]
 
-def get_gemini_insights(
-    target: str,
-    numeric_corr: Dict[str, float],
-    cat_corr: Dict[str, float],
-    dataset_profile: Dict[str, Any],
-    max_points: int = 3,
-) -> List[str]:
+
+def top_drivers(drivers: List[Dict[str, Any]], k: int = 10) -> List[Dict[str, Any]]:
+    """The k highest-ranked drivers from utils.drivers.rank_drivers, labelled like top_correlations."""
+    out = []
+    for d in (drivers or [])[:k]:
+        effect = float(d["strength"])
+        entry = {
+            "feature": d["feature"],
+            "kind": d["kind"],
+            "effect": round(effect, 4),
+            "strength": "strong" if effect >= 0.5 else "moderate" if effect >= 0.3 else "weak",
+        }
+        if d.get("correlation") is not None:
+            entry["direction"] = "positive" if d["correlation"] > 0 else "negative"
+        out.append(entry)
+    return out
+
+
+def build_prompt(payload_for_ai: Dict[str, Any]) -> str:
+    return (
+        SYSTEM_INSTRUCTIONS
+        + "\n\nDATA (JSON):\n"
+        + json.dumps(payload_for_ai, default=str)
+        + f"\n\nOUTPUT:\nReturn exactly {MAX_POINTS} insights as a JSON list of strings."
+    )
+
+
+def fallback_points(payload_for_ai: Dict[str, Any]) -> List[str]:
+    """Rule-based bullets used whenever the model can't answer."""
+    target = payload_for_ai.get("target")
+    numeric_top = payload_for_ai.get("numeric_correlations_top") or []
+    cat_top = payload_for_ai.get("categorical_correlations_top") or []
+    drivers_top = payload_for_ai.get("drivers_top") or []
+    pts: List[str] = []
+    if drivers_top and drivers_top[0]["feature"] not in {t["feature"] for t in numeric_top[:1] + cat_top[:1]}:
+        f = drivers_top[0]["feature"]
+        pts.append(f"{f} is the strongest driver of {target}; understand how it moves before optimizing other levers.")
+    if numeric_top:
+        f, c = numeric_top[0]["feature"], numeric_top[0]["corr"]
+        pts.append(f"{f} strongly {'lifts' if c > 0 else 'suppresses'} {target}; prioritize levers here to move topline.")
+    if cat_top:
+        f = cat_top[0]["feature"]
+        pts.append(f"Segments by '{f}' show performance spread—target interventions at underperforming levels.")
+    if len(pts) < MAX_POINTS:
+        pts.append("Concentrate testing on top drivers; validate causality before scaling investment.")
+    return pts[:MAX_POINTS]
+
+
+def parse_insights(text: str) -> Tuple[List[str], Optional[str]]:
+    """(insights, error): a JSON list if the model returned one, else its first non-empty lines."""
+    text = (text or "").strip()
+    try:
+        parsed = json.loads(text)
+    except Exception as je:
+        lines = [ln.strip("-• ").strip() for ln in text.splitlines()]
+        return [ln[:MAX_POINT_CHARS] for ln in lines if ln][:MAX_POINTS], f"JSON parse error: {je}"
+    if isinstance(parsed, list) and parsed:
+        return [str(x)[:MAX_POINT_CHARS] for x in parsed][:MAX_POINTS], None
+    return [], "AI returned non-JSON or empty"
+
+
+def _resp_to_text(r) -> str:
+    try:
+        t = getattr(r, "text", None)
+        if t:
+            return t
+        cands = getattr(r, "candidates", None)
+        if cands:
+            parts = getattr(cands[0].content, "parts", [])
+            return "".join(getattr(p, "text", "") for p in parts if getattr(p, "text", None))
+    except Exception:
+        pass
+    return ""
+
+
+# -------------------- Backends --------------------
+class BackendUnavailable(RuntimeError):
+    """The backend can't be used here (no API key, SDK missing); the message goes to ai_error."""
+
+
+class GeminiBackend:
+    """google-generativeai, configured once per process on first use."""
+
+    def __init__(self, model_name: str = GEMINI_MODEL) -> None:
+        self.model_name = model_name
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _client(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    api_key = os.getenv("GEMINI_API_KEY")
+                    if not api_key:
+                        raise BackendUnavailable("GEMINI_API_KEY not set")
+                    try:
+                        import google.generativeai as genai
+                    except Exception as ie:
+                        raise BackendUnavailable(f"google-generativeai not installed: {ie}") from None
+                    genai.configure(api_key=api_key)
+                    self._model = genai.GenerativeModel(self.model_name)
+        return self._model
+
+    async def generate(self, prompt: str) -> str:
+        model = self._client()
+        if hasattr(model, "generate_content_async"):
+            return _resp_to_text(await model.generate_content_async(prompt))
+        return _resp_to_text(await asyncio.to_thread(model.generate_content, prompt))
+
+
+class StubBackend:
+    """Offline backend: deterministic bullets built from the prompt's DATA block."""
+
+    model_name = "stub"
+
+    async def generate(self, prompt: str) -> str:
+        data = prompt.split("DATA (JSON):\n", 1)[-1].split("\n\nOUTPUT:", 1)[0]
+        try:
+            payload = json.loads(data)
+        except ValueError:
+            payload = {}
+        return json.dumps(fallback_points(payload))
+
+
+def make_backend(name: str = INSIGHT_BACKEND):
+    if name == "stub":
+        return StubBackend()
+    if name == "gemini":
+        return GeminiBackend()
+    raise ValueError(f"Unknown insight backend '{name}'")
+
+
+# -------------------- Cache --------------------
+class InsightCache:
     """
-    Calls Gemini and returns up to `max_points` insight bullets.
-    Safe: short payload, deterministic structure.
+    One JSON file per key under `cache_dir` so every job worker shares answers.
+    Entries older than `ttl` seconds are ignored and removed; the directory is
+    pruned (expired first, then oldest) once it holds more than `max_entries`.
     """
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        return []
 
-    genai.configure(api_key=api_key)
+    def __init__(self, cache_dir: str = INSIGHT_CACHE_DIR, ttl: float = INSIGHT_CACHE_TTL,
+                 max_entries: int = INSIGHT_CACHE_MAX) -> None:
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_entries = max_entries
+        os.makedirs(cache_dir, exist_ok=True)
 
-    # Model can be adjusted; 1.5-pro is strong on reasoning.
-    model = genai.GenerativeModel("gemini-1.5-pro")
+    @staticmethod
+    def key(payload_for_ai: Dict[str, Any], model_name: str) -> str:
+        blob = json.dumps({"v": PROMPT_VERSION, "model": model_name, "data": payload_for_ai}, sort_keys=True, default=str)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
 
-    numeric_top = _summarize_for_prompt(numeric_corr, 10)
-    cat_top = _summarize_for_prompt(cat_corr, 10)
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
 
-    system_instructions = textwrap.dedent(f"""
-    You are a senior data analyst. You receive:
-      • target column name
-      • top correlations of numeric features with the target (Pearson)
-      • top correlations of encoded categorical features with the target
-      • a tiny dataset profile (rows, columns)
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as fh:
+                entry = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry.get("created_at", 0) > self.ttl:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return entry
 
-    TASK:
-      • Produce {max_points} concise, decision-ready bullets (max 20 words each).
-      • Avoid restating raw numbers; interpret what they mean.
-      • If a correlation is small or negative, explain briefly and practically.
-      • No hedging like “may”/“might” unless warranted.
-      • No code; no tables; just bullets.
-    """)
-
-    user_payload = {
-        "target": target,
-        "dataset_profile": dataset_profile,  # e.g. {"rows": 1234, "cols": 27}
-        "numeric_correlations_top": numeric_top,
-        "categorical_correlations_top": cat_top,
-    }
-
-    prompt = (
-        "DATA (JSON):\n"
-        f"{user_payload}\n\n"
-        "OUTPUT:\n"
-        f"Return exactly {max_points} bullets as a JSON list of strings."
-    )
+    def put(self, key: str, insights: List[str], model_name: str) -> None:
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as fh:
+                json.dump({"created_at": time.time(), "model": model_name, "insights": insights}, fh)
+            os.replace(tmp, path)
+        except OSError:
+            return
+        self.prune()
 
-    try:
-        resp = model.generate_content(system_instructions + "\n\n" + prompt)
-        text = (resp.text or "").strip()
-        # Attempt to parse a JSON list; if parsing fails, fallback to line split
-        import json
-        insights = []
+    def prune(self) -> None:
         try:
-            parsed = json.loads(text)
-            if isinstance(parsed, list):
-                insights = [str(x) for x in parsed][:max_points]
-        except Exception:
-            # fallback: split by lines / bullets
-            for line in text.splitlines():
-                line = line.strip("-• ").strip()
-                if line:
-                    insights.append(line)
-                if len(insights) >= max_points:
-                    break
-        # Final cleanup/trim
-        return [i[:220] for i in insights][:max_points]
-    except Exception:
-        return []
+            names = [n for n in os.listdir(self.cache_dir) if n.endswith(".json")]
+        except OSError:
+            return
+        if len(names) <= self.max_entries:
+            return
+        now = time.time()
+        aged = []
+        for n in names:
+            try:
+                aged.append((os.path.getmtime(os.path.join(self.cache_dir, n)), n))
+            except OSError:
+                continue
+        aged.sort()
+        drop = [n for m, n in aged if now - m > self.ttl]
+        keep = [n for m, n in aged if now - m <= self.ttl]
+        drop += keep[: max(0, len(keep) - self.max_entries)]
+        for n in drop:
+            try:
+                os.remove(os.path.join(self.cache_dir, n))
+            except OSError:
+                pass
+
+
+# -------------------- Service --------------------
+class InsightService:
+    """
+    Cached, time-limited insight generation. `agenerate` is the non-blocking
+    entry point for async callers; `generate` runs it on a per-process
+    background loop so sync callers (pipeline workers) share one client.
+    Always returns bullets: model output, a cached answer or the fallback.
+    """
+
+    def __init__(self, backend=None, cache: Optional[InsightCache] = None, timeout: float = GEMINI_TIMEOUT) -> None:
+        self.backend = backend if backend is not None else make_backend()
+        self.cache = cache if cache is not None else InsightCache()
+        self.timeout = timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+
+    async def agenerate(self, payload_for_ai: Dict[str, Any]) -> Dict[str, Any]:
+        """{"insights", "model", "error", "cached"}."""
+        model_name = self.backend.model_name
+        key = InsightCache.key(payload_for_ai, model_name)
+        hit = await asyncio.to_thread(self.cache.get, key)
+        if hit is not None:
+            return {"insights": hit["insights"], "model": hit.get("model", model_name), "error": None, "cached": True}
+
+        try:
+            text = await asyncio.wait_for(self.backend.generate(build_prompt(payload_for_ai)), self.timeout)
+        except BackendUnavailable as e:
+            return {"insights": fallback_points(payload_for_ai), "model": None, "error": str(e), "cached": False}
+        except asyncio.TimeoutError:
+            return {
+                "insights": fallback_points(payload_for_ai), "model": None,
+                "error": f"Generation timed out after {self.timeout:g}s", "cached": False,
+            }
+        except Exception as ge:
+            return {"insights": fallback_points(payload_for_ai), "model": None, "error": f"Generation error: {ge}", "cached": False}
+
+        insights, error = parse_insights(text)
+        if error is None:
+            await asyncio.to_thread(self.cache.put, key, insights, model_name)  # only clean answers are reused
+        return {"insights": insights or fallback_points(payload_for_ai), "model": model_name, "error": error, "cached": False}
+
+    def _background_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="mlify-insights", daemon=True).start()
+        return self._loop
+
+    def generate(self, payload_for_ai: Dict[str, Any]) -> Dict[str, Any]:
+        fut = asyncio.run_coroutine_threadsafe(self.agenerate(payload_for_ai), self._background_loop())
+        return fut.result()
+
+
+insight_service = InsightService()
@@ -0,0 +1,137 @@
+# utils/impute.py
+from __future__ import annotations
+import math
+from typing import Any, Dict, Iterable, List, Optional
+import numpy as np
+import pandas as pd
+
+NUMERIC_STRATEGIES = ("median", "mean", "approx_median", "constant")
+CATEGORICAL_STRATEGIES = ("mode", "constant")
+
+APPROX_MEDIAN_SAMPLE = 100_000
+
+
+def _json_value(v: Any) -> Any:
+    if isinstance(v, (np.generic,)):
+        v = v.item()
+    if isinstance(v, float) and not math.isfinite(v):
+        return None
+    return v
+
+
+def _mode(s: pd.Series) -> Any:
+    """Most frequent non-null value; ties go to the smallest value, like Series.mode()."""
+    return mode_from_counts(s.value_counts(dropna=True, sort=True))
+
+
+def mode_from_counts(vc: pd.Series) -> Any:
+    """`_mode` from an already computed, descending value_counts()."""
+    if vc.empty:
+        return None
+    top = vc.index[vc.to_numpy() == vc.iloc[0]]
+    try:
+        return min(top)
+    except TypeError:
+        return top[0]
+
+
+class Imputer:
+    """
+    Fits per-column fill values once and applies them with a single fillna.
+
+    Numeric columns: 'median' (exact), 'mean', 'approx_median' (median of a
+    random row sample, for very tall frames) or 'constant'. Categorical columns:
+    'mode' or 'constant'. Columns whose statistic is undefined (all null) fall
+    back to `fill_value` for categoricals and stay null for numerics.
+    `fill_values_` is JSON-safe so it can be stored and reused at prediction time.
+    """
+
+    def __init__(
+        self,
+        numeric: str = "median",
+        categorical: str = "mode",
+        fill_value: Any = "Unknown",
+        numeric_fill_value: float = 0.0,
+        sample_size: int = APPROX_MEDIAN_SAMPLE,
+        random_state: int = 42,
+    ) -> None:
+        if numeric not in NUMERIC_STRATEGIES:
+            raise ValueError(f"numeric strategy must be one of {', '.join(NUMERIC_STRATEGIES)}")
+        if categorical not in CATEGORICAL_STRATEGIES:
+            raise ValueError(f"categorical strategy must be one of {', '.join(CATEGORICAL_STRATEGIES)}")
+        self.numeric = numeric
+        self.categorical = categorical
+        self.fill_value = fill_value
+        self.numeric_fill_value = numeric_fill_value
+        self.sample_size = sample_size
+        self.random_state = random_state
+        self.fill_values_: Dict[str, Any] = {}
+
+    def _numeric_fills(self, df: pd.DataFrame, cols: List[str]) -> pd.Series:
+        if self.numeric == "constant":
+            return pd.Series(self.numeric_fill_value, index=cols)
+        frame = df[cols]
+        if self.numeric == "mean":
+            return frame.mean()
+        if self.numeric == "approx_median" and len(frame) > self.sample_size:
+            frame = frame.sample(n=self.sample_size, random_state=self.random_state)
+        return frame.median()
+
+    def fit(
+        self,
+        df: pd.DataFrame,
+        missing: Optional[pd.Series] = None,
+        known: Optional[Dict[str, Any]] = None,
+    ) -> "Imputer":
+        """
+        Compute fill values for columns with nulls. Pass precomputed `missing`
+        counts to skip a scan, and `known` statistics for this strategy (column ->
+        median/mean/mode, e.g. from the upload profile) to skip computing them.
+        """
+        if missing is None:
+            missing = df.isnull().sum()
+        known = known or {}
+        cols = [c for c in missing.index[missing.to_numpy() > 0] if c in df.columns]
+        num_cols = [c for c in cols if pd.api.types.is_numeric_dtype(df[c]) and not pd.api.types.is_bool_dtype(df[c])]
+        cat_cols = [c for c in cols if c not in set(num_cols)]
+
+        fills: Dict[str, Any] = {}
+        todo = [c for c in num_cols if c not in known or self.numeric == "constant"]
+        computed = self._numeric_fills(df, todo).to_dict() if todo else {}
+        for col in num_cols:
+            fills[col] = _json_value(computed[col] if col in computed else known[col])
+        for col in cat_cols:
+            if self.categorical == "mode":
+                v = known[col] if col in known else _mode(df[col])
+            else:
+                v = None
+            fills[col] = _json_value(v) if v is not None else self.fill_value
+        self.fill_values_ = fills
+        return self
+
+    def transform(self, df: pd.DataFrame, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """Fill nulls in place using the fitted values; returns `df` for chaining."""
+        wanted = set(columns) if columns is not None else None
+        values = {
+            c: v for c, v in self.fill_values_.items()
+            if v is not None and c in df.columns and (wanted is None or c in wanted)
+        }
+        for col, v in values.items():
+            s = df[col]
+            if isinstance(s.dtype, pd.CategoricalDtype) and v not in s.cat.categories:
+                df[col] = s.cat.add_categories([v])
+        if values:
+            df.fillna(value=values, inplace=True)
+        return df
+
+    def fit_transform(self, df: pd.DataFrame, missing: Optional[pd.Series] = None) -> pd.DataFrame:
+        return self.fit(df, missing).transform(df)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"numeric": self.numeric, "categorical": self.categorical, "fill_values": dict(self.fill_values_)}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "Imputer":
+        imp = cls(numeric=d.get("numeric", "median"), categorical=d.get("categorical", "mode"))
+        imp.fill_values_ = dict(d.get("fill_values") or {})
+        return imp
@@ -0,0 +1,330 @@
+# utils/incremental.py
+from __future__ import annotations
+import math, os, time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+import numpy as np
+import pandas as pd
+import dotenv
+
+from sklearn.base import BaseEstimator
+
+from utils.impute import Imputer
+from utils.model_search import CLASSIFICATION, REGRESSION, SEARCH_BUDGET, SEARCH_WORKERS
+from utils.sampling import reservoir_sample
+
+dotenv.load_dotenv()
+
+STREAM_TRAIN_BYTES: int = int(os.getenv("MLIFY_STREAM_TRAIN_BYTES", str(1024 ** 3)))  # training='auto' streams above this
+STREAM_CHUNK_ROWS: int = int(os.getenv("MLIFY_STREAM_CHUNK_ROWS", "100000"))
+STREAM_HOLDOUT: float = float(os.getenv("MLIFY_STREAM_HOLDOUT", "0.2"))  # share of rows held out for validation
+STREAM_HOLDOUT_ROWS: int = int(os.getenv("MLIFY_STREAM_HOLDOUT_ROWS", "200000"))  # held-out rows kept for scoring
+STREAM_TREES_PER_CHUNK: int = int(os.getenv("MLIFY_STREAM_TREES_PER_CHUNK", "10"))
+STREAM_MAX_TREES: int = int(os.getenv("MLIFY_STREAM_MAX_TREES", "200"))
+STREAM_TREE_ROWS: int = int(os.getenv("MLIFY_STREAM_TREE_ROWS", "20000"))  # rows drawn per tree (bounds tree size)
+
+
+# -------------------- Reading --------------------
+def iter_parquet(path: str, columns: Sequence[str], chunk_rows: int = STREAM_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """`columns` of a Parquet file as DataFrames of at most `chunk_rows` rows (memory-mapped, one batch at a time)."""
+    import pyarrow.parquet as pq
+
+    pf = pq.ParquetFile(path, memory_map=True)
+    for batch in pf.iter_batches(batch_size=chunk_rows, columns=list(columns)):
+        yield batch.to_pandas()
+
+
+def frame_bytes(profile: Dict[str, Any]) -> int:
+    """Rough in-memory size of the full dataset from its profile (8 bytes for non-numeric cells)."""
+    width = 0
+    for entry in profile["columns"].values():
+        try:
+            width += max(1, np.dtype(entry["dtype"]).itemsize)
+        except TypeError:
+            width += 8
+    return int(profile["rows"]) * width
+
+
+def read_classes(path: str, target: str, imputer: Optional[Imputer] = None) -> np.ndarray:
+    """Sorted target classes (after imputation), from a pass over the target column alone."""
+    seen: set = set()
+    for chunk in iter_parquet(path, [target]):
+        if imputer is not None:
+            imputer.transform(chunk, [target])
+        seen.update(chunk[target].dropna().unique().tolist())
+    return np.unique(np.array(list(seen), dtype=object))
+
+
+# -------------------- Incremental estimators --------------------
+class IncrementalLinear(BaseEstimator):
+    """
+    SGD linear model trained chunk by chunk with partial_fit (log loss for
+    classification). Regression targets are standardised with the first
+    chunk's mean and std, so the step size doesn't depend on the target's scale.
+    """
+
+    def __init__(self, task: str = REGRESSION, alpha: float = 1e-4, random_state: int = 42) -> None:
+        self.task = task
+        self.alpha = alpha
+        self.random_state = random_state
+
+    def partial_fit(self, X, y, classes=None) -> "IncrementalLinear":
+        from sklearn.linear_model import SGDClassifier, SGDRegressor
+
+        if not hasattr(self, "model_"):
+            if self.task == REGRESSION:
+                self.model_ = SGDRegressor(alpha=self.alpha, random_state=self.random_state)
+                y0 = np.asarray(y, dtype=np.float64)
+                self.y_mean_ = float(y0.mean())
+                self.y_scale_ = float(y0.std()) or 1.0
+            else:
+                self.model_ = SGDClassifier(loss="log_loss", alpha=self.alpha, random_state=self.random_state)
+        if self.task == REGRESSION:
+            self.model_.partial_fit(X, (np.asarray(y, dtype=np.float64) - self.y_mean_) / self.y_scale_)
+        else:
+            self.model_.partial_fit(X, np.asarray(y), classes=classes)
+            self.classes_ = self.model_.classes_
+        return self
+
+    def fit(self, X, y, classes=None) -> "IncrementalLinear":
+        for attr in ("model_", "y_mean_", "y_scale_", "classes_"):
+            self.__dict__.pop(attr, None)
+        return self.partial_fit(X, y, classes)
+
+    def predict(self, X) -> np.ndarray:
+        if self.task == REGRESSION:
+            return self.model_.predict(X) * self.y_scale_ + self.y_mean_
+        return self.model_.predict(X)
+
+    def predict_proba(self, X) -> np.ndarray:
+        return self.model_.predict_proba(X)
+
+
+class ChunkForest(BaseEstimator):
+    """
+    Random forest grown chunk by chunk: each partial_fit call fits
+    `trees_per_chunk` new trees (each on at most `tree_rows` rows of that
+    chunk) and adds them to the ensemble, up to `max_trees`. Predictions
+    average every tree; class probabilities are aligned to `classes`.
+    """
+
+    def __init__(
+        self,
+        task: str = REGRESSION,
+        trees_per_chunk: int = STREAM_TREES_PER_CHUNK,
+        max_trees: int = STREAM_MAX_TREES,
+        tree_rows: int = STREAM_TREE_ROWS,
+        min_samples_leaf: int = 5,
+        n_jobs: int = 1,
+        random_state: int = 42,
+    ) -> None:
+        self.task = task
+        self.trees_per_chunk = trees_per_chunk
+        self.max_trees = max_trees
+        self.tree_rows = tree_rows
+        self.min_samples_leaf = min_samples_leaf
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+
+    @property
+    def n_trees_(self) -> int:
+        return sum(f.n_estimators for f in getattr(self, "forests_", []))
+
+    @property
+    def full(self) -> bool:
+        return self.n_trees_ >= self.max_trees
+
+    def partial_fit(self, X, y, classes=None) -> "ChunkForest":
+        from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+
+        if not hasattr(self, "forests_"):
+            self.forests_: List[Any] = []
+        if classes is not None:
+            self.classes_ = np.asarray(classes)
+        n = X.shape[0]
+        trees = min(self.trees_per_chunk, self.max_trees - self.n_trees_)
+        if trees <= 0 or n < 2 * self.min_samples_leaf:
+            return self
+        cls = RandomForestRegressor if self.task == REGRESSION else RandomForestClassifier
+        forest = cls(
+            n_estimators=trees, min_samples_leaf=self.min_samples_leaf, max_features="sqrt",  # hashed blocks are wide
+            max_samples=min(n, self.tree_rows),
+            n_jobs=self.n_jobs, random_state=self.random_state + len(self.forests_),
+        )
+        self.forests_.append(forest.fit(X, np.asarray(y)))
+        return self
+
+    def fit(self, X, y, classes=None) -> "ChunkForest":
+        self.__dict__.pop("forests_", None)
+        return self.partial_fit(X, y, classes)
+
+    def predict(self, X) -> np.ndarray:
+        if self.task == REGRESSION:
+            total = sum(f.predict(X) * f.n_estimators for f in self.forests_)
+            return total / self.n_trees_
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def predict_proba(self, X) -> np.ndarray:
+        out = np.zeros((X.shape[0], len(self.classes_)))
+        for f in self.forests_:
+            idx = np.searchsorted(self.classes_, f.classes_)
+            out[:, idx] += f.predict_proba(X) * f.n_estimators
+        return out / self.n_trees_
+
+
+# -------------------- Training --------------------
+class StreamingTrainer:
+    """
+    Out-of-core counterpart of ModelSearch, for datasets that don't fit in memory.
+
+    Each chunk is imputed, and every row is held out with probability
+    `holdout`. The remaining rows are encoded by a preprocessor fitted on the
+    first chunk and fed to every candidate: the SGD linear model and the
+    chunk-grown forest. A uniform reservoir of at most `holdout_rows` held-out
+    rows is scored at the end; it picks the winner (`best_`, a fitted Pipeline)
+    and gives its metrics. No chunk is started once `time_budget` is spent
+    (the first always is), so `complete_` says whether every row was read.
+    Memory is one chunk plus the reservoir and the models.
+    """
+
+    def __init__(
+        self,
+        task: str,
+        plan,
+        time_budget: float = SEARCH_BUDGET,
+        holdout: float = STREAM_HOLDOUT,
+        holdout_rows: int = STREAM_HOLDOUT_ROWS,
+        n_jobs: int = SEARCH_WORKERS,
+        random_state: int = 42,
+    ) -> None:
+        if task not in (REGRESSION, CLASSIFICATION):
+            raise ValueError("task must be 'regression' or 'classification'")
+        self.task = task
+        self.plan = plan  # utils.preprocess.PreprocessPlan
+        self.time_budget = float(time_budget)
+        self.holdout = holdout
+        self.holdout_rows = holdout_rows
+        self.n_jobs = max(1, n_jobs)
+        self.random_state = random_state
+        self.best_ = None
+        self.best_name_: Optional[str] = None
+        self.metrics_: Dict[str, float] = {}
+        self.leaderboard_: List[Dict[str, Any]] = []
+        self.rows_ = self.train_rows_ = self.holdout_seen_ = self.holdout_scored_ = self.chunks_ = 0
+        self.complete_ = True
+        self.elapsed_ = 0.0
+
+    def _candidates(self) -> Dict[str, Any]:
+        return {
+            "sgd_linear": IncrementalLinear(self.task, random_state=self.random_state),
+            "chunk_forest": ChunkForest(self.task, n_jobs=self.n_jobs, random_state=self.random_state),
+        }
+
+    def _metrics(self, model, X, y) -> Dict[str, float]:
+        from sklearn.metrics import accuracy_score, mean_squared_error, r2_score
+
+        pred = model.predict(X)
+        if self.task == REGRESSION:
+            return {"r2_score": float(r2_score(y, pred)), "rmse": float(mean_squared_error(y, pred) ** 0.5)}
+        return {"accuracy": float(accuracy_score(y, pred))}
+
+    def fit(
+        self,
+        chunks: Iterable[pd.DataFrame],
+        target: str,
+        imputer: Optional[Imputer] = None,
+        classes: Optional[np.ndarray] = None,
+        on_chunk: Optional[Callable[[], None]] = None,
+    ) -> "StreamingTrainer":
+        """Train on `chunks` (raw frames with the plan's columns and `target`); `on_chunk` runs after each one."""
+        from sklearn.pipeline import Pipeline
+        from utils.preprocess import build_stream_preprocessor
+
+        start = time.perf_counter()
+        deadline = start + self.time_budget
+        rng = np.random.default_rng(self.random_state)
+        columns = self.plan.columns
+        models = self._candidates()
+        fit_seconds = {name: 0.0 for name in models}
+        state: Dict[str, Any] = {"pre": None}
+
+        def _held_out() -> Iterator[pd.DataFrame]:
+            for chunk in chunks:
+                if self.chunks_ and time.perf_counter() >= deadline:
+                    self.complete_ = False
+                    return
+                if imputer is not None:
+                    imputer.transform(chunk)
+                held = rng.random(len(chunk)) < self.holdout
+                train = chunk[~held]
+                if len(train):
+                    X, y = train[columns], train[target]
+                    if state["pre"] is None:
+                        state["pre"] = build_stream_preprocessor(self.plan).fit(X, y)
+                    Xt = state["pre"].transform(X)
+                    for name, model in models.items():
+                        t0 = time.perf_counter()
+                        model.partial_fit(Xt, y, classes)
+                        fit_seconds[name] += time.perf_counter() - t0
+                self.rows_ += len(chunk)
+                self.train_rows_ += len(train)
+                self.holdout_seen_ += int(held.sum())
+                self.chunks_ += 1
+                if on_chunk is not None:
+                    on_chunk()
+                yield chunk.loc[held, columns + [target]]
+
+        holdout = reservoir_sample(_held_out(), self.holdout_rows, seed=self.random_state)
+        pre = state["pre"]
+        if pre is None:
+            raise ValueError("No training rows")
+        self.holdout_scored_ = int(len(holdout))
+
+        scores: Dict[str, Dict[str, float]] = {}
+        for name, model in models.items():
+            entry = {
+                "name": name, "family": type(model).__name__, "status": "ok", "rows": self.train_rows_,
+                "fit_seconds": round(fit_seconds[name], 4),
+            }
+            if isinstance(model, ChunkForest):
+                entry["trees"] = model.n_trees_
+                if not model.n_trees_:
+                    entry["status"] = "skipped"  # chunks too small to grow trees
+                    self.leaderboard_.append(entry)
+                    continue
+            if len(holdout):
+                try:
+                    scores[name] = self._metrics(model, pre.transform(holdout[columns]), holdout[target])
+                    entry["score"] = scores[name]["r2_score" if self.task == REGRESSION else "accuracy"]
+                except Exception as e:
+                    entry.update(status="error", error=str(e))
+            self.leaderboard_.append(entry)
+
+        usable = [e for e in self.leaderboard_ if e["status"] == "ok"]
+        if not usable:
+            raise RuntimeError("No incremental model could be trained")
+        best = max(usable, key=lambda e: e.get("score", -math.inf))
+        self.best_name_ = best["name"]
+        self.metrics_ = scores.get(self.best_name_, {})
+        step = "regressor" if self.task == REGRESSION else "classifier"
+        self.best_ = Pipeline([("preprocessor", pre), (step, models[self.best_name_])])
+        self.leaderboard_.sort(key=lambda e: e.get("score", -math.inf), reverse=True)
+        self.elapsed_ = time.perf_counter() - start
+        return self
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "best": self.best_name_,
+            "metric": "r2" if self.task == REGRESSION else "accuracy",
+            "time_budget": self.time_budget,
+            "elapsed_seconds": round(self.elapsed_, 3),
+            "rounds": self.chunks_,
+            "leaderboard": self.leaderboard_,
+            "streaming": {
+                "chunks": self.chunks_,
+                "rows_read": self.rows_,
+                "rows_trained": self.train_rows_,
+                "rows_held_out": self.holdout_seen_,
+                "rows_scored": self.holdout_scored_,
+                "complete": self.complete_,
+            },
+        }
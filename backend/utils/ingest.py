@@ -0,0 +1,87 @@
+# utils/ingest.py
+from __future__ import annotations
+import hashlib, os, tempfile
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+import pandas as pd
+import dotenv
+
+dotenv.load_dotenv()
+
+UPLOAD_CHUNK_BYTES: int = int(os.getenv("MLIFY_UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+PARSE_CHUNK_ROWS: int = int(os.getenv("MLIFY_PARSE_CHUNK_ROWS", "50000"))
+PREVIEW_ROWS = 5
+
+
+@dataclass
+class SpooledUpload:
+    path: str
+    size: int
+    digest: str  # sha256 of the raw bytes, same id as utils.dataset_cache.content_hash
+
+    def discard(self) -> None:
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+@dataclass
+class CsvSummary:
+    columns: List[str]
+    rows: int = 0
+    missing_counts: Dict[str, int] = field(default_factory=dict)
+    preview: Optional[pd.DataFrame] = None
+
+
+async def spool_upload(file, spool_dir: Optional[str] = None, chunk_bytes: int = UPLOAD_CHUNK_BYTES) -> SpooledUpload:
+    """
+    Copy an UploadFile to a temp file chunk by chunk, hashing as we go.
+    Peak memory is one chunk regardless of upload size.
+    """
+    if spool_dir:
+        os.makedirs(spool_dir, exist_ok=True)
+    h = hashlib.sha256()
+    size = 0
+    fd, path = tempfile.mkstemp(prefix="upload-", suffix=".part", dir=spool_dir)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await file.read(chunk_bytes)
+                if not chunk:
+                    break
+                h.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+    except Exception:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        raise
+    return SpooledUpload(path=path, size=size, digest=h.hexdigest())
+
+
+def read_preview(path: str, rows: int = PREVIEW_ROWS) -> pd.DataFrame:
+    """First rows of a CSV, parsed exactly as summarize_csv previews them."""
+    return pd.read_csv(path, nrows=rows, encoding="utf-8")
+
+
+def summarize_csv(path: str, chunk_rows: int = PARSE_CHUNK_ROWS) -> CsvSummary:
+    """Single chunked pass over a CSV: columns, row count, per-column nulls and a preview."""
+    summary: Optional[CsvSummary] = None
+    missing: Optional[pd.Series] = None
+    with pd.read_csv(path, chunksize=chunk_rows, encoding="utf-8") as reader:
+        for chunk in reader:
+            if summary is None:
+                summary = CsvSummary(columns=chunk.columns.tolist(), preview=chunk.head(PREVIEW_ROWS))
+                missing = chunk.isnull().sum()
+            else:
+                missing = missing.add(chunk.isnull().sum(), fill_value=0)
+            summary.rows += int(chunk.shape[0])
+    if summary is None:  # header-only file: read_csv yields no chunks
+        head = pd.read_csv(path, nrows=0, encoding="utf-8")
+        summary = CsvSummary(columns=head.columns.tolist(), preview=head)
+        missing = pd.Series(0, index=head.columns)
+    summary.missing_counts = {str(k): int(v) for k, v in missing.items()}
+    return summary
@@ -0,0 +1,210 @@
+# utils/jobs.py
+from __future__ import annotations
+import asyncio, multiprocessing, os, threading, time, uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+import dotenv
+
+dotenv.load_dotenv()
+
+JOB_WORKERS: int = int(os.getenv("MLIFY_JOB_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+JOB_HISTORY: int = int(os.getenv("MLIFY_JOB_HISTORY", "200"))
+
+QUEUED, RUNNING, DONE, ERROR, CANCELLED = "queued", "running", "done", "error", "cancelled"
+TERMINAL = frozenset({DONE, ERROR, CANCELLED})
+
+# fn(payload, progress=..., should_cancel=...) -> result dict; must be a picklable module-level function
+JobFn = Callable[..., Dict[str, Any]]
+
+
+@dataclass
+class Job:
+    id: str
+    payload: Dict[str, Any]
+    status: str = QUEUED
+    events: List[Dict[str, Any]] = field(default_factory=list)
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    error_type: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    future: Optional[Future] = field(default=None, repr=False)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-safe view for the status endpoints (no result body)."""
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "mode": self.payload.get("mode"),
+            "target": self.payload.get("target"),
+            "steps": list(self.events),
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+def _run_job(fn: JobFn, job_id: str, payload: Dict[str, Any], events, cancel_flags) -> Dict[str, Any]:
+    """Worker-side entry point: forwards progress to the parent through a managed queue."""
+    events.put((job_id, "status", RUNNING))
+
+    def progress(step: Dict[str, Any]) -> None:
+        events.put((job_id, "step", step))
+
+    def should_cancel() -> bool:
+        return bool(cancel_flags.get(job_id))
+
+    return fn(payload, progress=progress, should_cancel=should_cancel)
+
+
+class JobManager:
+    """
+    Runs pipeline jobs on a process pool and tracks their status and progress.
+
+    Workers report each step over a Manager queue; a pump thread in the parent
+    folds them into `Job.events`. Cancellation removes queued jobs from the pool
+    and asks running ones to stop at their next step. The pool is created on
+    first submit (or `prestart()`) so importing the app never forks.
+    """
+
+    def __init__(
+        self,
+        fn: JobFn,
+        max_workers: int = JOB_WORKERS,
+        history: int = JOB_HISTORY,
+        cancelled_exc: Tuple[Type[BaseException], ...] | Type[BaseException] = (),
+        on_finish: Optional[Callable[[Job], None]] = None,
+        initializer: Optional[Callable[[], None]] = None,
+        id_prefix: str = "",
+    ) -> None:
+        self.fn = fn
+        self.id_prefix = id_prefix  # names the owning server worker when several run behind the router
+        self.initializer = initializer  # runs once in each worker process as it starts (module-level, picklable)
+        self.on_finish = on_finish  # called in the parent once a job reaches a terminal state
+        self.max_workers = max_workers
+        self.history = history
+        self.cancelled_exc = cancelled_exc
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._manager = None
+        self._events = None
+        self._cancel = None
+        self._pump: Optional[threading.Thread] = None
+
+    def _ensure_started(self) -> None:
+        if self._executor is not None:
+            return
+        ctx = multiprocessing.get_context("spawn")  # no fork of a threaded server process
+        self._manager = ctx.Manager()
+        self._events = self._manager.Queue()
+        self._cancel = self._manager.dict()
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=ctx, initializer=self.initializer)
+        self._pump = threading.Thread(target=self._drain, name="mlify-job-events", daemon=True)
+        self._pump.start()
+
+    def _drain(self) -> None:
+        while True:
+            try:
+                item = self._events.get()
+            except (EOFError, OSError):
+                return  # manager went away (shutdown)
+            if item is None:
+                return
+            job_id, kind, data = item
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None or job.status in TERMINAL:
+                    continue
+                if kind == "status" and data == RUNNING:
+                    job.status = RUNNING
+                    job.started_at = time.time()
+                elif kind == "step":
+                    job.events.append(data)
+
+    def _on_done(self, job: Job, fut: Future) -> None:
+        with self._lock:
+            job.finished_at = time.time()
+            if fut.cancelled():
+                job.status = CANCELLED
+            elif fut.exception() is not None:
+                exc = fut.exception()
+                job.status = CANCELLED if isinstance(exc, self.cancelled_exc) else ERROR
+                job.error = str(exc) or type(exc).__name__
+                job.error_type = type(exc).__name__
+            else:
+                job.result = fut.result()
+                job.status = DONE
+                job.events = list(job.result.get("steps") or job.events)  # authoritative, no lag
+            if self._cancel is not None:
+                self._cancel.pop(job.id, None)
+        if self.on_finish is not None:
+            try:
+                self.on_finish(job)
+            except Exception:
+                pass  # observers must never break job bookkeeping
+
+    def _trim(self) -> None:
+        while len(self._jobs) > self.history:
+            oldest_id, oldest = next(iter(self._jobs.items()))
+            if oldest.status not in TERMINAL:
+                break
+            self._jobs.pop(oldest_id)
+
+    # ---------- public API ----------
+    def prestart(self) -> None:
+        """Spawn every worker now (each runs `initializer`) instead of on the first jobs; blocks until up."""
+        with self._lock:
+            self._ensure_started()
+            futs = [self._executor.submit(time.sleep, 0) for _ in range(self.max_workers)]
+        for fut in futs:
+            fut.result()
+
+    def submit(self, payload: Dict[str, Any], fn: Optional[JobFn] = None) -> Job:
+        """Queue `payload` for `fn` (default: the manager's job function)."""
+        with self._lock:
+            self._ensure_started()
+            job = Job(id=f"{self.id_prefix}{uuid.uuid4().hex}", payload=payload)
+            self._jobs[job.id] = job
+            self._trim()
+            job.future = self._executor.submit(_run_job, fn or self.fn, job.id, payload, self._events, self._cancel)
+        job.future.add_done_callback(lambda fut: self._on_done(job, fut))
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued job outright, or flag a running one to stop at its next step."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in TERMINAL:
+                return False
+            if job.future is not None and job.future.cancel():
+                return True
+            self._cancel[job_id] = True
+            return True
+
+    async def wait(self, job_id: str) -> Dict[str, Any]:
+        """Await a job's result without blocking the event loop; re-raises the job's error."""
+        job = self.get(job_id)
+        if job is None or job.future is None:
+            raise KeyError(job_id)
+        return await asyncio.wrap_future(job.future)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is None:
+                return
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            try:
+                self._events.put(None)
+                self._manager.shutdown()
+            except Exception:
+                pass
+            self._executor = self._manager = self._events = self._cancel = None
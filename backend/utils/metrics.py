@@ -0,0 +1,198 @@
+# utils/metrics.py
+from __future__ import annotations
+import cProfile, io, os, pstats, sys, threading, time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import dotenv
+
+try:
+    import resource  # POSIX only; peak RSS is reported as None elsewhere
+except ImportError:  # pragma: no cover - Windows
+    resource = None
+
+dotenv.load_dotenv()
+
+PROFILE_HEADER = "X-MLify-Profile"
+PROFILING_ENABLED: bool = os.getenv("MLIFY_PROFILING", "false").lower() == "true"  # honour the header at all
+PROFILE_TOP: int = int(os.getenv("MLIFY_PROFILE_TOP", "40"))  # rows of the cumulative-time table
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+BYTES_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8, 1e9, 1e10)
+
+
+# -------------------- Resource usage --------------------
+def peak_rss_mb() -> Optional[float]:
+    """High-water mark of this process's resident set, in MiB."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)  # bytes on macOS, KiB elsewhere
+
+
+class StepClock:
+    """Wall time, process CPU time (all threads) and peak-RSS growth between consecutive `lap()` calls."""
+
+    def __init__(self) -> None:
+        self._last = self._now()
+
+    @staticmethod
+    def _now() -> Tuple[float, float, Optional[float]]:
+        return time.perf_counter(), time.process_time(), peak_rss_mb()
+
+    def lap(self) -> Dict[str, Optional[float]]:
+        now, last = self._now(), self._last
+        self._last = now
+        return {
+            "duration_ms": round((now[0] - last[0]) * 1000.0, 3),
+            "cpu_ms": round((now[1] - last[1]) * 1000.0, 3),
+            "peak_rss_delta_mb": round(now[2] - last[2], 3) if now[2] is not None and last[2] is not None else None,
+        }
+
+
+# -------------------- Prometheus-style registry --------------------
+def _escape(v: Any) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(v: float) -> str:
+    return repr(float(v)) if v != int(v) or abs(v) >= 1e15 else str(int(v))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, v in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, key)} {_num(v)}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, help: str) -> None:
+        self.name, self.help = name, help
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = float(value)
+
+    def collect(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {_num(self.value)}"]
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple, List[float]] = {}  # label values -> bucket counts + [sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            s = self._series.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    s[i] += 1
+            s[-2] += value
+            s[-1] += 1
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, s in sorted(self._series.items()):
+                for bound, n in zip(self.buckets, s):
+                    le = 'le="%s"' % _num(bound)
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {_num(n)}")
+                inf = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, inf)} {_num(s[-1])}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_num(s[-2])}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {_num(s[-1])}")
+        return lines
+
+
+class MetricsRegistry:
+    """In-process metrics in the Prometheus text format (one registry per server process)."""
+
+    def __init__(self) -> None:
+        self._metrics: List[Any] = []
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        m = Counter(name, help, labelnames)
+        self._metrics.append(m)
+        return m
+
+    def gauge(self, name: str, help: str) -> Gauge:
+        m = Gauge(name, help)
+        self._metrics.append(m)
+        return m
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        m = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(m)
+        return m
+
+    def render(self) -> str:
+        return "\n".join(line for m in self._metrics for line in m.collect()) + "\n"
+
+
+metrics = MetricsRegistry()
+HTTP_SECONDS = metrics.histogram(
+    "mlify_http_request_duration_seconds", "Request latency by route template.", ("method", "route", "status"),
+)
+STAGE_SECONDS = metrics.histogram(
+    "mlify_stage_duration_seconds", "Pipeline stage time (load, impute, correlate, render, upload, ai, train, ...).",
+    ("mode", "stage"),
+)
+UPLOAD_BYTES = metrics.histogram("mlify_upload_bytes", "Size of CSVs received by /upload.", buckets=BYTES_BUCKETS)
+INSIGHT_SECONDS = metrics.histogram("mlify_insight_duration_seconds", "Insight generation latency.", ("cached",))
+TRAIN_SECONDS = metrics.histogram(
+    "mlify_training_duration_seconds", "Model search wall time by winning estimator.", ("model_type",),
+)
+IMPORT_SECONDS = metrics.gauge("mlify_import_seconds", "Time this server process spent importing the app.")
+WARMUP_SECONDS = metrics.gauge("mlify_warmup_seconds", "Time the startup warm-up took (0 until it finishes).")
+JOBS = metrics.counter("mlify_jobs_total", "Finished pipeline jobs by outcome.", ("mode", "status"))
+
+
+def observe_result(mode: str, result: Dict[str, Any]) -> None:
+    """Fold one pipeline result's `timings` into the stage, insight and training histograms."""
+    timings = result.get("timings") or {}
+    for stage, secs in timings.items():
+        STAGE_SECONDS.observe(secs, mode=mode, stage=stage)
+    if "ai" in timings:
+        INSIGHT_SECONDS.observe(timings["ai"], cached=str(bool(result.get("ai_cached"))).lower())
+    if "train" in timings:
+        TRAIN_SECONDS.observe(timings["train"], model_type=(result.get("model_info") or {}).get("model_type", ""))
+
+
+# -------------------- Profiler hook --------------------
+def profile_call(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Run `fn` under cProfile; returns (result, report) where the report holds the
+    top PROFILE_TOP functions by cumulative time. Only the calling thread is
+    profiled (chart and model-search worker threads show up as waits).
+    """
+    prof = cProfile.Profile()
+    t0 = time.perf_counter()
+    result = prof.runcall(fn, *args, **kwargs)
+    elapsed = time.perf_counter() - t0
+    buf = io.StringIO()
+    pstats.Stats(prof, stream=buf).sort_stats("cumulative").print_stats(PROFILE_TOP)
+    return result, {"wall_seconds": round(elapsed, 4), "sort": "cumulative", "stats": buf.getvalue()}
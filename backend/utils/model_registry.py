@@ -0,0 +1,213 @@
+# utils/model_registry.py
+from __future__ import annotations
+import json, os, shutil, threading, time, uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+import numpy as np
+import pandas as pd
+import dotenv
+
+from utils.artifacts import ARTIFACT_EXTENSIONS, load_artifact
+from utils.dataset_cache import CACHE_DIR
+from utils.impute import Imputer
+
+dotenv.load_dotenv()
+
+MODEL_DIR: str = os.getenv("MLIFY_MODEL_DIR", os.path.join(CACHE_DIR, "models"))
+MODEL_CACHE_SIZE: int = int(os.getenv("MLIFY_MODEL_CACHE_SIZE", "8"))
+PREDICT_MAX_ROWS: int = int(os.getenv("MLIFY_PREDICT_MAX_ROWS", "100000"))
+
+METRIC_KEYS = ("r2_score", "rmse", "accuracy")
+_BOOL_WORDS = {"true": True, "1": True, "yes": True, "false": False, "0": False, "no": False}
+
+
+class ModelNotFound(KeyError):
+    """No registry entry for the requested model id."""
+
+
+class PredictionError(ValueError):
+    """Input rows can't be scored by this model (missing columns, too many rows, ...)."""
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000.0, 3)
+
+
+class ModelRegistry:
+    """
+    File-backed registry: `<model_dir>/<id>.json` holds the metadata (task,
+    feature columns and kinds, imputation fills, metrics, storage URL, artifact
+    manifest) and `<id>.<ext>` a local copy of the artifact in its stored format.
+    Trainer workers and the API process share it through the filesystem, so it
+    needs no lock server.
+    """
+
+    def __init__(self, model_dir: str = MODEL_DIR) -> None:
+        self.model_dir = model_dir
+        os.makedirs(model_dir, exist_ok=True)
+
+    def _paths(self, model_id: str, fmt: str = "joblib") -> Tuple[str, str]:
+        if not model_id or not all(c.isalnum() or c in "-_" for c in model_id):
+            raise ModelNotFound(model_id)  # also keeps ids from escaping model_dir
+        base = os.path.join(self.model_dir, model_id)
+        return f"{base}.json", f"{base}{ARTIFACT_EXTENSIONS.get(fmt, '.joblib')}"
+
+    @staticmethod
+    def artifact_format(entry: Dict[str, Any]) -> str:
+        return (entry.get("artifact") or {}).get("format", "joblib")  # entries from before manifests were joblib
+
+    def register(self, artifact_path: str, meta: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Move an exported artifact (see utils.artifacts.export_artifact) and its
+        metadata under a fresh id; `meta["artifact"]` is the artifact manifest.
+        Returns the full entry.
+        """
+        model_id = uuid.uuid4().hex
+        meta_path, art_path = self._paths(model_id, self.artifact_format(meta))
+        entry = {"model_id": model_id, "created_at": time.time(), "size_bytes": os.path.getsize(artifact_path), **meta}
+        tmp = f"{art_path}.{os.getpid()}.tmp"
+        shutil.copyfile(artifact_path, tmp)
+        os.replace(tmp, art_path)
+        tmp = f"{meta_path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(entry, fh, default=str)
+        os.replace(tmp, meta_path)
+        return entry
+
+    def get(self, model_id: str) -> Dict[str, Any]:
+        meta_path, _ = self._paths(model_id)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            raise ModelNotFound(model_id) from None
+
+    def list(self) -> List[Dict[str, Any]]:
+        out = []
+        for name in os.listdir(self.model_dir):
+            if name.endswith(".json"):
+                try:
+                    out.append(self.get(name[:-5]))
+                except (ModelNotFound, ValueError):
+                    continue
+        return sorted(out, key=lambda e: e.get("created_at", 0), reverse=True)
+
+    def artifact_path(self, model_id: str) -> str:
+        """Local artifact file, re-fetched from storage first if the local copy is gone."""
+        entry = self.get(model_id)
+        _, art_path = self._paths(model_id, self.artifact_format(entry))
+        if os.path.exists(art_path):
+            return art_path
+        from utils.supabase import download_bytes
+
+        data = download_bytes(entry["download_url"])
+        tmp = f"{art_path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp, art_path)
+        return art_path
+
+    def load(self, model_id: str):
+        """Deserialise in the stored format (memory-mapped arrays for joblib_mmap)."""
+        entry = self.get(model_id)
+        return load_artifact(self.artifact_path(model_id), self.artifact_format(entry))
+
+
+class LoadedModel:
+    """A deserialised pipeline plus what's needed to prepare raw rows for it."""
+
+    def __init__(self, entry: Dict[str, Any], model: Any) -> None:
+        self.entry = entry
+        self.model = model
+        self.features: Dict[str, str] = entry.get("features") or {}  # col -> "numeric" | "bool" | "categorical"
+        self.imputer = Imputer.from_dict(entry["imputation"]) if entry.get("imputation") else None
+
+    def prepare(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """Column order, dtypes and training-time fills, all column-wise over the batch."""
+        missing = [c for c in self.features if c not in frame.columns]
+        if missing:
+            raise PredictionError(f"Missing feature columns: {', '.join(missing)}")
+        X = frame[list(self.features)].copy()
+        for col, kind in self.features.items():
+            s = X[col]
+            if kind == "numeric":
+                X[col] = pd.to_numeric(s, errors="coerce")
+            elif kind == "bool":
+                X[col] = s.astype(str).str.strip().str.lower().map(_BOOL_WORDS).where(s.notna(), np.nan)
+            else:
+                X[col] = s.astype(str).where(s.notna(), np.nan)  # CSV-trained levels are strings
+        if self.imputer is not None:
+            self.imputer.transform(X)
+        return X
+
+    def predict(self, frame: pd.DataFrame, proba: bool = False) -> Dict[str, Any]:
+        X = self.prepare(frame)
+        out: Dict[str, Any] = {"predictions": self.model.predict(X).tolist()}
+        if proba and getattr(self.model, "classes_", None) is not None:
+            out["classes"] = [c.item() if hasattr(c, "item") else c for c in self.model.classes_]
+            out["probabilities"] = np.round(self.model.predict_proba(X), 6).tolist()
+        return out
+
+
+class ModelCache:
+    """Bounded LRU of deserialised models; one loader per id at a time."""
+
+    def __init__(self, registry: ModelRegistry, max_models: int = MODEL_CACHE_SIZE) -> None:
+        self.registry = registry
+        self.max_models = max_models
+        self._models: "OrderedDict[str, LoadedModel]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading: Dict[str, threading.Lock] = {}
+
+    def get(self, model_id: str) -> Tuple[LoadedModel, bool]:
+        """(model, cache_hit)."""
+        with self._lock:
+            hit = self._models.get(model_id)
+            if hit is not None:
+                self._models.move_to_end(model_id)
+                return hit, True
+            load_lock = self._loading.setdefault(model_id, threading.Lock())
+        with load_lock:
+            with self._lock:
+                hit = self._models.get(model_id)
+                if hit is not None:
+                    return hit, True
+            try:
+                entry = self.registry.get(model_id)
+                loaded = LoadedModel(entry, self.registry.load(model_id))
+                with self._lock:
+                    self._models[model_id] = loaded
+                    while len(self._models) > self.max_models:
+                        self._models.popitem(last=False)
+            finally:
+                with self._lock:
+                    self._loading.pop(model_id, None)  # also on failure, so unknown ids don't pile up
+            return loaded, False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"models": list(self._models), "max_models": self.max_models}
+
+
+def predict(cache: ModelCache, model_id: str, frame: pd.DataFrame, proba: bool = False) -> Dict[str, Any]:
+    """Score a batch in one vectorised call and report where the time went."""
+    if frame.empty:
+        raise PredictionError("No rows to score")
+    if len(frame) > PREDICT_MAX_ROWS:
+        raise PredictionError(f"Batch too large: {len(frame)} rows (max {PREDICT_MAX_ROWS})")
+    t0 = time.perf_counter()
+    model, hit = cache.get(model_id)
+    t1 = time.perf_counter()
+    out = model.predict(frame, proba=proba)
+    t2 = time.perf_counter()
+    return {
+        "model_id": model_id,
+        "rows": int(len(frame)),
+        **out,
+        "latency_ms": {"load": _ms(t1 - t0), "predict": _ms(t2 - t1), "total": _ms(t2 - t0)},
+        "cache": "hit" if hit else "miss",
+    }
+
+
+model_registry = ModelRegistry()
+model_cache = ModelCache(model_registry)
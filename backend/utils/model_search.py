@@ -0,0 +1,281 @@
+# utils/model_search.py
+from __future__ import annotations
+import math, os, threading, time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+import dotenv
+
+dotenv.load_dotenv()
+
+SEARCH_BUDGET: float = float(os.getenv("MLIFY_SEARCH_BUDGET", "60"))  # seconds
+SEARCH_WORKERS: int = int(os.getenv("MLIFY_SEARCH_WORKERS", str(os.cpu_count() or 1)))
+SEARCH_MIN_ROWS: int = int(os.getenv("MLIFY_SEARCH_MIN_ROWS", "500"))
+SEARCH_ETA = 3  # keep the best 1/eta candidates and give them eta x the rows each round
+SEARCH_STEPS = {"hist_gb": ("max_iter", 25), "random_forest": ("n_estimators", 10)}  # warm-start increment per family
+SEARCH_STOP_GRACE: float = float(os.getenv("MLIFY_SEARCH_STOP_GRACE", "2"))  # seconds a stopped fit gets to reach a check
+MAX_TIME_BUDGET = 3600.0
+
+REGRESSION, CLASSIFICATION = "regression", "classification"
+
+
+@dataclass
+class Candidate:
+    name: str
+    family: str  # linear | hist_gb | random_forest
+    params: Dict[str, Any] = field(default_factory=dict)
+
+
+def default_candidates(task: str) -> List[Candidate]:
+    """Linear baseline, two histogram GB settings and two RF settings."""
+    linear = {"alpha": 1.0} if task == REGRESSION else {"C": 1.0, "max_iter": 1000}
+    return [
+        Candidate("linear", "linear", linear),
+        Candidate("hist_gb", "hist_gb", {"learning_rate": 0.1, "max_leaf_nodes": 31, "max_iter": 300}),
+        Candidate("hist_gb_wide", "hist_gb", {"learning_rate": 0.05, "max_leaf_nodes": 63, "max_iter": 600, "l2_regularization": 1.0}),
+        Candidate("random_forest", "random_forest", {"n_estimators": 100}),
+        Candidate("random_forest_regularized", "random_forest", {"n_estimators": 200, "min_samples_leaf": 3, "max_features": 0.5}),
+    ]
+
+
+def _estimator(task: str, cand: Candidate, n_jobs: int, random_state: int, categorical_features=None):
+    from sklearn.ensemble import (
+        HistGradientBoostingClassifier, HistGradientBoostingRegressor, RandomForestClassifier, RandomForestRegressor,
+    )
+    from sklearn.linear_model import LogisticRegression, Ridge
+
+    reg = task == REGRESSION
+    if cand.family == "linear":
+        return Ridge(**cand.params) if reg else LogisticRegression(**cand.params)
+    if cand.family == "hist_gb":
+        cls = HistGradientBoostingRegressor if reg else HistGradientBoostingClassifier
+        # Early stopping on an internal validation slice; stops long before max_iter on easy data
+        return cls(
+            early_stopping=True, validation_fraction=0.1, n_iter_no_change=10, random_state=random_state,
+            categorical_features=categorical_features, **cand.params,
+        )
+    if cand.family == "random_forest":
+        cls = RandomForestRegressor if reg else RandomForestClassifier
+        return cls(n_jobs=n_jobs, random_state=random_state, **cand.params)
+    raise ValueError(f"Unknown model family '{cand.family}'")
+
+
+def build_pipeline(task: str, cand: Candidate, plan, n_jobs: int = 1, random_state: int = 42):
+    """Preprocessor shaped by the plan for this family (sparse or compact dense) + the estimator."""
+    from sklearn.pipeline import Pipeline
+    from utils.preprocess import build_preprocessor, native_categorical_features
+
+    step = "regressor" if task == REGRESSION else "classifier"
+    return Pipeline([
+        ("preprocessor", build_preprocessor(plan, cand.family, task)),
+        (step, _estimator(task, cand, n_jobs, random_state, native_categorical_features(plan, cand.family))),
+    ])
+
+
+def score(task: str, model, X: pd.DataFrame, y: pd.Series) -> float:
+    """R^2 for regression, accuracy for classification (higher is better for both)."""
+    from sklearn.metrics import accuracy_score, r2_score
+
+    pred = model.predict(X)
+    return float(r2_score(y, pred) if task == REGRESSION else accuracy_score(y, pred))
+
+
+class FitStopped(Exception):
+    """A search fit was stopped at a warm-start increment because the budget ran out."""
+
+
+def fit_until(model, X, y, family: str, stop: threading.Event):
+    """
+    Fit a pipeline from build_pipeline, checking `stop` after the preprocessor
+    fit and, for the SEARCH_STEPS families, between warm-start increments of
+    boosting iterations / trees. Raises FitStopped when stopped. A linear
+    solve, the preprocessor fit and a single increment are not interruptible.
+    """
+    est = model[-1]
+    Xt = model[:-1].fit_transform(X, y)  # the preprocessor is fitted once, not per increment
+    if stop.is_set():
+        raise FitStopped()
+    if family not in SEARCH_STEPS:
+        est.fit(Xt, y)
+        return model
+    param, step = SEARCH_STEPS[family]
+    total = est.get_params()[param]
+    est.set_params(warm_start=True)
+    size = 0
+    while size < total:
+        if stop.is_set():
+            raise FitStopped()
+        size = min(total, size + step)
+        est.set_params(**{param: size})
+        est.fit(Xt, y)
+        if family == "hist_gb" and est.n_iter_ < size:
+            break  # early stopping ended it
+    est.set_params(**{param: total}, warm_start=False)
+    return model
+
+
+class ModelSearch:
+    """
+    Successive-halving search over model families under a wall-clock budget.
+
+    Round 0 fits every candidate on a small row subset in parallel and scores it
+    on a fixed validation split. Each round keeps the best 1/eta candidates and
+    multiplies their rows by eta, until they see the full training split. Fits
+    still running when the budget runs out are told to stop at their next check
+    (see fit_until) and dropped from the round. A round is skipped if the last
+    round's time x eta would not fit in what is left. The winner is refit on
+    all rows when its estimated cost fits; `best_` is that pipeline.
+
+    Worst case, fit() returns SEARCH_STOP_GRACE seconds after the budget, plus
+    the refit's misestimate; round 0 alone always waits for its first finished
+    candidate. A fit that is still inside an uninterruptible step when the
+    grace period ends is abandoned: it keeps one search thread busy until that
+    step finishes, and its result is discarded.
+    """
+
+    def __init__(
+        self,
+        task: str,
+        plan,
+        time_budget: float = SEARCH_BUDGET,
+        candidates: Optional[List[Candidate]] = None,
+        eta: int = SEARCH_ETA,
+        min_rows: int = SEARCH_MIN_ROWS,
+        max_workers: int = SEARCH_WORKERS,
+        random_state: int = 42,
+    ) -> None:
+        if task not in (REGRESSION, CLASSIFICATION):
+            raise ValueError("task must be 'regression' or 'classification'")
+        self.task = task
+        self.plan = plan  # utils.preprocess.PreprocessPlan
+        self.time_budget = float(time_budget)
+        self.candidates = candidates or default_candidates(task)
+        self.eta = max(2, int(eta))
+        self.min_rows = min_rows
+        self.max_workers = max(1, max_workers)
+        self.random_state = random_state
+        self.best_ = None
+        self.best_candidate_: Optional[Candidate] = None
+        self.leaderboard_: List[Dict[str, Any]] = []
+        self.rounds_ = 0
+        self.elapsed_ = 0.0
+
+    def _fit_one(self, cand: Candidate, X, y, X_val, y_val, n_jobs: int, stop: threading.Event) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        model = build_pipeline(self.task, cand, self.plan, n_jobs, self.random_state)
+        fit_until(model, X, y, cand.family, stop)
+        fit_seconds = time.perf_counter() - t0
+        n_iter = getattr(model[-1], "n_iter_", None)  # boosting rounds / solver iterations actually used
+        return {
+            "model": model,
+            "score": score(self.task, model, X_val, y_val),
+            "fit_seconds": fit_seconds,
+            "n_iter": int(np.max(n_iter)) if n_iter is not None else None,
+        }
+
+    def _split(self, X: pd.DataFrame, y: pd.Series):
+        from sklearn.model_selection import train_test_split
+
+        return train_test_split(X, y, test_size=0.2, random_state=self.random_state)
+
+    def fit(self, X: pd.DataFrame, y: pd.Series) -> "ModelSearch":
+        start = time.perf_counter()
+        deadline = start + self.time_budget
+        X_tr, X_val, y_tr, y_val = self._split(X, y)
+        n = len(X_tr)
+        order = np.random.default_rng(self.random_state).permutation(n)
+
+        # Enough rounds to whittle the field down to one, fewer if round 0 would drop below min_rows
+        n_rounds = 1 + math.ceil(math.log(max(1, len(self.candidates))) / math.log(self.eta))
+        while n_rounds > 1 and n / self.eta ** (n_rounds - 1) < self.min_rows:
+            n_rounds -= 1
+        rows = math.ceil(n / self.eta ** (n_rounds - 1))
+
+        alive = list(self.candidates)
+        finalists: List[Candidate] = []  # scored in the furthest round reached
+        results: Dict[str, Dict[str, Any]] = {}
+        board: Dict[str, Dict[str, Any]] = {c.name: {"name": c.name, "family": c.family, "params": c.params} for c in alive}
+        last_round_seconds = 0.0
+        pool = ThreadPoolExecutor(max_workers=min(self.max_workers, len(alive)), thread_name_prefix="mlify-search")
+        stop = threading.Event()
+        try:
+            rnd = 0
+            while alive:
+                remaining = deadline - time.perf_counter()
+                if rnd > 0 and (remaining <= 0 or last_round_seconds * self.eta > remaining):
+                    break
+                idx = order[:rows]
+                Xs, ys = X_tr.iloc[idx], y_tr.iloc[idx]
+                workers = min(self.max_workers, len(alive))
+                n_jobs = max(1, self.max_workers // workers)  # spread spare cores over the forests
+                t0 = time.perf_counter()
+                stop = threading.Event()
+                futs: Dict[Future, Candidate] = {
+                    pool.submit(self._fit_one, c, Xs, ys, X_val, y_val, n_jobs, stop): c for c in alive
+                }
+                done, pending = wait(futs, timeout=max(0.0, remaining))
+                if not done and rnd == 0:
+                    done, pending = wait(futs, return_when=FIRST_COMPLETED)  # always return some model
+                last_round_seconds = time.perf_counter() - t0
+                if pending:
+                    # Stop the stragglers at their next check so they don't compete with the refit
+                    stop.set()
+                    wait(pending, timeout=SEARCH_STOP_GRACE)
+                scored: List[Candidate] = []
+                for fut, cand in futs.items():
+                    entry = board[cand.name]
+                    if fut in pending:
+                        entry["status"] = "timeout"
+                        continue
+                    if fut.exception() is not None:
+                        entry.update(status="error", error=str(fut.exception()))
+                        continue
+                    res = fut.result()
+                    results[cand.name] = {**res, "rows": len(idx)}
+                    entry.update(status="ok", score=res["score"], rows=len(idx), round=rnd,
+                                 fit_seconds=round(res["fit_seconds"], 4), n_iter=res["n_iter"])
+                    scored.append(cand)
+                rnd += 1
+                if scored:
+                    finalists = scored
+                if rows >= n or len(scored) <= 1:
+                    break
+                scored.sort(key=lambda c: results[c.name]["score"], reverse=True)
+                alive = scored[: max(1, math.ceil(len(scored) / self.eta))]
+                rows = min(n, rows * self.eta)
+            self.rounds_ = rnd
+
+            if not finalists:
+                raise RuntimeError("No candidate model finished within the time budget")
+            best = max((c.name for c in finalists), key=lambda k: results[k]["score"])
+            cand = next(c for c in self.candidates if c.name == best)
+            model = results[best]["model"]
+            # Refit the winner on the whole training input if it has not seen it and there is time
+            fit_cost = results[best]["fit_seconds"] * len(X) / max(1, results[best]["rows"])
+            if results[best]["rows"] < len(X) and time.perf_counter() + fit_cost <= deadline:
+                model = build_pipeline(self.task, cand, self.plan, self.max_workers, self.random_state)
+                model.fit(X, y)
+            self.best_, self.best_candidate_ = model, cand
+        finally:
+            stop.set()
+            pool.shutdown(wait=False, cancel_futures=True)  # the stragglers were already given their grace period
+
+        self.leaderboard_ = sorted(
+            board.values(),
+            key=lambda e: (e.get("round", -1), e.get("score", -math.inf)),
+            reverse=True,
+        )
+        self.elapsed_ = time.perf_counter() - start
+        return self
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "best": self.best_candidate_.name if self.best_candidate_ else None,
+            "metric": "r2" if self.task == REGRESSION else "accuracy",
+            "time_budget": self.time_budget,
+            "elapsed_seconds": round(self.elapsed_, 3),
+            "rounds": self.rounds_,
+            "leaderboard": self.leaderboard_,
+        }
@@ -0,0 +1,242 @@
+# utils/preprocess.py
+from __future__ import annotations
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Sequence
+import numpy as np
+import pandas as pd
+import dotenv
+
+from sklearn.base import BaseEstimator, TransformerMixin
+
+from utils.schema import ID_MIN_ROWS, ID_UNIQUE_RATIO, looks_like_id
+
+dotenv.load_dotenv()
+
+ONEHOT_MAX_LEVELS: int = int(os.getenv("MLIFY_ONEHOT_MAX_LEVELS", "30"))
+TARGET_ENCODE_MAX_LEVELS: int = int(os.getenv("MLIFY_TARGET_ENCODE_MAX_LEVELS", "1000"))
+HASH_FEATURES: int = int(os.getenv("MLIFY_HASH_FEATURES", "256"))
+
+SPARSE_FAMILIES = frozenset({"linear", "random_forest"})  # estimators that take scipy.sparse X
+
+
+class HashingEncoder(TransformerMixin, BaseEstimator):
+    """
+    Hashes each (column, value) pair into one of `n_features` sparse indicator
+    columns. Only the distinct values of each column are hashed, so it stays
+    vectorised on tall inputs; memory is bounded by rows x columns non-zeros.
+    """
+
+    def __init__(self, n_features: int = HASH_FEATURES) -> None:
+        self.n_features = n_features
+
+    def fit(self, X, y=None):
+        self.n_features_in_ = np.shape(X)[1]
+        return self
+
+    def transform(self, X):
+        import scipy.sparse as sp
+        from sklearn.utils import murmurhash3_32
+
+        frame = X if isinstance(X, pd.DataFrame) else pd.DataFrame(X)
+        rows: List[np.ndarray] = []
+        cols: List[np.ndarray] = []
+        for j in range(frame.shape[1]):
+            codes, uniques = pd.factorize(frame.iloc[:, j])
+            buckets = np.fromiter(
+                (murmurhash3_32(f"{j}={u}", positive=True) % self.n_features for u in uniques),
+                dtype=np.int64, count=len(uniques),
+            )
+            keep = np.flatnonzero(codes >= 0)
+            rows.append(keep)
+            cols.append(buckets[codes[keep]])
+        r = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+        c = np.concatenate(cols) if cols else np.empty(0, dtype=np.int64)
+        return sp.csr_matrix((np.ones(r.size), (r, c)), shape=(len(frame), self.n_features))
+
+
+@dataclass
+class PreprocessPlan:
+    """
+    Per-column encoding decided from cardinality:
+    - onehot: <= ONEHOT_MAX_LEVELS levels, sparse one-hot (ordinal + native categorical for hist GB)
+    - target: up to TARGET_ENCODE_MAX_LEVELS levels, cross-fitted target encoding
+    - hashed: more levels than that, hashed into HASH_FEATURES sparse columns (target encoding for hist GB)
+    - dropped: near-unique identifiers and constant columns, which only add width
+    """
+    numeric: List[str] = field(default_factory=list)
+    onehot: List[str] = field(default_factory=list)
+    target: List[str] = field(default_factory=list)
+    hashed: List[str] = field(default_factory=list)
+    dropped: Dict[str, str] = field(default_factory=dict)  # col -> reason
+    levels: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def columns(self) -> List[str]:
+        return self.numeric + self.onehot + self.target + self.hashed
+
+    def n_features(self, family: str, n_classes: int = 1) -> int:
+        """Upper bound on the encoded width for a model family."""
+        te = n_classes if n_classes > 2 else 1  # multiclass target encoding emits one column per class
+        if family in SPARSE_FAMILIES:
+            width = sum(self.levels[c] for c in self.onehot) + te * len(self.target)
+            return len(self.numeric) + width + (HASH_FEATURES if self.hashed else 0)
+        return len(self.numeric) + len(self.onehot) + te * (len(self.target) + len(self.hashed))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "numeric": list(self.numeric),
+            "onehot": list(self.onehot),
+            "target_encoded": list(self.target),
+            "hashed": list(self.hashed),
+            "dropped": dict(self.dropped),
+            "levels": dict(self.levels),
+        }
+
+
+def plan_preprocessing(X: pd.DataFrame, categorical: Sequence[str]) -> PreprocessPlan:
+    """Inspect cardinality once and route every feature column to an encoder (or drop it)."""
+    cat_set = set(categorical)
+    plan = PreprocessPlan()
+    for col in X.columns:
+        s = X[col]
+        distinct = int(s.nunique(dropna=True))
+        if distinct <= 1:
+            plan.dropped[col] = "constant"
+            continue
+        if looks_like_id(s, distinct):
+            plan.dropped[col] = "identifier"
+            continue
+        if col not in cat_set:
+            plan.numeric.append(col)
+            continue
+        plan.levels[col] = distinct
+        if distinct <= ONEHOT_MAX_LEVELS:
+            plan.onehot.append(col)
+        elif distinct <= TARGET_ENCODE_MAX_LEVELS:
+            plan.target.append(col)
+        else:
+            plan.hashed.append(col)
+    return plan
+
+
+def _profile_looks_like_id(entry: Dict[str, Any], distinct: int, non_null: int) -> bool:
+    """looks_like_id from profile stats: integers count as ids when min..max spans exactly the distinct values."""
+    if non_null < ID_MIN_ROWS or distinct < ID_UNIQUE_RATIO * non_null:
+        return False
+    try:
+        dtype = pd.api.types.pandas_dtype(entry["dtype"])
+    except (TypeError, ValueError):
+        return True
+    if pd.api.types.is_float_dtype(dtype):
+        return False
+    if pd.api.types.is_integer_dtype(dtype):
+        lo, hi = entry.get("min"), entry.get("max")
+        return bool(distinct == non_null and lo is not None and hi is not None and hi - lo + 1 == distinct)
+    return True
+
+
+def plan_from_profile(profile: Dict[str, Any], features: Sequence[str]) -> PreprocessPlan:
+    """
+    plan_preprocessing from an upload profile, without reading any rows (for
+    out-of-core training). Every kept categorical is hashed: it is the one
+    encoder that needs no state fitted over the whole dataset.
+    """
+    cat_set = set(profile["categorical_cols"])
+    rows = profile["rows"]
+    plan = PreprocessPlan()
+    for col in features:
+        entry = profile["columns"][col]
+        distinct = int(entry["unique"])
+        if distinct <= 1:
+            plan.dropped[col] = "constant"
+            continue
+        if _profile_looks_like_id(entry, distinct, rows - int(entry["nulls"])):
+            plan.dropped[col] = "identifier"
+            continue
+        if col not in cat_set:
+            plan.numeric.append(col)
+            continue
+        plan.levels[col] = distinct
+        plan.hashed.append(col)
+    return plan
+
+
+def _target_encoder(task: str):
+    try:
+        from sklearn.preprocessing import TargetEncoder  # scikit-learn >= 1.3
+    except ImportError:  # older sklearn: ordinal codes still keep the width at one column
+        from sklearn.preprocessing import OrdinalEncoder
+        return OrdinalEncoder(handle_unknown="use_encoded_value", unknown_value=-1)
+    import sklearn
+    from packaging.version import Version
+    from sklearn.model_selection import KFold, StratifiedKFold
+
+    target_type = "continuous" if task == "regression" else "auto"
+    if Version(sklearn.__version__).release[:2] >= (1, 9):  # cv splitters replace random_state (rc/dev builds too)
+        cv = (KFold if task == "regression" else StratifiedKFold)(5, shuffle=True, random_state=42)
+        return TargetEncoder(target_type=target_type, cv=cv)
+    return TargetEncoder(target_type=target_type, random_state=42)
+
+
+def build_preprocessor(plan: PreprocessPlan, family: str, task: str):
+    """
+    ColumnTransformer for `plan` shaped for the model family: sparse one-hot and
+    hashing for estimators that accept sparse X, compact dense codes for hist GB.
+    """
+    from sklearn.compose import ColumnTransformer
+    from sklearn.impute import SimpleImputer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, StandardScaler
+
+    scale = family == "linear"
+    transformers: List[tuple] = []
+    if family in SPARSE_FAMILIES:
+        if plan.onehot:
+            transformers.append(("onehot", OneHotEncoder(handle_unknown="ignore", sparse_output=True), plan.onehot))
+        if plan.hashed:
+            transformers.append(("hashed", HashingEncoder(), plan.hashed))
+        high = plan.target
+    else:
+        if plan.onehot:
+            # first block, so its columns are 0..k-1 for categorical_features
+            transformers.append((
+                "ordinal",
+                OrdinalEncoder(handle_unknown="use_encoded_value", unknown_value=np.nan, encoded_missing_value=np.nan),
+                plan.onehot,
+            ))
+        high = plan.target + plan.hashed
+    if high:
+        te = _target_encoder(task)
+        transformers.append(("target", Pipeline([("encode", te), ("scale", StandardScaler())]) if scale else te, high))
+    if plan.numeric:
+        numeric = (
+            Pipeline([("impute", SimpleImputer(strategy="median", keep_empty_features=True)), ("scale", StandardScaler())])
+            if scale else "passthrough"
+        )
+        transformers.append(("num", numeric, plan.numeric))
+    return ColumnTransformer(transformers=transformers, remainder="drop")
+
+
+def build_stream_preprocessor(plan: PreprocessPlan):
+    """
+    Preprocessor for chunked training: hashing for the categoricals (stateless)
+    and standard scaling for the numerics, fitted on the first chunk.
+    """
+    from sklearn.compose import ColumnTransformer
+    from sklearn.preprocessing import StandardScaler
+
+    categorical = plan.onehot + plan.target + plan.hashed
+    transformers: List[tuple] = []
+    if categorical:
+        transformers.append(("hashed", HashingEncoder(), categorical))
+    if plan.numeric:
+        transformers.append(("num", StandardScaler(), plan.numeric))
+    return ColumnTransformer(transformers=transformers, remainder="drop")
+
+
+def native_categorical_features(plan: PreprocessPlan, family: str):
+    """categorical_features for hist GB: indices of the ordinal block, which leads the encoded matrix."""
+    if family in SPARSE_FAMILIES or not plan.onehot:
+        return None
+    return list(range(len(plan.onehot)))
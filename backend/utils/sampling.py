@@ -0,0 +1,210 @@
+# utils/sampling.py
+from __future__ import annotations
+import math, os
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Union
+import numpy as np
+import pandas as pd
+import dotenv
+
+from utils.association import codes_of, contingency, correlation_ratio, cramers_v, mutual_info
+
+dotenv.load_dotenv()
+
+SAMPLE_METHODS = ("reservoir", "stratified")
+SAMPLE_MARGIN: float = float(os.getenv("MLIFY_SAMPLE_MARGIN", "0.02"))  # target CI half-width on a correlation
+SAMPLE_MIN_ROWS: int = int(os.getenv("MLIFY_SAMPLE_MIN_ROWS", "2000"))
+SAMPLE_CHUNK_ROWS: int = int(os.getenv("MLIFY_SAMPLE_CHUNK_ROWS", "100000"))
+BOOTSTRAP_ROUNDS: int = int(os.getenv("MLIFY_BOOTSTRAP_ROUNDS", "200"))
+CONFIDENCE_LEVEL = 0.95
+_STRATA_BINS = 10  # quantile bins when stratifying on a numeric target
+
+
+# -------------------- Sample size --------------------
+def auto_sample_size(
+    rows: int,
+    missing_counts: Optional[Mapping[str, int]] = None,
+    margin: float = SAMPLE_MARGIN,
+) -> int:
+    """
+    Rows needed for a ~95% interval of +/- `margin` on a correlation (about
+    (1.96 / margin)^2 complete pairs), inflated for the worst column's missing
+    share. Takes the `rows` and `missing_counts` that /upload returns.
+    """
+    if rows <= 0:
+        return 0
+    need = (1.96 / margin) ** 2
+    if missing_counts:
+        worst = min(max(missing_counts.values()) / rows, 0.9)
+        need /= (1.0 - worst) ** 2  # pairs of sparse columns lose rows on both sides
+    return int(min(rows, max(SAMPLE_MIN_ROWS, math.ceil(need))))
+
+
+# -------------------- Samplers --------------------
+def _chunks(src: Union[pd.DataFrame, Iterable[pd.DataFrame]], chunk_rows: int) -> Iterable[pd.DataFrame]:
+    if isinstance(src, pd.DataFrame):
+        for start in range(0, len(src), chunk_rows):
+            yield src.iloc[start:start + chunk_rows]
+    else:
+        yield from src
+
+
+def reservoir_sample(
+    src: Union[pd.DataFrame, Iterable[pd.DataFrame]],
+    k: int,
+    seed: int = 42,
+    chunk_rows: int = SAMPLE_CHUNK_ROWS,
+) -> pd.DataFrame:
+    """
+    Uniform sample of `k` rows in one pass (Algorithm R, vectorised per chunk).
+    Accepts a frame or any iterator of chunks, e.g. read_csv(chunksize=...).
+    """
+    rng = np.random.default_rng(seed)
+    res: Optional[pd.DataFrame] = None
+    seen = 0
+    for chunk in _chunks(src, chunk_rows):
+        m = len(chunk)
+        if m == 0:
+            continue
+        if res is None or len(res) < k:
+            fill = k - (0 if res is None else len(res))
+            head = chunk.iloc[:fill]
+            res = head if res is None else pd.concat([res, head])
+            chunk, seen = chunk.iloc[fill:], seen + len(head)
+            m = len(chunk)
+            if m == 0:
+                continue
+        # row t (0-based overall) replaces slot j ~ U[0, t] when j < k; later rows win on collisions
+        slots = rng.integers(0, seen + np.arange(1, m + 1))
+        take = np.flatnonzero(slots < k)
+        seen += m
+        if take.size == 0:
+            continue
+        slots = slots[take]
+        rev_slots, rev_first = np.unique(slots[::-1], return_index=True)
+        take = take[::-1][rev_first]
+        pos = np.arange(len(res))
+        pos[rev_slots] = len(res) + np.arange(take.size)
+        res = pd.concat([res, chunk.iloc[take]]).iloc[pos]
+    if res is None:
+        return pd.DataFrame()
+    return res.sort_index() if isinstance(src, pd.DataFrame) else res.reset_index(drop=True)
+
+
+def _strata(y: pd.Series) -> np.ndarray:
+    """Stratum codes: target classes, or quantile bins for a numeric target."""
+    if pd.api.types.is_numeric_dtype(y) and not pd.api.types.is_bool_dtype(y) and y.nunique() > _STRATA_BINS:
+        return pd.qcut(y, _STRATA_BINS, labels=False, duplicates="drop").fillna(-1).to_numpy(dtype=np.int64)
+    return codes_of(y)[0].astype(np.int64)
+
+
+def stratified_sample(df: pd.DataFrame, target: str, k: int, seed: int = 42) -> pd.DataFrame:
+    """
+    Proportional sample of `k` rows by target stratum (every non-empty stratum
+    keeps at least one row), so rare classes survive the cut.
+    """
+    n = len(df)
+    if k >= n:
+        return df
+    rng = np.random.default_rng(seed)
+    codes = _strata(df[target])
+    codes = codes - codes.min()  # missing target (-1) becomes its own stratum
+    sizes = np.bincount(codes)
+    alloc = np.where(sizes > 0, np.maximum(1, np.round(sizes * (k / n))), 0).astype(np.int64)
+    order = np.lexsort((rng.random(n), codes))
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    rank = np.arange(n) - starts[codes[order]]
+    keep = np.sort(order[rank < alloc[codes[order]]])
+    return df.iloc[keep]
+
+
+def draw_sample(df: pd.DataFrame, target: str, k: int, method: str = "reservoir", seed: int = 42) -> pd.DataFrame:
+    if method not in SAMPLE_METHODS:
+        raise ValueError(f"sample method must be one of {', '.join(SAMPLE_METHODS)}")
+    if k >= len(df):
+        return df
+    out = reservoir_sample(df, k, seed) if method == "reservoir" else stratified_sample(df, target, k, seed)
+    return out.reset_index(drop=True)
+
+
+# -------------------- Bootstrap intervals --------------------
+def _quantiles(draws: np.ndarray, level: float) -> np.ndarray:
+    lo, hi = (1 - level) / 2, 1 - (1 - level) / 2
+    with np.errstate(invalid="ignore"):
+        return np.nanquantile(draws, [lo, hi], axis=0) if draws.size else np.empty((2, 0))
+
+
+def _resample_counts(rng: np.random.Generator, n: int, rounds: int) -> np.ndarray:
+    """(rounds, n) multiplicities of each row in a with-replacement resample."""
+    return np.stack([np.bincount(rng.integers(0, n, n), minlength=n) for _ in range(rounds)]).astype(np.float64)
+
+
+def bootstrap_corr_ci(
+    X: pd.DataFrame,
+    y: Union[pd.Series, np.ndarray],
+    rounds: int = BOOTSTRAP_ROUNDS,
+    level: float = CONFIDENCE_LEVEL,
+    seed: int = 42,
+) -> Dict[str, List[Optional[float]]]:
+    """
+    Percentile bootstrap intervals for the Pearson correlation of every column
+    of `X` with `y`. All rounds are evaluated at once as weighted sums
+    (resample multiplicities @ data), with pairwise deletion like DataFrame.corr().
+    """
+    if X.shape[1] == 0 or len(X) < 3:
+        return {str(c): [None, None] for c in X.columns}
+    rng = np.random.default_rng(seed)
+    V = X.to_numpy(dtype=np.float64, na_value=np.nan)
+    t = np.asarray(y, dtype=np.float64).reshape(-1, 1)
+    A = (~np.isnan(V) & ~np.isnan(t)).astype(np.float64)
+    with np.errstate(invalid="ignore"):
+        V = np.where(A > 0, V - np.nanmean(V, axis=0), 0.0)
+        t = np.where(np.isnan(t), 0.0, t - np.nanmean(t))
+    W = _resample_counts(rng, len(V), rounds)
+    tA = t * A
+    with np.errstate(invalid="ignore", divide="ignore"):
+        n = W @ A
+        sx, sy = W @ V, W @ tA
+        sxx, syy, sxy = W @ (V * V), W @ (tA * t), W @ (V * tA)
+        r = (sxy - sx * sy / n) / np.sqrt((sxx - sx * sx / n) * (syy - sy * sy / n))
+    r[n < 3] = np.nan
+    bounds = _quantiles(np.clip(r, -1.0, 1.0), level)
+    return {str(c): _pair(bounds[:, j]) for j, c in enumerate(X.columns)}
+
+
+def bootstrap_association_ci(
+    df: pd.DataFrame,
+    columns: Sequence[str],
+    target: str,
+    measure: str,
+    rounds: int = BOOTSTRAP_ROUNDS,
+    level: float = CONFIDENCE_LEVEL,
+    seed: int = 42,
+) -> Dict[str, List[Optional[float]]]:
+    """Percentile bootstrap intervals for a resolved association measure (eta, cramers_v, mutual_info)."""
+    rng = np.random.default_rng(seed)
+    n = len(df)
+    if n < 3 or not columns:
+        return {str(c): [None, None] for c in columns}
+    if measure == "eta":
+        y = df[target].to_numpy(dtype=np.float64, na_value=np.nan)
+    else:
+        ty, t_levels = codes_of(df[target])
+        ky = len(t_levels)
+    coded = {col: codes_of(df[col]) for col in columns}
+    draws = np.full((rounds, len(columns)), np.nan)
+    for b in range(rounds):
+        idx = rng.integers(0, n, n)
+        for j, col in enumerate(columns):
+            cx, levels = coded[col]
+            kx = len(levels)
+            if measure == "eta":
+                draws[b, j] = correlation_ratio(cx[idx], kx, y[idx])[0]
+            else:
+                table = contingency(cx[idx], kx, ty[idx], ky)
+                draws[b, j] = cramers_v(table, kx, ky) if measure == "cramers_v" else mutual_info(table, kx, ky)
+    bounds = _quantiles(draws, level)
+    return {str(c): _pair(bounds[:, j]) for j, c in enumerate(columns)}
+
+
+def _pair(b: np.ndarray) -> List[Optional[float]]:
+    return [None if not np.isfinite(v) else float(v) for v in b]
@@ -0,0 +1,116 @@
+# utils/schema.py
+from __future__ import annotations
+import io, os
+from typing import Any, Dict, Optional, Union
+import numpy as np
+import pandas as pd
+import dotenv
+
+dotenv.load_dotenv()
+
+SCHEMA_SAMPLE_ROWS: int = int(os.getenv("MLIFY_SCHEMA_SAMPLE_ROWS", "20000"))
+CATEGORY_MAX_LEVELS: int = int(os.getenv("MLIFY_CATEGORY_MAX_LEVELS", "1000"))
+CATEGORY_MAX_RATIO = 0.5  # unique/non-null in the sample
+ID_UNIQUE_RATIO = 0.95  # distinct / non-null at or above this looks like an identifier
+ID_MIN_ROWS = 20
+
+try:
+    import pyarrow  # noqa: F401
+    STRING_DTYPE = "string[pyarrow]"
+except Exception:  # pyarrow is optional; plain object strings still work
+    STRING_DTYPE = "object"
+
+# select_dtypes(include=...) for "categorical" columns once compact dtypes are in play
+CATEGORICAL_DTYPES = ["object", "category", "bool", "string"]
+
+# Column kinds recorded in a schema
+INTEGER, FLOAT, BOOL, CATEGORY, STRING, OTHER = "integer", "float", "bool", "category", "string", "other"
+
+Source = Union[str, bytes]
+Schema = Dict[str, Any]
+
+
+def looks_like_id(s: pd.Series, distinct: int) -> bool:
+    """Near-unique values that name rows rather than describe them (ids, keys, row counters)."""
+    non_null = int(s.notna().sum())
+    if non_null < ID_MIN_ROWS or distinct < ID_UNIQUE_RATIO * non_null:
+        return False
+    if pd.api.types.is_float_dtype(s):
+        return False  # continuous measurements are naturally all-distinct
+    if pd.api.types.is_integer_dtype(s):
+        return bool(distinct == non_null and s.dropna().is_monotonic_increasing)  # row counters / surrogate keys
+    return True
+
+
+def _source(src: Source):
+    return io.BytesIO(src) if isinstance(src, (bytes, bytearray)) else src
+
+
+def infer_schema(src: Source, sample_rows: int = SCHEMA_SAMPLE_ROWS) -> Schema:
+    """Pick a compact dtype family per column from the first `sample_rows` rows of a CSV."""
+    sample = pd.read_csv(_source(src), nrows=sample_rows)
+    columns: Dict[str, str] = {}
+    for col in sample.columns:
+        s = sample[col]
+        if pd.api.types.is_bool_dtype(s):
+            kind = BOOL
+        elif pd.api.types.is_integer_dtype(s):
+            kind = INTEGER
+        elif pd.api.types.is_float_dtype(s):
+            kind = FLOAT
+        elif pd.api.types.is_object_dtype(s) or pd.api.types.is_string_dtype(s):
+            non_null = s.dropna()
+            levels = non_null.nunique()
+            small = levels <= CATEGORY_MAX_LEVELS and levels <= max(1, CATEGORY_MAX_RATIO * len(non_null))
+            kind = CATEGORY if small else STRING
+        else:
+            kind = OTHER
+        columns[str(col)] = kind
+    return {"version": 1, "sample_rows": int(len(sample)), "columns": columns}
+
+
+def read_dtypes(schema: Optional[Schema]) -> Dict[str, str]:
+    """dtype= mapping for read_csv; numerics are parsed natively and downcast afterwards."""
+    if not schema:
+        return {}
+    out: Dict[str, str] = {}
+    for col, kind in schema.get("columns", {}).items():
+        if kind == CATEGORY:
+            out[col] = "category"
+        elif kind == STRING:
+            out[col] = STRING_DTYPE
+    return out
+
+
+def _lossless_float32(s: pd.Series) -> bool:
+    values = s.to_numpy(dtype=np.float64, na_value=np.nan)
+    finite = values[np.isfinite(values)]
+    if finite.size and np.abs(finite).max() > np.finfo(np.float32).max:
+        return False
+    return bool(np.array_equal(values.astype(np.float32).astype(np.float64), values, equal_nan=True))
+
+
+def downcast(df: pd.DataFrame, schema: Optional[Schema] = None) -> pd.DataFrame:
+    """Shrink numeric columns in place: smallest int that fits, float32 only when lossless."""
+    kinds = (schema or {}).get("columns", {})
+    for col in df.columns:
+        s = df[col]
+        if pd.api.types.is_bool_dtype(s) or not pd.api.types.is_numeric_dtype(s):
+            continue
+        if kinds and kinds.get(str(col)) not in (INTEGER, FLOAT, None):
+            continue
+        if pd.api.types.is_integer_dtype(s):
+            df[col] = pd.to_numeric(s, downcast="integer")
+        elif s.dtype == np.float64 and _lossless_float32(s):
+            df[col] = s.astype(np.float32)
+    return df
+
+
+def read_csv(src: Source, schema: Optional[Schema] = None, **kwargs) -> pd.DataFrame:
+    """read_csv with the schema's dtypes applied up front and numerics downcast after."""
+    dtypes = read_dtypes(schema)
+    try:
+        df = pd.read_csv(_source(src), dtype=dtypes or None, **kwargs)
+    except (TypeError, ValueError):
+        df = pd.read_csv(_source(src), **kwargs)  # schema doesn't fit this file; parse plainly
+    return downcast(df, schema)
@@ -0,0 +1,124 @@
+# utils/shared_store.py
+from __future__ import annotations
+import importlib.util, os, tempfile
+from typing import Dict, Optional, Sequence
+import pandas as pd
+import dotenv
+
+dotenv.load_dotenv()
+
+_DEFAULT_DIR = "/dev/shm/mlify" if os.path.isdir("/dev/shm") else os.path.join(tempfile.gettempdir(), "mlify-shared")
+
+SHARED_STORE_ENABLED: bool = os.getenv("MLIFY_SHARED_STORE", "false").lower() == "true"  # serve.py turns it on
+SHARED_STORE_DIR: str = os.getenv("MLIFY_SHARED_STORE_DIR", _DEFAULT_DIR)
+SHARED_STORE_MAX_BYTES: int = int(os.getenv("MLIFY_SHARED_STORE_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+
+_SUFFIX = ".arrow"
+
+
+def _arrow():
+    """pyarrow with its IPC module loaded, or None if it isn't installed."""
+    if importlib.util.find_spec("pyarrow") is None:
+        return None
+    import pyarrow as pa
+    import pyarrow.ipc  # noqa: F401
+    return pa
+
+
+class SharedStore:
+    """
+    Parsed DataFrames as uncompressed Arrow IPC files in a directory every
+    worker process sees (tmpfs by default). Readers memory-map the file, so
+    numeric columns come back as read-only zero-copy views over pages that all
+    processes share: a dataset parsed by one worker is loaded by the others
+    without decoding it or holding a private copy. Files are written to a temp
+    name and renamed, so readers never see a partial one; the least recently
+    read are removed once the directory holds more than `max_bytes`.
+    """
+
+    def __init__(self, directory: str = SHARED_STORE_DIR, max_bytes: int = SHARED_STORE_MAX_BYTES) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, f"{digest}{_SUFFIX}")
+
+    def has(self, digest: str) -> bool:
+        return os.path.exists(self._path(digest))
+
+    def put(self, digest: str, df: pd.DataFrame) -> bool:
+        """Publish `df` for every worker; False if it can't be stored (no pyarrow, unsupported dtypes, too big)."""
+        path = self._path(digest)
+        if os.path.exists(path):
+            return True
+        pa = _arrow()
+        if pa is None or int(df.memory_usage(index=False).sum()) > self.max_bytes:
+            return False
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            os.replace(tmp, path)
+        except Exception:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return False
+        self._evict(keep=path)
+        return True
+
+    def get(self, digest: str, columns: Optional[Sequence[str]] = None) -> Optional[pd.DataFrame]:
+        """The frame (only the `columns` it has, if given), backed by the shared mapping; None on a miss."""
+        path = self._path(digest)
+        pa = _arrow()
+        if pa is None or not os.path.exists(path):
+            return None
+        try:
+            # The table keeps the mapping alive; removing the file later doesn't invalidate it
+            table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+            if columns is not None:
+                table = table.select([c for c in columns if c in table.column_names])
+            df = table.to_pandas(split_blocks=True)  # one block per column: numerics stay zero-copy
+            os.utime(path)  # recency for eviction
+        except Exception:
+            return None
+        return df
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, int]:
+        sizes = []
+        for name in os.listdir(self.directory):
+            if name.endswith(_SUFFIX):
+                try:
+                    sizes.append(os.path.getsize(os.path.join(self.directory, name)))
+                except OSError:
+                    pass
+        return {"entries": len(sizes), "bytes": sum(sizes), "max_bytes": self.max_bytes}
+
+
+shared_store: Optional[SharedStore] = SharedStore() if SHARED_STORE_ENABLED else None
@@ -0,0 +1,322 @@
+# utils/streaming_stats.py
+from __future__ import annotations
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+import numpy as np
+import pandas as pd
+import dotenv
+
+from utils.association import eta_corrected
+
+dotenv.load_dotenv()
+
+STATS_CHUNK_ROWS: int = int(os.getenv("MLIFY_STATS_CHUNK_ROWS", "100000"))
+
+
+class StreamingStats:
+    """
+    Mergeable one-pass moments for a fixed set of numeric columns.
+
+    Keeps pairwise-complete sums of shifted values (shift = first chunk's
+    means, for numerical stability): counts N, sums S, sums of squares Q and
+    cross-products P, each k x k, where [i, j] sums over rows where both i and
+    j are present. That is enough for pandas-compatible pairwise means,
+    variances, covariance and Pearson correlation. Also tracks per-column null
+    counts and, optionally, per-category aggregates of a target column.
+
+    Partials from different chunks, processes or files combine with `merge`.
+    """
+
+    def __init__(
+        self,
+        columns: Sequence[str],
+        target: Optional[str] = None,
+        category_columns: Sequence[str] = (),
+        target_numeric: bool = True,
+    ) -> None:
+        self.columns = [str(c) for c in columns]
+        self.target = target
+        self.category_columns = list(category_columns)
+        self.target_numeric = target_numeric
+        k = len(self.columns)
+        self.rows = 0
+        self.shift: Optional[np.ndarray] = None
+        self.N = np.zeros((k, k))
+        self.S = np.zeros((k, k))
+        self.Q = np.zeros((k, k))
+        self.P = np.zeros((k, k))
+        self.missing: pd.Series = pd.Series(dtype="int64")
+        # col -> per-level count/mean/M2 frame (numeric target) or (level, class) -> count Series
+        self.cat_aggs: Dict[str, Any] = {}
+
+    # ---------- accumulation ----------
+    def update(self, chunk: pd.DataFrame) -> "StreamingStats":
+        if chunk.empty:
+            return self
+        self.rows += int(len(chunk))
+        miss = chunk.isnull().sum()
+        self.missing = miss if self.missing.empty else self.missing.add(miss, fill_value=0).astype("int64")
+
+        if self.columns:
+            X = chunk[self.columns].to_numpy(dtype=np.float64, na_value=np.nan)
+            present = ~np.isnan(X)
+            if self.shift is None:
+                with np.errstate(invalid="ignore"):
+                    shift = np.nanmean(np.where(present, X, np.nan), axis=0) if present.any() else np.zeros(X.shape[1])
+                self.shift = np.nan_to_num(shift)
+            X = np.where(present, X - self.shift, 0.0)
+            M = present.astype(np.float64)
+            self.N += M.T @ M
+            self.S += X.T @ M
+            self.Q += (X * X).T @ M
+            self.P += X.T @ X
+
+        if self.target is not None:
+            for col in self.category_columns:
+                self._update_category(col, chunk)
+        return self
+
+    def _update_category(self, col: str, chunk: pd.DataFrame) -> None:
+        keys = chunk[col]
+        y = chunk[self.target]
+        if self.target_numeric:
+            yv = pd.to_numeric(y, errors="coerce").astype(np.float64)
+            part = pd.DataFrame({"k": keys, "y": yv}).dropna()
+            g = part.groupby("k", observed=True)["y"]
+            agg = pd.DataFrame({"count": g.size().astype(np.float64), "mean": g.mean()})
+            agg["m2"] = g.var(ddof=0).fillna(0.0) * agg["count"]
+        else:
+            agg = pd.DataFrame({"k": keys, "t": y}).dropna().groupby(["k", "t"], observed=True).size()
+        self._merge_category(col, agg)
+
+    def _merge_category(self, col: str, agg: Any) -> None:
+        prev = self.cat_aggs.get(col)
+        if prev is None:
+            self.cat_aggs[col] = agg
+        elif not self.target_numeric:
+            self.cat_aggs[col] = prev.add(agg, fill_value=0)
+        else:
+            # Chan et al. parallel update of (count, mean, M2) per level
+            a, b = prev.align(agg, join="outer", fill_value=0.0)
+            n = a["count"] + b["count"]
+            delta = b["mean"] - a["mean"]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                w = (b["count"] / n).fillna(0.0)
+            self.cat_aggs[col] = pd.DataFrame({
+                "count": n,
+                "mean": a["mean"] + delta * w,
+                "m2": a["m2"] + b["m2"] + delta * delta * a["count"] * w,
+            })
+
+    def _rebase(self, new_shift: np.ndarray) -> None:
+        """Re-express the shifted sums around a different shift vector."""
+        if self.shift is None:
+            self.shift = new_shift
+            return
+        d = self.shift - new_shift  # x - new = (x - old) + d
+        di, dj = d[:, None], d[None, :]
+        # P uses both S orientations, so update it before S and Q
+        self.P = self.P + dj * self.S + di * self.S.T + self.N * di * dj
+        self.Q = self.Q + 2 * di * self.S + self.N * di * di
+        self.S = self.S + self.N * di
+        self.shift = new_shift
+
+    def merge(self, other: "StreamingStats") -> "StreamingStats":
+        if other.columns != self.columns:
+            raise ValueError("Cannot merge StreamingStats over different columns")
+        if other.rows == 0:
+            return self
+        if self.rows == 0:
+            self.__dict__.update({k: (v.copy() if hasattr(v, "copy") else v) for k, v in other.__dict__.items()})
+            return self
+        if other.shift is not None:
+            if self.shift is None:
+                self.shift = other.shift.copy()
+            elif not np.array_equal(other.shift, self.shift):
+                other = other._copy()
+                other._rebase(self.shift)
+        self.rows += other.rows
+        self.N += other.N
+        self.S += other.S
+        self.Q += other.Q
+        self.P += other.P
+        self.missing = self.missing.add(other.missing, fill_value=0).astype("int64")
+        for col, agg in other.cat_aggs.items():
+            self._merge_category(col, agg)
+        return self
+
+    def _copy(self) -> "StreamingStats":
+        out = StreamingStats(self.columns, self.target, self.category_columns, self.target_numeric)
+        out.merge(self)
+        return out
+
+    # ---------- derived stats ----------
+    def subset(self, columns: Sequence[str]) -> "StreamingStats":
+        """Moments for a subset of the numeric columns (category aggregates are dropped)."""
+        idx = [self.columns.index(str(c)) for c in columns]
+        out = StreamingStats([self.columns[i] for i in idx])
+        out.rows = self.rows
+        out.shift = None if self.shift is None else self.shift[idx].copy()
+        for name in ("N", "S", "Q", "P"):
+            setattr(out, name, getattr(self, name)[np.ix_(idx, idx)].copy())
+        out.missing = self.missing.reindex(out.columns, fill_value=0).astype("int64")
+        return out
+
+    def filled(self, fill_values: Dict[str, float]) -> "StreamingStats":
+        """
+        Moments of the same rows after each column's nulls are replaced by a
+        constant, derived from the pairwise sums without another scan. Every
+        column with nulls needs a fill value.
+        """
+        n = np.diag(self.N)
+        miss = self.rows - n
+        f = np.array([fill_values.get(c, np.nan) for c in self.columns], dtype=np.float64)
+        if np.isnan(f[miss > 0]).any():
+            raise ValueError("Every column with nulls needs a fill value")
+        f = np.where(miss > 0, f - (self.shift if self.shift is not None else 0.0), 0.0)
+        s, q = np.diag(self.S), np.diag(self.Q)
+        out = StreamingStats(self.columns)
+        out.rows = self.rows
+        out.shift = None if self.shift is None else self.shift.copy()
+        k = len(self.columns)
+        out.N = np.full((k, k), float(self.rows))
+        out.S = np.repeat((s + miss * f)[:, None], k, axis=1)
+        out.Q = np.repeat((q + miss * f * f)[:, None], k, axis=1)
+        # rows where both are present, only i, only j, neither
+        out.P = (
+            self.P
+            + f[None, :] * (s[:, None] - self.S)
+            + f[:, None] * (s[None, :] - self.S.T)
+            + f[:, None] * f[None, :] * (self.rows - n[:, None] - n[None, :] + self.N)
+        )
+        out.missing = pd.Series(0, index=self.columns, dtype="int64")
+        return out
+
+    # ---------- serialisation (numeric moments only) ----------
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "columns": self.columns,
+            "rows": self.rows,
+            "shift": None if self.shift is None else self.shift.tolist(),
+            **{name: getattr(self, name).tolist() for name in ("N", "S", "Q", "P")},
+            "missing": {str(k): int(v) for k, v in self.missing.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "StreamingStats":
+        out = cls(d["columns"])
+        out.rows = int(d["rows"])
+        out.shift = None if d.get("shift") is None else np.asarray(d["shift"], dtype=np.float64)
+        for name in ("N", "S", "Q", "P"):
+            setattr(out, name, np.asarray(d[name], dtype=np.float64).reshape(len(out.columns), len(out.columns)))
+        out.missing = pd.Series(d.get("missing") or {}, dtype="int64")
+        return out
+
+    # ---------- results ----------
+    def _frame(self, values: np.ndarray) -> pd.DataFrame:
+        return pd.DataFrame(values, index=self.columns, columns=self.columns)
+
+    def count(self) -> pd.Series:
+        return pd.Series(np.diag(self.N), index=self.columns)
+
+    def mean(self) -> pd.Series:
+        n = np.diag(self.N)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return pd.Series(np.diag(self.S) / n + (self.shift if self.shift is not None else 0.0), index=self.columns)
+
+    def cov(self, ddof: int = 1) -> pd.DataFrame:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            c = (self.P - self.S * self.S.T / self.N) / (self.N - ddof)
+        return self._frame(c)
+
+    def var(self, ddof: int = 1) -> pd.Series:
+        return pd.Series(np.diag(self.cov(ddof).to_numpy()), index=self.columns)
+
+    def corr(self) -> pd.DataFrame:
+        """Pearson correlation with pairwise deletion (matches DataFrame.corr())."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cxy = self.P - self.S * self.S.T / self.N
+            vx = self.Q - self.S * self.S / self.N
+            r = cxy / np.sqrt(vx * vx.T)
+        r[self.N < 2] = np.nan
+        r = np.clip(r, -1.0, 1.0)
+        idx = np.arange(len(self.columns))
+        r[idx, idx] = np.where(np.diag(self.N) >= 2, 1.0, np.nan)
+        return self._frame(r)
+
+    def category_aggregates(self, col: str) -> pd.DataFrame:
+        """Numeric target: count/mean/M2 per level. Categorical target: level x class counts."""
+        agg = self.cat_aggs[col]
+        return agg.copy() if self.target_numeric else agg.unstack(fill_value=0)
+
+    def correlation_ratio(self, col: str) -> float:
+        """Bias-corrected eta of the numeric target on a categorical column, from the streamed aggregates only."""
+        agg = self.cat_aggs[col]
+        n = float(agg["count"].sum())
+        if n == 0:
+            return float("nan")
+        grand = float((agg["count"] * agg["mean"]).sum() / n)
+        ss_between = float((agg["count"] * (agg["mean"] - grand) ** 2).sum())
+        ss_total = ss_between + float(agg["m2"].sum())
+        return eta_corrected(ss_between, ss_total, n, int((agg["count"] > 0).sum()))
+
+
+# -------------------- Scanners --------------------
+def scan_frame(df: pd.DataFrame, stats: StreamingStats, chunk_rows: int = STATS_CHUNK_ROWS) -> StreamingStats:
+    """Feed an in-memory frame in row slices so temporaries stay bounded."""
+    for start in range(0, len(df), chunk_rows):
+        stats.update(df.iloc[start:start + chunk_rows])
+    return stats
+
+
+def scan_csv(path: str, stats: StreamingStats, chunk_rows: int = STATS_CHUNK_ROWS, **read_kwargs) -> StreamingStats:
+    with pd.read_csv(path, chunksize=chunk_rows, **read_kwargs) as reader:
+        for chunk in reader:
+            stats.update(chunk)
+    return stats
+
+
+def _parquet_columns(stats: StreamingStats) -> List[str]:
+    cols = list(stats.columns)
+    for c in ([stats.target] if stats.target else []) + stats.category_columns:
+        if c not in cols:
+            cols.append(c)
+    return cols
+
+
+def scan_parquet(
+    path: str,
+    stats: StreamingStats,
+    row_groups: Optional[Iterable[int]] = None,
+    columns: Optional[List[str]] = None,
+) -> StreamingStats:
+    """Scan a Parquet file (memory-mapped) row group by row group, reading only the needed columns."""
+    import pyarrow.parquet as pq
+
+    pf = pq.ParquetFile(path, memory_map=True)
+    groups = range(pf.num_row_groups) if row_groups is None else row_groups
+    wanted = columns or _parquet_columns(stats)
+    for i in groups:
+        stats.update(pf.read_row_group(i, columns=wanted).to_pandas())
+    return stats
+
+
+def _scan_parquet_part(path: str, template: StreamingStats, row_groups: List[int]) -> StreamingStats:
+    return scan_parquet(path, template._copy(), row_groups)
+
+
+def parallel_scan_parquet(path: str, stats: StreamingStats, max_workers: Optional[int] = None) -> StreamingStats:
+    """Split a Parquet file's row groups across processes and merge the partials into `stats`."""
+    import pyarrow.parquet as pq
+
+    n_groups = pq.ParquetFile(path).num_row_groups
+    workers = max(1, min(max_workers or (os.cpu_count() or 1), n_groups))
+    if workers == 1:
+        return scan_parquet(path, stats)
+    parts = [list(range(i, n_groups, workers)) for i in range(workers)]
+    empty = StreamingStats(stats.columns, stats.target, stats.category_columns, stats.target_numeric)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for partial in pool.map(_scan_parquet_part, [path] * workers, [empty] * workers, parts):
+            stats.merge(partial)
+    return stats
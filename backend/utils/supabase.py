@@ -1,9 +1,11 @@
 # utils/supabase.py
 from __future__ import annotations
-import os, mimetypes
-from typing import Optional, Union
-from supabase import create_client, Client
+import asyncio, mimetypes, os, random, shutil, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, TypeVar, Union
+from urllib.parse import quote, unquote
 import dotenv
+import httpx
 
 dotenv.load_dotenv()
 
@@ -12,10 +14,28 @@ SUPABASE_KEY: Optional[str] = os.getenv("SERVICE_KEY")
 DEFAULT_BUCKET: str = os.getenv("SUPABASE_BUCKET", "mlify-storage")
 PUBLIC_READ_DEFAULT: bool = os.getenv("SUPABASE_PUBLIC_READ", "true").lower() == "true"
 
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise RuntimeError("Missing Supabase credentials. Set PROJECT_URL and SERVICE_KEY.")
+# "supabase" (default) or "local" (files under LOCAL_STORAGE_DIR, handy offline / in tests)
+STORAGE_BACKEND: str = os.getenv("STORAGE_BACKEND", "supabase").lower()
+LOCAL_STORAGE_DIR: str = os.getenv("MLIFY_LOCAL_STORAGE_DIR", os.path.abspath("storage"))
+LOCAL_STORAGE_URL: str = os.getenv("MLIFY_LOCAL_STORAGE_URL", "/storage")  # main.py serves this path
+
+STORAGE_RETRIES: int = int(os.getenv("MLIFY_STORAGE_RETRIES", "3"))
+STORAGE_BACKOFF: float = float(os.getenv("MLIFY_STORAGE_BACKOFF", "0.5"))
+STORAGE_CONCURRENCY: int = int(os.getenv("MLIFY_STORAGE_CONCURRENCY", "8"))
+STORAGE_TIMEOUT: float = float(os.getenv("MLIFY_STORAGE_TIMEOUT", "60"))
+STREAM_CHUNK_BYTES = 1024 * 1024
+
+Data = Union[bytes, bytearray]
+# (data, key, content_type or None) for batch uploads
+UploadItem = Tuple[Data, str, Optional[str]]
+T = TypeVar("T")
+
+_RETRY_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+
+class StorageError(RuntimeError):
+    pass
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
 def _guess_content_type(name: str, fallback: str = "application/octet-stream") -> str:
     overrides = {
@@ -29,43 +49,367 @@ def _guess_content_type(name: str, fallback: str = "application/octet-stream") -
     guessed, _ = mimetypes.guess_type(name)
     return guessed or fallback
 
-def public_url(key: str, bucket_name: str = DEFAULT_BUCKET) -> str:
-    res = supabase.storage.from_(bucket_name).get_public_url(key)
-    if isinstance(res, str):
+
+def _backoff(attempt: int) -> float:
+    return STORAGE_BACKOFF * (2 ** attempt) * (0.5 + random.random())
+
+
+def _retry(fn: Callable[[], T]) -> T:
+    for attempt in range(STORAGE_RETRIES + 1):
+        try:
+            return fn()
+        except (httpx.TransportError, StorageError) as e:
+            if attempt >= STORAGE_RETRIES or not getattr(e, "retryable", True):
+                raise
+            time.sleep(_backoff(attempt))
+    raise AssertionError("unreachable")
+
+
+async def _aretry(fn: Callable[[], Awaitable[T]]) -> T:
+    for attempt in range(STORAGE_RETRIES + 1):
+        try:
+            return await fn()
+        except (httpx.TransportError, StorageError) as e:
+            if attempt >= STORAGE_RETRIES or not getattr(e, "retryable", True):
+                raise
+            await asyncio.sleep(_backoff(attempt))
+    raise AssertionError("unreachable")
+
+
+def _check(res: httpx.Response) -> httpx.Response:
+    if res.status_code in (200, 201):
         return res
-    if isinstance(res, dict):
-        return (
-            res.get("publicURL")
-            or res.get("publicUrl")
-            or (res.get("data") or {}).get("publicURL")
-            or (res.get("data") or {}).get("publicUrl")
-            or str(res)
-        )
+    err = StorageError(f"Supabase request failed ({res.status_code}): {res.text[:300]}")
+    err.retryable = res.status_code in _RETRY_STATUS  # type: ignore[attr-defined]
+    raise err
+
+
+def _stream_download(client: httpx.Client, url: str, path: str) -> str:
+    """GET `url` into `path` block by block (large objects never sit in memory)."""
+    with client.stream("GET", url) as res:
+        if res.status_code not in (200, 201):
+            res.read()
+            _check(res)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.part"  # unique per thread: two may fetch one path
+        try:
+            with open(tmp, "wb") as fh:
+                for block in res.iter_bytes(STREAM_CHUNK_BYTES):
+                    fh.write(block)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+    return path
+
+
+def _aclose_on(client: httpx.AsyncClient, loop) -> None:
+    """Close an async client that belongs to another (possibly finished) event loop."""
+    if loop is not None and loop.is_running():
+        asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+        return
+    # Its loop is gone: nothing can await on it any more, so close the pooled sockets from here
     try:
-        get = getattr(res, "get", None)
-        if callable(get):
-            cand = (
-                get("publicURL") or get("publicUrl")
-                or (get("data") or {}).get("publicURL")
-                or (get("data") or {}).get("publicUrl")
+        asyncio.get_running_loop().create_task(client.aclose())
+    except RuntimeError:
+        asyncio.run(client.aclose())
+
+
+# -------------------- Supabase Storage (REST, pooled) --------------------
+class SupabaseStorage:
+    """
+    Talks to the Supabase Storage REST API over pooled keep-alive connections.
+    Public URLs are built locally; only signed URLs need a round-trip.
+    """
+
+    def __init__(self, url: str, key: str, bucket: str = DEFAULT_BUCKET) -> None:
+        self.url = url.rstrip("/")
+        self.key = key
+        self.bucket = bucket
+        self._client: Optional[httpx.Client] = None
+        self._aclient: Optional[httpx.AsyncClient] = None
+        self._aclient_loop = None
+        self._lock = threading.Lock()
+
+    @property
+    def _headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.key}", "apikey": self.key}
+
+    @property
+    def client(self) -> httpx.Client:
+        with self._lock:
+            if self._client is None:
+                self._client = httpx.Client(
+                    headers=self._headers,
+                    timeout=STORAGE_TIMEOUT,
+                    limits=httpx.Limits(max_connections=STORAGE_CONCURRENCY * 2),
+                )
+            return self._client
+
+    @property
+    def aclient(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._aclient is None or self._aclient_loop is not loop:
+            if self._aclient is not None:
+                _aclose_on(self._aclient, self._aclient_loop)  # the old loop's pool would otherwise leak
+            self._aclient = httpx.AsyncClient(
+                headers=self._headers,
+                timeout=STORAGE_TIMEOUT,
+                limits=httpx.Limits(max_connections=STORAGE_CONCURRENCY * 2),
             )
-            if cand: return str(cand)
-    except Exception:
+            self._aclient_loop = loop
+        return self._aclient
+
+    def _object_url(self, key: str, bucket: str) -> str:
+        return f"{self.url}/storage/v1/object/{bucket}/{quote(key)}"
+
+    def public_url(self, key: str, bucket_name: Optional[str] = None) -> str:
+        return f"{self.url}/storage/v1/object/public/{bucket_name or self.bucket}/{quote(key)}"
+
+    def _url_for(self, key: str, bucket: str, make_public: Optional[bool]) -> str:
+        public = PUBLIC_READ_DEFAULT if make_public is None else make_public
+        return self.public_url(key, bucket) if public else self.signed_url(key, bucket_name=bucket)
+
+    async def _aurl_for(self, key: str, bucket: str, make_public: Optional[bool]) -> str:
+        public = PUBLIC_READ_DEFAULT if make_public is None else make_public
+        return self.public_url(key, bucket) if public else await self.asigned_url(key, bucket_name=bucket)
+
+    @staticmethod
+    def _upload_headers(key: str, content_type: Optional[str], upsert: bool) -> Dict[str, str]:
+        return {"Content-Type": str(content_type or _guess_content_type(key)), "x-upsert": "true" if upsert else "false"}
+
+    def signed_url(self, key: str, expires_in: int = 3600, bucket_name: Optional[str] = None) -> str:
+        bucket = bucket_name or self.bucket
+        res = _retry(lambda: _check(self.client.post(
+            f"{self.url}/storage/v1/object/sign/{bucket}/{quote(key)}", json={"expiresIn": expires_in})))
+        body = res.json()
+        return f"{self.url}/storage/v1{body.get('signedURL') or body.get('signedUrl')}"
+
+    async def asigned_url(self, key: str, expires_in: int = 3600, bucket_name: Optional[str] = None) -> str:
+        bucket = bucket_name or self.bucket
+        res = await _aretry(lambda: self._apost(
+            f"{self.url}/storage/v1/object/sign/{bucket}/{quote(key)}", json={"expiresIn": expires_in}))
+        body = res.json()
+        return f"{self.url}/storage/v1{body.get('signedURL') or body.get('signedUrl')}"
+
+    async def _apost(self, url: str, **kw) -> httpx.Response:
+        return _check(await self.aclient.post(url, **kw))
+
+    def upload_bytes(self, data: Data, key: str, *, bucket_name: Optional[str] = None,
+                     content_type: Optional[str] = None, upsert: bool = True,
+                     make_public: Optional[bool] = None) -> str:
+        bucket = bucket_name or self.bucket
+        headers = self._upload_headers(key, content_type, upsert)
+        _retry(lambda: _check(self.client.post(self._object_url(key, bucket), content=bytes(data), headers=headers)))
+        return self._url_for(key, bucket, make_public)
+
+    def upload_path(self, path: str, key: str, *, bucket_name: Optional[str] = None,
+                    content_type: Optional[str] = None, upsert: bool = True,
+                    make_public: Optional[bool] = None) -> str:
+        bucket = bucket_name or self.bucket
+        headers = self._upload_headers(key, content_type, upsert)
+        headers["Content-Length"] = str(os.path.getsize(path))
+
+        def _send() -> httpx.Response:
+            with open(path, "rb") as fh:  # reopened per attempt so retries restart the stream
+                return _check(self.client.post(self._object_url(key, bucket), content=fh, headers=headers))
+
+        _retry(_send)
+        return self._url_for(key, bucket, make_public)
+
+    async def aupload_bytes(self, data: Data, key: str, *, bucket_name: Optional[str] = None,
+                            content_type: Optional[str] = None, upsert: bool = True,
+                            make_public: Optional[bool] = None) -> str:
+        bucket = bucket_name or self.bucket
+        headers = self._upload_headers(key, content_type, upsert)
+        await _aretry(lambda: self._apost(self._object_url(key, bucket), content=bytes(data), headers=headers))
+        return await self._aurl_for(key, bucket, make_public)
+
+    async def aupload_path(self, path: str, key: str, *, bucket_name: Optional[str] = None,
+                           content_type: Optional[str] = None, upsert: bool = True,
+                           make_public: Optional[bool] = None) -> str:
+        bucket = bucket_name or self.bucket
+        headers = self._upload_headers(key, content_type, upsert)
+        headers["Content-Length"] = str(os.path.getsize(path))
+
+        async def _chunks():
+            with open(path, "rb") as fh:
+                while True:
+                    chunk = await asyncio.to_thread(fh.read, STREAM_CHUNK_BYTES)
+                    if not chunk:
+                        return
+                    yield chunk
+
+        await _aretry(lambda: self._apost(self._object_url(key, bucket), content=_chunks(), headers=headers))
+        return await self._aurl_for(key, bucket, make_public)
+
+    def download_bytes(self, url: str) -> bytes:
+        if url.startswith(self.url):  # our project: reuse the pooled, authenticated client
+            return _retry(lambda: _check(self.client.get(url))).content
+        return _retry(lambda: _check(httpx.get(url, timeout=STORAGE_TIMEOUT, follow_redirects=True))).content
+
+    def download_path(self, url: str, path: str) -> str:
+        if url.startswith(self.url):
+            return _retry(lambda: _stream_download(self.client, url, path))
+        with httpx.Client(timeout=STORAGE_TIMEOUT, follow_redirects=True) as client:
+            return _retry(lambda: _stream_download(client, url, path))
+
+    def close(self) -> None:
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    async def aclose(self) -> None:
+        """close() plus the async pool; call from the event loop that used it."""
+        self.close()
+        if self._aclient is not None:
+            client, loop = self._aclient, self._aclient_loop
+            self._aclient = self._aclient_loop = None
+            if loop is asyncio.get_running_loop():
+                await client.aclose()
+            else:
+                _aclose_on(client, loop)
+
+
+# -------------------- Local filesystem (same interface) --------------------
+class LocalStorage:
+    """Stores objects under `root/<bucket>/<key>`; URLs are `<base_url>/<bucket>/<key>`."""
+
+    def __init__(self, root: str = LOCAL_STORAGE_DIR, base_url: str = LOCAL_STORAGE_URL,
+                 bucket: str = DEFAULT_BUCKET) -> None:
+        self.root = root
+        self.base_url = base_url.rstrip("/")
+        self.bucket = bucket
+
+    def _path(self, key: str, bucket: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, bucket, key))
+        if not path.startswith(os.path.abspath(self.root) + os.sep):
+            raise StorageError(f"Invalid storage key: {key}")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def public_url(self, key: str, bucket_name: Optional[str] = None) -> str:
+        return f"{self.base_url}/{bucket_name or self.bucket}/{quote(key)}"
+
+    def signed_url(self, key: str, expires_in: int = 3600, bucket_name: Optional[str] = None) -> str:
+        return self.public_url(key, bucket_name)
+
+    async def asigned_url(self, key: str, expires_in: int = 3600, bucket_name: Optional[str] = None) -> str:
+        return self.public_url(key, bucket_name)
+
+    def upload_bytes(self, data: Data, key: str, *, bucket_name: Optional[str] = None,
+                     content_type: Optional[str] = None, upsert: bool = True,
+                     make_public: Optional[bool] = None) -> str:
+        bucket = bucket_name or self.bucket
+        path = self._path(key, bucket)
+        if not upsert and os.path.exists(path):
+            raise StorageError(f"Object already exists: {key}")
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as fh:
+            fh.write(bytes(data))
+        os.replace(tmp, path)
+        return self.public_url(key, bucket)
+
+    def upload_path(self, path: str, key: str, *, bucket_name: Optional[str] = None,
+                    content_type: Optional[str] = None, upsert: bool = True,
+                    make_public: Optional[bool] = None) -> str:
+        bucket = bucket_name or self.bucket
+        dest = self._path(key, bucket)
+        if not upsert and os.path.exists(dest):
+            raise StorageError(f"Object already exists: {key}")
+        shutil.copyfile(path, dest)
+        return self.public_url(key, bucket)
+
+    async def aupload_bytes(self, data: Data, key: str, **kw) -> str:
+        return await asyncio.to_thread(self.upload_bytes, data, key, **kw)
+
+    async def aupload_path(self, path: str, key: str, **kw) -> str:
+        return await asyncio.to_thread(self.upload_path, path, key, **kw)
+
+    def local_path(self, url: str) -> Optional[str]:
+        """Filesystem path behind one of our URLs, or None if the URL isn't ours."""
+        prefix = f"{self.base_url}/"
+        if not url.startswith(prefix):
+            return None
+        bucket, _, key = unquote(url[len(prefix):].split("?", 1)[0]).partition("/")
+        return self._path(key, bucket)
+
+    def download_bytes(self, url: str) -> bytes:
+        path = self.local_path(url)
+        if path is None:
+            return _retry(lambda: _check(httpx.get(url, timeout=STORAGE_TIMEOUT, follow_redirects=True))).content
+        with open(path, "rb") as fh:
+            return fh.read()
+
+    def download_path(self, url: str, path: str) -> str:
+        src = self.local_path(url)
+        if src is None:
+            with httpx.Client(timeout=STORAGE_TIMEOUT, follow_redirects=True) as client:
+                return _retry(lambda: _stream_download(client, url, path))
+        shutil.copyfile(src, path)
+        return path
+
+    def close(self) -> None:
         pass
-    return str(res)
 
-def signed_url(key: str, expires_in: int = 3600, bucket_name: str = DEFAULT_BUCKET) -> str:
-    res = supabase.storage.from_(bucket_name).create_signed_url(key, expires_in)
-    if isinstance(res, str): return res
-    if isinstance(res, dict): return res.get("signedURL") or res.get("signedUrl") or str(res)
-    try:
-        get = getattr(res, "get", None)
-        if callable(get):
-            cand = get("signedURL") or get("signedUrl")
-            if cand: return str(cand)
-    except Exception:
+    async def aclose(self) -> None:
         pass
-    return str(res)
+
+
+def _make_storage() -> Union[SupabaseStorage, LocalStorage]:
+    if STORAGE_BACKEND == "local":
+        return LocalStorage()
+    if not SUPABASE_URL or not SUPABASE_KEY:
+        raise RuntimeError("Missing Supabase credentials. Set PROJECT_URL and SERVICE_KEY.")
+    return SupabaseStorage(SUPABASE_URL, SUPABASE_KEY)
+
+
+_storage: Optional[Union[SupabaseStorage, LocalStorage]] = None
+_storage_lock = threading.Lock()
+
+
+def get_storage() -> Union[SupabaseStorage, LocalStorage]:
+    """The process-wide backend, created on first use (so a missing credential fails the call, not the import)."""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = _make_storage()
+    return _storage
+
+
+def close_storage() -> None:
+    """Close pooled connections if the backend was ever created."""
+    if _storage is not None:
+        _storage.close()
+
+
+async def aclose_storage() -> None:
+    """close_storage() including the async pool; for the app's shutdown hook."""
+    if _storage is not None:
+        await _storage.aclose()
+
+
+class _LazyStorage:
+    """Module-level `storage` kept for callers that use it directly; resolves on attribute access."""
+
+    def __getattr__(self, name: str):
+        return getattr(get_storage(), name)
+
+
+storage = _LazyStorage()
+
+
+# -------------------- Module-level helpers (stable API) --------------------
+def public_url(key: str, bucket_name: str = DEFAULT_BUCKET) -> str:
+    return get_storage().public_url(key, bucket_name)
+
+
+def signed_url(key: str, expires_in: int = 3600, bucket_name: str = DEFAULT_BUCKET) -> str:
+    return get_storage().signed_url(key, expires_in, bucket_name=bucket_name)
+
 
 def upload_bytes(
     data: Union[bytes, bytearray],
@@ -78,10 +422,66 @@ def upload_bytes(
 ) -> str:
     if not isinstance(data, (bytes, bytearray)):
         raise TypeError("upload_bytes expects raw bytes or bytearray")
-    ct = content_type or _guess_content_type(key)
-    file_opts = {"contentType": str(ct), "upsert": "true" if upsert else "false"}
-    res = supabase.storage.from_(bucket_name).upload(key, bytes(data), file_opts)
-    if getattr(res, "status_code", 200) not in (200, 201):
-        raise RuntimeError(f"Supabase upload failed: {res}")
-    public = PUBLIC_READ_DEFAULT if make_public is None else make_public
-    return public_url(key, bucket_name) if public else signed_url(key, bucket_name=bucket_name)
+    return get_storage().upload_bytes(data, key, bucket_name=bucket_name, content_type=content_type,
+                                upsert=upsert, make_public=make_public)
+
+
+def upload_path(
+    path: str,
+    key: str,
+    *,
+    bucket_name: str = DEFAULT_BUCKET,
+    content_type: Optional[str] = None,
+    upsert: bool = True,
+    make_public: Optional[bool] = None,
+) -> str:
+    """Like upload_bytes, but streams from a local file instead of holding it in memory."""
+    return get_storage().upload_path(path, key, bucket_name=bucket_name, content_type=content_type,
+                               upsert=upsert, make_public=make_public)
+
+
+async def aupload_bytes(data: Data, key: str, *, bucket_name: str = DEFAULT_BUCKET,
+                        content_type: Optional[str] = None, upsert: bool = True,
+                        make_public: Optional[bool] = None) -> str:
+    return await get_storage().aupload_bytes(data, key, bucket_name=bucket_name, content_type=content_type,
+                                       upsert=upsert, make_public=make_public)
+
+
+async def aupload_path(path: str, key: str, *, bucket_name: str = DEFAULT_BUCKET,
+                       content_type: Optional[str] = None, upsert: bool = True,
+                       make_public: Optional[bool] = None) -> str:
+    return await get_storage().aupload_path(path, key, bucket_name=bucket_name, content_type=content_type,
+                                      upsert=upsert, make_public=make_public)
+
+
+async def aupload_many(items: Sequence[UploadItem], *, bucket_name: str = DEFAULT_BUCKET,
+                       concurrency: int = STORAGE_CONCURRENCY) -> List[str]:
+    """Upload several artifacts concurrently; URLs come back in input order."""
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def _one(item: UploadItem) -> str:
+        data, key, ct = item
+        async with sem:
+            return await aupload_bytes(data, key, bucket_name=bucket_name, content_type=ct)
+
+    return list(await asyncio.gather(*(_one(it) for it in items)))
+
+
+def upload_many(items: Iterable[UploadItem], *, bucket_name: str = DEFAULT_BUCKET,
+                concurrency: int = STORAGE_CONCURRENCY) -> List[str]:
+    """Blocking counterpart of aupload_many for worker code; shares the pooled sync client."""
+    items = list(items)
+    if len(items) <= 1:
+        return [upload_bytes(d, k, bucket_name=bucket_name, content_type=ct) for d, k, ct in items]
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(items))) as pool:
+        return list(pool.map(lambda it: upload_bytes(it[0], it[1], bucket_name=bucket_name, content_type=it[2]), items))
+
+
+def download_bytes(url: str) -> bytes:
+    """Fetch an object by URL (local files are read directly for the local backend)."""
+    return get_storage().download_bytes(url)
+
+
+def download_path(url: str, path: str) -> str:
+    """Fetch an object by URL straight into a local file; returns `path`."""
+    return get_storage().download_path(url, path)
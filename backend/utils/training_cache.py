@@ -0,0 +1,132 @@
+# utils/training_cache.py
+from __future__ import annotations
+import hashlib, json, os, time
+from dataclasses import asdict
+from importlib.metadata import PackageNotFoundError, version
+from typing import Any, Dict, Optional
+import dotenv
+from utils.dataset_cache import CACHE_DIR
+
+dotenv.load_dotenv()
+
+TRAINING_CACHE_ENABLED: bool = os.getenv("MLIFY_TRAINING_CACHE", "true").lower() == "true"
+TRAINING_CACHE_DIR: str = os.getenv("MLIFY_TRAINING_CACHE_DIR", os.path.join(CACHE_DIR, "training"))
+TRAINING_CACHE_TTL: float = float(os.getenv("MLIFY_TRAINING_CACHE_TTL", str(7 * 86400)))  # seconds
+TRAINING_CACHE_MAX: int = int(os.getenv("MLIFY_TRAINING_CACHE_MAX", "500"))  # entries
+TRAINING_CACHE_VERSION = 1  # bump when model_trainer's output changes shape or meaning
+
+
+def trainer_config() -> Dict[str, Any]:
+    """
+    Everything besides the request that decides what model_trainer produces:
+    candidate grid, search and preprocessing settings, scikit-learn version.
+    It is part of every key, so changing any of it invalidates old entries.
+    """
+    from utils import preprocess
+    from utils.model_search import CLASSIFICATION, REGRESSION, SEARCH_ETA, SEARCH_MIN_ROWS, default_candidates
+
+    try:
+        sklearn_version = version("scikit-learn")
+    except PackageNotFoundError:
+        sklearn_version = None
+    return {
+        "version": TRAINING_CACHE_VERSION,
+        "sklearn": sklearn_version,
+        "candidates": {task: [asdict(c) for c in default_candidates(task)] for task in (REGRESSION, CLASSIFICATION)},
+        "search": {"eta": SEARCH_ETA, "min_rows": SEARCH_MIN_ROWS},
+        "preprocess": {
+            "onehot_max_levels": preprocess.ONEHOT_MAX_LEVELS,
+            "target_encode_max_levels": preprocess.TARGET_ENCODE_MAX_LEVELS,
+            "hash_features": preprocess.HASH_FEATURES,
+            "id_unique_ratio": preprocess.ID_UNIQUE_RATIO,
+            "id_min_rows": preprocess.ID_MIN_ROWS,
+        },
+    }
+
+
+class TrainingCache:
+    """
+    model_trainer results (metrics, artifact URL, model id) keyed by dataset
+    content hash + request options + trainer_config(), one JSON file per key
+    under `cache_dir` so every job worker shares them. Entries older than
+    `ttl` seconds are ignored and removed; the directory is pruned (expired
+    first, then least recently used) once it holds more than `max_entries`.
+    Evicting an entry never deletes the model: it stays in the registry.
+    """
+
+    def __init__(self, cache_dir: str = TRAINING_CACHE_DIR, ttl: float = TRAINING_CACHE_TTL,
+                 max_entries: int = TRAINING_CACHE_MAX) -> None:
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._config: Optional[str] = None
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, dataset_id: str, request: Dict[str, Any]) -> str:
+        if self._config is None:
+            self._config = json.dumps(trainer_config(), sort_keys=True, default=str)
+        blob = json.dumps({"dataset": dataset_id, "request": request, "config": self._config}, sort_keys=True, default=str)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as fh:
+                entry = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry.get("created_at", 0) > self.ttl:
+            self.discard(key)
+            return None
+        try:
+            os.utime(path)  # recency for pruning
+        except OSError:
+            pass
+        return entry
+
+    def put(self, key: str, model_info: Dict[str, Any]) -> None:
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as fh:
+                json.dump({"created_at": time.time(), "model_info": model_info}, fh, default=str)
+            os.replace(tmp, path)
+        except OSError:
+            return
+        self.prune()
+
+    def discard(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def prune(self) -> None:
+        try:
+            names = [n for n in os.listdir(self.cache_dir) if n.endswith(".json")]
+        except OSError:
+            return
+        if len(names) <= self.max_entries:
+            return
+        now = time.time()
+        aged = []
+        for n in names:
+            try:
+                aged.append((os.path.getmtime(os.path.join(self.cache_dir, n)), n))
+            except OSError:
+                continue
+        aged.sort()
+        drop = [n for m, n in aged if now - m > self.ttl]
+        keep = [n for m, n in aged if now - m <= self.ttl]
+        drop += keep[: max(0, len(keep) - self.max_entries)]
+        for n in drop:
+            try:
+                os.remove(os.path.join(self.cache_dir, n))
+            except OSError:
+                pass
+
+
+training_cache = TrainingCache()
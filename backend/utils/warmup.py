@@ -0,0 +1,117 @@
+# utils/warmup.py
+from __future__ import annotations
+import importlib, os, threading, time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import dotenv
+
+dotenv.load_dotenv()
+
+STARTUP_MODES = ("lazy", "background", "eager")
+# lazy: load heavy subsystems on first use; background: serve at once and warm up in a thread;
+# eager: finish warm-up before the server accepts requests
+STARTUP_MODE: str = os.getenv("MLIFY_STARTUP", "background").lower()
+IMPORT_BUDGET: float = float(os.getenv("MLIFY_IMPORT_BUDGET", "1.5"))  # seconds for `import main` in a fresh worker
+
+# Heavy modules the request paths import lazily (model trainer, chart rendering, artifact export)
+WARMUP_MODULES: Tuple[str, ...] = (
+    "scipy.sparse",
+    "sklearn.compose",
+    "sklearn.ensemble",
+    "sklearn.impute",
+    "sklearn.linear_model",
+    "sklearn.metrics",
+    "sklearn.model_selection",
+    "sklearn.preprocessing",
+    "joblib",
+    "matplotlib.backends.backend_agg",
+    "matplotlib.figure",
+    "utils.preprocess",
+)
+
+
+def import_modules(modules: Tuple[str, ...] = WARMUP_MODULES) -> Dict[str, Any]:
+    """Import each module, returning seconds taken (or the error message) per module."""
+    out: Dict[str, Any] = {}
+    for name in modules:
+        t0 = time.perf_counter()
+        try:
+            importlib.import_module(name)
+            out[name] = round(time.perf_counter() - t0, 4)
+        except Exception as e:
+            out[name] = f"error: {e}"
+    return out
+
+
+def warm_worker() -> None:
+    """ProcessPool initializer: job workers import the heavy stack before taking their first job."""
+    if STARTUP_MODE != "lazy":
+        import_modules()
+
+
+class WarmUp:
+    """
+    Runs named warm-up tasks once (imports, client creation, worker spawn) and
+    reports progress for the readiness endpoint. A failed task is recorded
+    and makes the service not ready, instead of failing the import.
+    """
+
+    def __init__(self, tasks: Optional[List[Tuple[str, Callable[[], Any]]]] = None, mode: str = STARTUP_MODE) -> None:
+        if mode not in STARTUP_MODES:
+            raise ValueError(f"MLIFY_STARTUP must be one of {', '.join(STARTUP_MODES)}")
+        self.mode = mode
+        self.tasks: List[Tuple[str, Callable[[], Any]]] = list(tasks or [])
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, name: str, fn: Callable[[], Any]) -> None:
+        self.tasks.append((name, fn))
+
+    def run(self) -> None:
+        with self._lock:
+            if self.started_at is not None:
+                return
+            self.started_at = time.time()
+        for name, fn in self.tasks:
+            t0 = time.perf_counter()
+            try:
+                detail = fn()
+                entry: Dict[str, Any] = {"status": "ok"}
+                if detail is not None:
+                    entry["detail"] = detail
+            except Exception as e:
+                entry = {"status": "error", "error": str(e) or type(e).__name__}
+            entry["seconds"] = round(time.perf_counter() - t0, 4)
+            with self._lock:
+                self.results[name] = entry
+        self.finished_at = time.time()
+
+    def start(self) -> None:
+        """Warm up according to the startup mode; eager blocks, background returns at once."""
+        if self.mode == "eager":
+            self.run()
+        elif self.mode == "background":
+            self._thread = threading.Thread(target=self.run, name="mlify-warmup", daemon=True)
+            self._thread.start()
+
+    @property
+    def done(self) -> bool:
+        return self.mode == "lazy" or self.finished_at is not None
+
+    @property
+    def ready(self) -> bool:
+        with self._lock:
+            return self.done and all(r["status"] == "ok" for r in self.results.values())
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            results = {k: dict(v) for k, v in self.results.items()}
+        return {
+            "mode": self.mode,
+            "done": self.done,
+            "pending": [name for name, _ in self.tasks if name not in results] if self.mode != "lazy" else [],
+            "tasks": results,
+            "seconds": round(self.finished_at - self.started_at, 4) if self.finished_at and self.started_at else None,
+        }
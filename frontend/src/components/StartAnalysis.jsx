@@ -15,9 +15,9 @@ import {
 import LiquidEther from "./LiquidEther";
 
 /**
- * NOTE TO DEV: You asked for zero logic changes. All network calls, state names,
- * and the step flow are unchanged. Only the presentation layer and
- * how the backend results are rendered have been polished.
+ * NOTE TO DEV: Processing is submitted to /jobs and polled for progress; the
+ * step messages feed `progressMessages`. State names and the step flow are
+ * otherwise unchanged.
  */
 
 /* --------------------------- SMALL UI PRIMITIVES --------------------------- */
@@ -212,16 +212,38 @@ const StartAnalysis = () => {
     }
 
     try {
-      const response = await fetch("http://localhost:8000/process", {
+      // Submit as a background job, then poll its progress until it finishes
+      const submit = await fetch("http://localhost:8000/jobs", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({
           file_url: fileUrlToSend,       // <-- guaranteed string now
+          dataset_id: fileData?.dataset_id,
+          columnar_url: fileData?.columnar_url,
           target: selectedTarget,
           mode: mode,                    // "business_insights" | "model_trainer"
         }),
       });
 
+      const job = await submit.json();
+
+      if (!submit.ok) {
+        alert(`Processing failed: ${job.detail || JSON.stringify(job)}`);
+        setIsProcessing(false);
+        return;
+      }
+
+      setProgressMessages([]);
+      let status = job;
+      while (!["done", "error", "cancelled"].includes(status.status)) {
+        await new Promise((resolve) => setTimeout(resolve, 1000));
+        const poll = await fetch(`http://localhost:8000/jobs/${job.job_id}`);
+        status = await poll.json();
+        if (!poll.ok) break;
+        setProgressMessages((status.steps || []).map((s) => s.message));
+      }
+
+      const response = await fetch(`http://localhost:8000/jobs/${job.job_id}/result`);
       const data = await response.json();
 
       if (!response.ok) {